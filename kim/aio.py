@@ -0,0 +1,201 @@
+# kim/aio.py
+# Copyright (C) 2014-2016 the Kim authors and contributors
+# <see AUTHORS file>
+#
+# This module is part of Kim and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+"""asyncio support for Kim.  This module requires python 3.5 or later;
+streaming serialization is provided by :mod:`kim.aiostream`.
+
+Pipes, getters of :class:`kim.field.Nested` fields and
+:meth:`kim.mapper.Mapper.validate` may be coroutine functions when data is
+marshaled with :meth:`kim.mapper.Mapper.marshal_async`::
+
+    class UserMapper(Mapper):
+
+        __type__ = User
+
+        name = field.String(extra_marshal_pipes={'validation': [unique_name]})
+        company = field.Nested('CompanyMapper', getter=get_company)
+
+        async def validate(self, output):
+            ...
+
+    user = await UserMapper(data=data).marshal_async(concurrency=10)
+
+.. version-added: 1.2.0
+"""
+
+import asyncio
+import inspect
+
+from .exception import (
+    FieldInvalid, MappingInvalid, StopPipelineExecution)
+from .pipelines.base import Session, pipe
+from .pipelines.collection import marshall_collection, CollectionItems
+from .pipelines.nested import (
+    marshal_nested, batch_get, get_batch_memo, _get_nested_mapper,
+    _record_changes)
+
+
+async def _resolve(value):
+
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+@pipe()
+async def marshal_nested_async(session):
+    """Marshal data using the nested mapper defined on this field, awaiting
+    the getter of the field if it's a coroutine function and marshaling the
+    nested mapper with :func:`marshal`.
+
+    :param session: Kim pipeline session instance
+
+    .. seealso::
+        :func:`kim.pipelines.nested.marshal_nested`
+    """
+
+    resolved = None
+    if session.field.opts.getter:
+        resolved = await _resolve(session.field.opts.getter(session))
+    elif session.field.opts.batch_getter:
+        resolved = batch_get(
+            session.field, session.data, get_batch_memo(session))
+
+    nested_mapper = _get_nested_mapper(session, resolved)
+    if nested_mapper is None:
+        session.data = resolved
+    else:
+        session.data = await marshal(
+            nested_mapper, role=session.field.opts.role)
+        _record_changes(session, nested_mapper)
+
+    return session.data
+
+
+@pipe(run_if_none=True)
+async def marshal_collection_async(session):
+    """Marshal each item in ``data`` through the wrapped field defined for
+    this collection, awaiting each item in turn.
+
+    :param session: Kim pipeline session instance
+
+    .. seealso::
+        :func:`kim.pipelines.collection.marshall_collection`
+    """
+
+    items = CollectionItems(session)
+    for mapper_session in items:
+        await run_field(items.field, 'marshal', mapper_session, parent=session)
+
+    return items.finish()
+
+
+# Pipes replaced when running pipelines asynchronously
+_async_pipes = {
+    marshal_nested: marshal_nested_async,
+    marshal_nested.unchecked: marshal_nested_async.unchecked,
+    marshall_collection: marshal_collection_async,
+    marshall_collection.unchecked: marshal_collection_async.unchecked,
+}
+
+
+async def run_pipes(pipes, session):
+    """Run ``pipes`` for ``session`` like
+    :func:`kim.pipelines.base.pipeline_runner`, awaiting the result of each
+    pipe that returns an awaitable.
+
+    :param pipes: list of pipe functions
+    :param session: :class:`kim.pipelines.base.Session`
+    :returns: ``session.output``
+    """
+
+    data = session.data
+    try:
+        for pipe_func in pipes:
+            pipe_func = _async_pipes.get(pipe_func, pipe_func)
+            value_func = getattr(pipe_func, 'value_func', None)
+            if value_func is None:
+                session.data = data
+                result = pipe_func(session)
+                if inspect.isawaitable(result):
+                    await result
+                data = session.data
+            elif data is not None or not pipe_func.checks_none:
+                data = value_func(session, data)
+                if inspect.isawaitable(data):
+                    data = await data
+    except StopPipelineExecution:
+        return session.output
+
+    session.data = data
+    return session.output
+
+
+async def run_field(field, stage, mapper_session, parent=None):
+    """Run the optimized pipes of ``stage`` for ``field``.  Each run gets its
+    own :class:`kim.pipelines.base.Session` as fields may be run
+    concurrently.
+    """
+
+    session = Session(field, mapper_session.data, mapper_session.output,
+                      mapper_session=mapper_session, parent=parent)
+    await run_pipes(field.get_optimized_pipes(stage), session)
+
+
+async def marshal(mapper, role='__default__', concurrency=None):
+    """Marshal ``mapper.data`` into ``mapper.obj``, awaiting coroutine pipes,
+    getters and validators.  Fields are marshaled concurrently, at most
+    ``concurrency`` at a time when set, and errors are collected in declared
+    field order exactly as :meth:`kim.mapper.Mapper.marshal` does.
+
+    :param mapper: :class:`kim.mapper.Mapper` instance
+    :param role: name of a role to use when marshaling
+    :param concurrency: maximum number of fields of the mapper awaited at
+        once.  Nested mappers have their own limit
+    :raises: :class:`kim.exception.MappingInvalid`
+    :returns: Object of ``__type__`` populated with data
+    """
+
+    if mapper.initial_errors is not None:
+        raise MappingInvalid(mapper.initial_errors)
+
+    output = mapper._get_obj()
+    fields = mapper._get_fields(role, for_marshal=True)
+    if mapper.track_changes:
+        mapper.changes = {}
+    mapper_session = mapper.get_mapper_session(mapper.data, output)
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+    async def marshal_field(field):
+        try:
+            if semaphore is None:
+                await run_field(field, 'marshal', mapper_session)
+            else:
+                async with semaphore:
+                    await run_field(field, 'marshal', mapper_session)
+        except FieldInvalid as e:
+            return e.message
+        except MappingInvalid as e:
+            # handle errors from nested mappers.
+            return e.errors
+
+    results = await asyncio.gather(*[marshal_field(f) for f in fields])
+    for field, error in zip(fields, results):
+        if error is not None:
+            mapper.errors[field.name] = error
+
+    try:
+        await _resolve(mapper.validate(output))
+    except FieldInvalid as e:
+        mapper.errors[e.field.name] = e.message
+    except MappingInvalid as e:
+        mapper.errors = e.errors
+
+    if mapper.errors:
+        raise MappingInvalid(mapper.errors)
+
+    return output
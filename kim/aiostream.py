@@ -0,0 +1,97 @@
+# kim/aiostream.py
+# Copyright (C) 2014-2016 the Kim authors and contributors
+# <see AUTHORS file>
+#
+# This module is part of Kim and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+"""Streaming serialization from async iterables.  This module uses async
+generators and requires python 3.6 or later.
+
+Objects may be serialized from an async iterable, such as a database cursor,
+and streamed as JSON::
+
+    async for chunk in UserMapper.many().aiter_serialize(
+            cursor, as_json=True):
+        await send({'type': 'http.response.body', 'body': chunk,
+                    'more_body': True})
+
+.. version-added: 1.2.0
+"""
+
+from .encoding import iter_json, DEFAULT_BUFFER_SIZE
+
+
+async def _aiter(objs):
+
+    if hasattr(objs, '__aiter__'):
+        async for obj in objs:
+            yield obj
+    else:
+        for obj in objs:
+            yield obj
+
+
+async def iter_serialize(mapper_iterator, objs, role='__default__',
+                         deferred_role=None):
+    """Serialize each object of the async iterable ``objs`` as it's
+    received.  The next object is only requested once the previous one has
+    been consumed, so nothing is buffered.
+
+    :param mapper_iterator: :class:`kim.mapper.MapperIterator`
+    :param objs: async iterable, or iterable, of objects
+    :returns: async generator of serialized objects
+    """
+
+    serialize = _get_serialize(mapper_iterator, role, deferred_role)
+    async for obj in _aiter(objs):
+        yield serialize(obj)
+
+
+async def iter_serialize_json(mapper_iterator, objs, role='__default__',
+                              deferred_role=None,
+                              buffer_size=DEFAULT_BUFFER_SIZE):
+    """Serialize the objects of the async iterable ``objs`` to a JSON array
+    yielded in UTF-8 encoded chunks of about ``buffer_size`` characters, for
+    instance as the body of a chunked response.  At most one chunk is held
+    in memory, objects are only requested from ``objs`` once the previous
+    chunk has been consumed.
+
+    :param mapper_iterator: :class:`kim.mapper.MapperIterator`
+    :param objs: async iterable, or iterable, of objects
+    :returns: async generator of bytes
+    """
+
+    mapper_cls = mapper_iterator.mapper
+    raw = mapper_iterator.mapper_params.get('raw')
+
+    buf, size = ['['], 1
+    separator = ''
+    async for obj in _aiter(objs):
+        buf.append(separator)
+        separator = ', '
+        mapper = mapper_iterator.get_mapper(obj=obj) if raw else None
+        for piece in iter_json(mapper_cls, obj, role=role,
+                               deferred_role=deferred_role, mapper=mapper):
+            buf.append(piece)
+            size += len(piece)
+
+        if size >= buffer_size:
+            yield ''.join(buf).encode('utf-8')
+            buf, size = [], 0
+
+    buf.append(']')
+    yield ''.join(buf).encode('utf-8')
+
+
+def _get_serialize(mapper_iterator, role, deferred_role):
+
+    if not mapper_iterator.mapper_params:
+        return mapper_iterator.mapper.serializer(
+            role=role, deferred_role=deferred_role)
+
+    def serialize(obj):
+        return mapper_iterator.get_mapper(obj=obj).serialize(
+            role=role, deferred_role=deferred_role)
+
+    return serialize
@@ -0,0 +1,307 @@
+# kim/cli.py
+# Copyright (C) 2014-2016 the Kim authors and contributors
+# <see AUTHORS file>
+#
+# This module is part of Kim and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+"""The ``kim`` command streams NDJSON or JSON array documents through
+Mappers::
+
+    $ kim marshal myapp.mappers.UserMapper -r create -i users.json \\
+        --serialize myapp.mappers.UserMapper --serialize-role public \\
+        --errors errors.ndjson --workers 4 > users.ndjson
+
+    $ kim serialize myapp.mappers.UserMapper -r public < users.ndjson
+
+Input is read incrementally and processed in chunks, so memory use is bound
+by the chunk size and number of workers rather than by the input.
+
+.. version-added: 1.2.0
+"""
+
+import argparse
+import importlib
+import io
+import sys
+
+from .encoding import iter_json, iter_json_values, encode
+from .exception import MapperError, MappingInvalid
+from .parallel import DEFAULT_PARALLEL_CHUNK_SIZE, _chunks, _map_ordered
+
+
+def load_mapper(path):
+    """Import a :class:`kim.mapper.Mapper` from a dotted path such as
+    ``myapp.mappers.UserMapper`` or ``myapp.mappers:UserMapper``.
+
+    :param path: dotted path to the Mapper
+    :raises: :class:`kim.exception.MapperError`
+    :returns: :class:`kim.mapper.Mapper` class
+    """
+
+    from .mapper import Mapper
+
+    if ':' in path:
+        module_name, _, name = path.partition(':')
+    else:
+        module_name, _, name = path.rpartition('.')
+
+    if not module_name or not name:
+        raise MapperError('%s is not a dotted path to a Mapper' % path)
+
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        raise MapperError('Unable to import %s: %s' % (module_name, e))
+
+    mapper = module
+    for attr in name.split('.'):
+        mapper = getattr(mapper, attr, None)
+
+    if not isinstance(mapper, type) or not issubclass(mapper, Mapper):
+        raise MapperError('%s is not a Mapper' % path)
+
+    return mapper
+
+
+class Job(object):
+    """A chunk of work run by the ``kim`` command, in this process or in a
+    worker.  Mappers are referenced by dotted path and imported on first use
+    so jobs can be sent to worker processes.
+    """
+
+    def __init__(self, command, mapper, role='__default__',
+                 serialize_mapper=None, serialize_role='__default__'):
+        """Instantiate a new instance of :class:`Job`
+
+        :param command: ``marshal`` or ``serialize``
+        :param mapper: dotted path of the Mapper used by ``command``
+        :param role: role used by ``command``
+        :param serialize_mapper: dotted path of the Mapper used to serialize
+            marshaled objects, defaults to ``mapper``
+        :param serialize_role: role used to serialize marshaled objects
+        """
+
+        self.command = command
+        self.mapper = mapper
+        self.role = role
+        self.serialize_mapper = serialize_mapper or mapper
+        self.serialize_role = serialize_role
+        self._mappers = None
+
+    def __getstate__(self):
+
+        state = self.__dict__.copy()
+        state['_mappers'] = None
+        return state
+
+    def get_mappers(self):
+        """Return the Mapper classes used by this job, checking the roles of
+        the job are defined by them.
+
+        :raises: :class:`kim.exception.MapperError`
+        :returns: tuple of the Mapper and the Mapper serializing output
+        """
+
+        if self._mappers is None:
+            mapper_cls = load_mapper(self.mapper)
+            serialize_cls = load_mapper(self.serialize_mapper)
+            mapper_cls._get_plan(self.role)
+            if self.command == 'marshal':
+                serialize_cls._get_plan(self.serialize_role)
+            self._mappers = (mapper_cls, serialize_cls)
+        return self._mappers
+
+    def __call__(self, start, values):
+        """Process a chunk of input ``values``.
+
+        :param start: index of the first value in the input
+        :param values: list of decoded JSON values
+        :returns: tuple of a list of NDJSON lines and a list of errors, each a
+            dict with the ``index`` of the invalid value and its ``errors``
+        """
+
+        mapper_cls, serialize_cls = self.get_mappers()
+
+        if self.command == 'serialize':
+            objs, role = values, self.role
+        else:
+            objs = mapper_cls.many()._iter_marshal(
+                values, self.role, index_errors=True, raise_errors=False)
+            role = self.serialize_role
+            mapper_cls = serialize_cls
+
+        lines, errors = [], []
+        for i, obj in enumerate(objs):
+            if isinstance(obj, MappingInvalid):
+                errors.append({'index': start + i, 'errors': obj.errors[i]})
+                continue
+            lines.append(u''.join(iter_json(mapper_cls, obj, role=role)))
+
+        return lines, errors
+
+
+def run(job, values, chunk_size=DEFAULT_PARALLEL_CHUNK_SIZE, workers=1):
+    """Run ``job`` over every value in ``values``.  With more than one
+    worker chunks are processed by a pool of processes, at most two chunks
+    per worker being in flight at a time.  Results are returned in the
+    order of the input either way.
+
+    .. seealso::
+        :func:`kim.parallel.map_chunks`
+
+    :param job: :class:`Job` instance
+    :param values: iterable of decoded JSON values
+    :param chunk_size: number of values processed at a time
+    :param workers: number of worker processes
+    :returns: generator of the results of ``job`` for each chunk
+    """
+
+    chunks = _chunks(values, chunk_size)
+    if workers <= 1:
+        for start, chunk in chunks:
+            yield job(start, chunk)
+        return
+
+    for result in _map_ordered(job, chunks, workers):
+        yield result
+
+
+class _InvalidInput(Exception):
+    pass
+
+
+def _decode(fp):
+
+    try:
+        for value in iter_json_values(fp):
+            yield value
+    except ValueError as e:
+        raise _InvalidInput(str(e))
+
+
+def _positive_int(value):
+
+    value = int(value)
+    if value < 1:
+        raise argparse.ArgumentTypeError('must be a positive integer')
+    return value
+
+
+def get_parser():
+    """Return the :class:`argparse.ArgumentParser` of the ``kim`` command.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog='kim',
+        description='Stream NDJSON or JSON array documents through a Mapper '
+                    'and write NDJSON.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    marshal = commands.add_parser(
+        'marshal', help='marshal each value and serialize the result')
+    serialize = commands.add_parser(
+        'serialize', help='serialize each value')
+
+    for command in (marshal, serialize):
+        command.add_argument(
+            'mapper', help='dotted path of the Mapper, eg. myapp.UserMapper')
+        command.add_argument(
+            '-r', '--role', default='__default__', help='role to use')
+        command.add_argument(
+            '-i', '--input', default='-',
+            help='NDJSON or JSON array file to read, defaults to stdin')
+        command.add_argument(
+            '-o', '--output', default='-',
+            help='NDJSON file to write, defaults to stdout')
+        command.add_argument(
+            '--errors', metavar='PATH',
+            help='NDJSON file errors are written to, defaults to stderr')
+        command.add_argument(
+            '--chunk-size', type=_positive_int,
+            default=DEFAULT_PARALLEL_CHUNK_SIZE,
+            help='number of values processed at a time')
+        command.add_argument(
+            '--workers', type=_positive_int, default=1,
+            help='number of worker processes')
+
+    marshal.add_argument(
+        '--serialize', metavar='MAPPER',
+        help='dotted path of the Mapper used to serialize marshaled objects, '
+             'defaults to the marshaling Mapper')
+    marshal.add_argument(
+        '--serialize-role', default='__default__',
+        help='role used to serialize marshaled objects')
+
+    return parser
+
+
+def _open(path, mode, std):
+
+    if path == '-':
+        return std, False
+    return io.open(path, mode), True
+
+
+def main(argv=None):
+    """Entry point of the ``kim`` command.
+
+    :param argv: command line arguments, defaults to ``sys.argv[1:]``
+    :returns: exit status, 1 if any value was invalid
+    """
+
+    parser = get_parser()
+    args = parser.parse_args(argv)
+
+    job = Job(args.command, args.mapper, role=args.role,
+              serialize_mapper=getattr(args, 'serialize', None),
+              serialize_role=getattr(args, 'serialize_role', '__default__'))
+    try:
+        job.get_mappers()
+    except MapperError as e:
+        parser.error(e.message)
+
+    stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+    stdout = getattr(sys.stdout, 'buffer', sys.stdout)
+    stderr = getattr(sys.stderr, 'buffer', sys.stderr)
+
+    files = []
+    try:
+        try:
+            input_, close = _open(args.input, 'rb', stdin)
+            if close:
+                files.append(input_)
+            output, close = _open(args.output, 'wb', stdout)
+            if close:
+                files.append(output)
+            errors_output, close = _open(args.errors or '-', 'wb', stderr)
+            if close:
+                files.append(errors_output)
+        except (IOError, OSError) as e:
+            parser.error("can't open '%s': %s" % (e.filename, e.strerror))
+
+        invalid = 0
+        values = _decode(input_)
+        for lines, errors in run(job, values, chunk_size=args.chunk_size,
+                                 workers=args.workers):
+            if lines:
+                output.write((u'\n'.join(lines) + u'\n').encode('utf-8'))
+            if errors:
+                invalid += len(errors)
+                errors_output.write(u''.join(
+                    encode(error) + u'\n' for error in errors).encode('utf-8'))
+        output.flush()
+        errors_output.flush()
+    except _InvalidInput as e:
+        sys.stderr.write('kim: invalid JSON: %s\n' % e)
+        return 2
+    finally:
+        for f in files:
+            f.close()
+
+    return 1 if invalid else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,647 @@
+# kim/compiler.py
+# Copyright (C) 2014-2016 the Kim authors and contributors
+# <see AUTHORS file>
+#
+# This module is part of Kim and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+import linecache
+import re
+from decimal import Decimal, InvalidOperation
+
+import iso8601
+import six
+
+from .exception import FieldError, FieldInvalid, MappingInvalid
+from .field import Field, Nested, Collection
+from .pipelines.base import (
+    get_data_from_source, update_output_to_name, read_only, get_data_from_name,
+    is_valid_choice, update_output_to_source)
+from .pipelines.static import get_static_value
+from .pipelines.string import is_valid_string
+from .pipelines.boolean import coerce_to_boolean
+from .pipelines.datetime import format_datetime, is_valid_datetime, cast_to_date
+from .pipelines.numeric import (
+    coerce_to_decimal, to_string, is_valid_integer, bounds_check,
+    is_valid_decimal)
+from .pipelines.nested import serialize_nested
+from .pipelines.collection import serialize_collection
+from .utils import attr_or_key_update, config_version
+
+
+#: Serialize pipelines the compiler knows how to translate into python source,
+#: keyed by the exact chain of pipes found on :attr:`Field.serialize_pipes`.
+#: Fields using any other chain (custom pipelines or extra_serialize_pipes) are
+#: run through their interpreted pipeline instead.
+SERIALIZE_CHAINS = {
+    (get_data_from_source, update_output_to_name): 'value',
+    (get_data_from_source, get_static_value, update_output_to_name): 'static',
+    (get_data_from_source, format_datetime, update_output_to_name): 'datetime',
+    (get_data_from_source, coerce_to_decimal, to_string,
+     update_output_to_name): 'decimal',
+    (get_data_from_source, serialize_nested, update_output_to_name): 'nested',
+    (get_data_from_source, serialize_collection,
+     update_output_to_name): 'collection',
+}
+
+
+def _unbound(cls, name):
+    return six.get_unbound_function(getattr(cls, name))
+
+
+def is_overridden(cls, base, name):
+    """Return a boolean indicating if ``cls`` provides its own implementation
+    of the method ``name`` defined on ``base``.
+    """
+
+    return _unbound(cls, name) is not _unbound(base, name)
+
+
+def invalidate():
+    """Deoptimize every compiled Mapper.
+
+    Changes made through attribute assignment on fields, their opts, roles
+    and Mapper classes are detected automatically and only deoptimize the
+    Mappers using them.  Call this function after mutating configuration in
+    place in a way kim can't see, for example
+    ``field.opts.error_msgs['required'] = 'missing'``.
+    """
+
+    config_version.bump()
+
+
+class CompiledEntry(object):
+    """Tracks how often a Mapper is used with a given role and holds the
+    compiled function once the Mapper has been promoted.
+
+    A Mapper is interpreted until it has been called more than its
+    ``__compile_threshold__`` times for a role, after which a specialised
+    function is generated and used instead.  Whenever the
+    :class:`kim.utils.ConfigVersion` of the Mapper changes the compiled
+    function is discarded and the Mapper goes back to being interpreted until
+    it becomes hot again.
+    """
+
+    __slots__ = ('config_version', 'func', 'version', 'calls', 'hotness',
+                 'compilations', 'deoptimizations', 'supported')
+
+    def __init__(self, version=config_version):
+        """Instantiate a new instance of :class:`CompiledEntry`
+
+        :param version: :class:`kim.utils.ConfigVersion` of the Mapper
+        """
+
+        self.config_version = version
+        self.func = None
+        self.version = None
+        self.calls = 0
+        self.hotness = 0
+        self.compilations = 0
+        self.deoptimizations = 0
+        self.supported = True
+
+    def lookup(self):
+        """Record a call and return the compiled function if it's still valid.
+
+        :returns: compiled function or None
+        """
+
+        self.calls += 1
+        func = self.func
+        if func is not None:
+            if self.version == self.config_version.value:
+                return func
+            self.deoptimize()
+
+        self.hotness += 1
+        return None
+
+    def should_compile(self, threshold, force=False):
+        """Return a boolean indicating if the entry is hot enough to compile.
+
+        :param threshold: number of calls after which to compile or None to
+            never compile automatically
+        :param force: compile regardless of the number of calls
+        """
+
+        if not self.supported:
+            return False
+        if force:
+            return True
+        return threshold is not None and self.hotness > threshold
+
+    def promote(self, func, version):
+        """Store ``func`` as the compiled implementation generated against
+        ``version`` of the configuration.
+        """
+
+        self.func = func
+        self.version = version
+        self.compilations += 1
+
+    def deoptimize(self):
+        """Discard the compiled function."""
+
+        self.func = None
+        self.version = None
+        self.hotness = 0
+        self.deoptimizations += 1
+
+    def stats(self):
+        """Return a dict describing the usage of this entry."""
+
+        return {
+            'calls': self.calls,
+            'compiled': (self.func is not None and
+                         self.version == self.config_version.value),
+            'compilations': self.compilations,
+            'deoptimizations': self.deoptimizations,
+            'supported': self.supported,
+        }
+
+
+class SourceBuilder(object):
+    """Accumulate the lines and the namespace of a generated python function.
+
+    Objects the generated code needs at runtime, such as fields, constants
+    and helper functions, are stored in the namespace of the function and
+    referenced by name using :meth:`ref`.
+    """
+
+    def __init__(self, name):
+        self.name = re.sub(r'\W', '_', name)
+        self.lines = []
+        self.namespace = {
+            '_isinstance': isinstance,
+            '_dict': dict,
+            '_getattr': getattr,
+            '_setattr': setattr,
+            '_str': str,
+            '_int': int,
+            '_text_type': six.text_type,
+            '_attr_or_key_update': attr_or_key_update,
+            '_Decimal': Decimal,
+            '_InvalidOperation': InvalidOperation,
+            '_parse_date': iso8601.parse_date,
+            '_ParseError': iso8601.ParseError,
+            '_FieldError': FieldError,
+            '_FieldInvalid': FieldInvalid,
+            '_MappingInvalid': MappingInvalid,
+        }
+        self._counter = 0
+
+    def ref(self, obj, prefix='_c'):
+        """Store ``obj`` in the namespace and return the name it's bound to."""
+
+        name = '%s%d' % (prefix, self._counter)
+        self._counter += 1
+        self.namespace[name] = obj
+        return name
+
+    def emit(self, line, indent=1):
+        self.lines.append('    ' * indent + line)
+
+    def build(self, args):
+        """Compile the accumulated source and return the new function.
+
+        The source is registered with :mod:`linecache` so tracebacks raised
+        from inside generated code show the offending line.
+        """
+
+        source = 'def %s(%s):\n%s\n' % (self.name, args, '\n'.join(self.lines))
+        filename = '<kim:%s>' % self.name
+        code = compile(source, filename, 'exec')
+        six.exec_(code, self.namespace)
+        linecache.cache[filename] = (
+            len(source), None, source.splitlines(True), filename)
+
+        func = self.namespace[self.name]
+        func.__kim_source__ = source
+        return func
+
+
+class NestedSerializer(object):
+    """Placeholder bound into the namespace of a compiled serializer for each
+    :class:`kim.field.Nested` field.
+
+    The nested Mapper is resolved from the registry the first time the
+    placeholder is called, avoiding infinite recursion for self referencing
+    mappers and allowing nested mappers to be declared after their parent.
+    Once resolved the placeholder replaces itself in the namespace so
+    subsequent calls go straight to the nested mapper's compiled serializer.
+    As the function is then bound into the parent, the parent is deoptimized
+    whenever the nested mapper is.
+    """
+
+    __slots__ = ('field', 'namespace', 'name', 'version')
+
+    def __init__(self, field, namespace, name, version):
+        self.field = field
+        self.namespace = namespace
+        self.name = name
+        self.version = version
+
+    def resolve(self):
+        mapper = self.field.get_mapper(as_class=True)
+        role = self.field.opts.role
+        mapper._config_version.add_dependent(self.version)
+
+        # The parent mapper is hot so the nested mapper is compiled straight
+        # away rather than waiting for it to reach its own threshold.
+        func = None
+        if mapper._supports_direct_serialize():
+            func = mapper._get_serializer(role, force=True)
+
+        if func is None:
+            def func(obj):
+                return mapper(obj=obj).serialize(role=role)
+
+        self.namespace[self.name] = func
+        return func
+
+    def __call__(self, obj):
+        return self.resolve()(obj)
+
+
+def serialize_kind(field):
+    """Return the name of the compiled implementation for ``field`` or None
+    if the field must run through its interpreted serialize pipeline.
+
+    :param field: instance of :class:`kim.field.Field`
+    :rtype: str or None
+    """
+
+    if is_overridden(type(field), Field, 'serialize'):
+        return None
+
+    kind = SERIALIZE_CHAINS.get(tuple(field.serialize_pipes))
+    if kind == 'nested' and not isinstance(field, Nested):
+        return None
+    if kind == 'collection' and (
+            not isinstance(field, Collection) or
+            field.opts.limit is not None or field.opts.offset):
+        return None
+
+    return kind
+
+
+def read_expr(builder, getter):
+    """Return a python expression reading ``getter.path`` from ``data`` the
+    same way :func:`kim.utils.attr_or_key` would.  Generated functions set
+    ``is_dict`` once per call before reading any values.
+
+    :param builder: :class:`SourceBuilder` of the generated function
+    :param getter: accessor created by :func:`kim.utils.attr_or_key_getter`
+    """
+
+    path = getter.path
+    if path == '__self__':
+        return 'data'
+    elif '.' in path:
+        return '%s(data)' % builder.ref(getter, prefix='_get')
+    else:
+        return '(data.get(%r) if is_dict else _getattr(data, %r, None))' \
+            % (path, path)
+
+
+class SerializerCompiler(object):
+    """Generate a function serializing objects for an ordered list of fields.
+
+    The generated function has the signature ``func(data, mapper=None)`` and
+    returns the serialized dict.  ``mapper`` is only required by fields that
+    can not be compiled and fall back to their pipeline; when it is not
+    provided a new instance of ``mapper_cls`` is created on demand.
+    """
+
+    def __init__(self, mapper_cls, fields, role_name):
+        self.mapper_cls = mapper_cls
+        self.fields = fields
+        self.builder = SourceBuilder(
+            'serialize_%s_%s' % (mapper_cls.__name__, role_name))
+
+    def value(self, field, var, depth=0):
+        """Return a python expression serializing the value held in ``var``
+        for ``field`` or None if the field can not be compiled.
+        """
+
+        kind = serialize_kind(field)
+        b = self.builder
+        opts = field.opts
+
+        if kind == 'value':
+            return var
+        elif kind == 'static':
+            return b.ref(opts.value)
+        elif kind == 'datetime':
+            return '(None if %s is None else %s.isoformat())' % (var, var)
+        elif kind == 'decimal':
+            precision = Decimal('0.' + '0' * (opts.precision - 1) + '1')
+            return '(None if %s is None else _str(_Decimal(%s).quantize(%s)))' \
+                % (var, var, b.ref(precision))
+        elif kind == 'nested':
+            name = b.ref(None, prefix='_nested')
+            b.namespace[name] = NestedSerializer(
+                field, b.namespace, name, self.mapper_cls._config_version)
+            return '(%s if %s is None else %s(%s))' \
+                % (b.ref(opts.null_default), var, name, var)
+        elif kind == 'collection':
+            item = '_i%d' % depth
+            inner = self.value(opts.field, item, depth + 1)
+            if inner is None:
+                return None
+            return '(None if %s is None else [%s for %s in %s])' \
+                % (var, inner, item, var)
+
+        return None
+
+    def compile(self):
+        b = self.builder
+        compiled = []
+        for field in self.fields:
+            kind = serialize_kind(field)
+            if kind == 'static':
+                expr = self.value(field, None)
+            elif kind is not None:
+                expr = self.value(field, 'value')
+            else:
+                expr = None
+            compiled.append((field, kind, expr))
+
+        fallback = any(expr is None for _, _, expr in compiled)
+
+        b.emit('is_dict = _isinstance(data, _dict)')
+        if fallback:
+            b.emit('if mapper is None:')
+            b.emit('mapper = %s(obj=data)' % b.ref(self.mapper_cls), 2)
+            b.emit('output = {}')
+            b.emit('session = mapper.get_mapper_session(data, output)')
+
+        results = []
+        for i, (field, kind, expr) in enumerate(compiled):
+            if expr is None:
+                b.emit('%s.serialize(session)' % b.ref(field, prefix='_field'))
+                continue
+
+            if kind == 'static':
+                result = expr
+            elif expr == 'value':
+                result = read_expr(b, field.opts._source_getter)
+            else:
+                b.emit('value = %s' % read_expr(b, field.opts._source_getter))
+                result = expr
+
+            if fallback:
+                b.emit('output[%r] = %s' % (field.name, result))
+            else:
+                b.emit('r%d = %s' % (i, result))
+                results.append('%r: r%d' % (field.name, i))
+
+        if fallback:
+            b.emit('return output')
+        else:
+            b.emit('return {%s}' % ', '.join(results))
+
+        return b.build('data, mapper=None')
+
+
+def compile_serializer(mapper_cls, fields, role_name='__default__'):
+    """Generate a specialised serialize function for ``fields`` of
+    ``mapper_cls``.
+
+    :param mapper_cls: the :class:`kim.mapper.Mapper` class being compiled
+    :param fields: ordered list of :class:`kim.field.Field` to serialize
+    :param role_name: name of the role used, only used to name the function
+    :returns: function taking ``(data, mapper=None)`` returning a dict
+    """
+
+    return SerializerCompiler(mapper_cls, fields, role_name).compile()
+
+
+class MarshalerCompiler(object):
+    """Generate a function validating and marshaling data for an ordered list
+    of fields.
+
+    The generated function has the signature
+    ``func(data, output, errors, mapper=None)``.  Each field is read from
+    ``data``, validated and written to ``output``.  Validation errors are
+    stored in ``errors`` using the same messages as the field pipelines
+    would produce.  ``mapper`` is only required by fields that can not be
+    compiled and fall back to their pipeline.
+    """
+
+    def __init__(self, mapper_cls, fields, role_name, partial=False):
+        self.mapper_cls = mapper_cls
+        self.fields = fields
+        self.partial = partial
+        self.builder = SourceBuilder('marshal_%s_%s%s' % (
+            mapper_cls.__name__, role_name, '_partial' if partial else ''))
+
+        #: Translations for each pipe supported by the compiler.
+        self.pipes = {
+            is_valid_string: self.is_valid_string,
+            is_valid_choice: self.is_valid_choice,
+            is_valid_integer: self.is_valid_integer,
+            bounds_check: self.bounds_check,
+            is_valid_decimal: self.is_valid_decimal,
+            coerce_to_decimal: self.coerce_to_decimal,
+            coerce_to_boolean: self.coerce_to_boolean,
+            is_valid_datetime: self.is_valid_datetime,
+            cast_to_date: self.cast_to_date,
+        }
+
+    def can_compile(self, field):
+        """Return a boolean indicating if ``field`` uses a marshal pipeline
+        made only of pipes known to the compiler.
+        """
+
+        if is_overridden(type(field), Field, 'marshal'):
+            return False
+
+        chain = field.marshal_pipes
+        return (len(chain) >= 3 and
+                chain[0] is read_only and
+                chain[1] is get_data_from_name and
+                chain[-1] is update_output_to_source and
+                all(p in self.pipes for p in chain[2:-1]))
+
+    def error(self, field, error_type):
+        return 'errors[%r] = %s' % (
+            field.name, self.builder.ref(field.get_error(error_type)))
+
+    # Each pipe translation is passed the field being compiled and returns a
+    # list of lines.  A trailing ``else:`` line opens a block the remaining
+    # pipes of the field are nested inside of.  Pipes only run once the field
+    # has a value so ``value`` is never None.
+
+    def is_valid_string(self, field):
+        return ['try:',
+                '    value = _text_type(value)',
+                'except ValueError:',
+                '    ' + self.error(field, 'type_error'),
+                'else:']
+
+    def is_valid_choice(self, field):
+        if field.opts.choices is None:
+            return []
+        return ['if value not in %s:' % self.builder.ref(field.opts.choices),
+                '    ' + self.error(field, 'invalid_choice'),
+                'else:']
+
+    def is_valid_integer(self, field):
+        return ['try:',
+                '    value = _int(value)',
+                'except (TypeError, ValueError):',
+                '    ' + self.error(field, 'type_error'),
+                'else:']
+
+    def bounds_check(self, field):
+        lines = []
+        for op, bound in (('>', field.opts.max), ('<', field.opts.min)):
+            if bound is not None:
+                lines.extend([
+                    '%s value %s %s:' % ('elif' if lines else 'if', op,
+                                         self.builder.ref(bound)),
+                    '    ' + self.error(field, 'out_of_bounds')])
+        if lines:
+            lines.append('else:')
+        return lines
+
+    def is_valid_decimal(self, field):
+        return ['try:',
+                '    _Decimal(value)',
+                'except _InvalidOperation:',
+                '    ' + self.error(field, 'type_error'),
+                'else:']
+
+    def coerce_to_decimal(self, field):
+        decimals = field.opts.precision
+        precision = Decimal('0.' + '0' * (decimals - 1) + '1')
+        return ['value = _Decimal(value).quantize(%s)'
+                % self.builder.ref(precision)]
+
+    def coerce_to_boolean(self, field):
+        return ['value = value in %s'
+                % self.builder.ref(field.opts.true_boolean_values)]
+
+    def is_valid_datetime(self, field):
+        return ['try:',
+                '    value = _parse_date(value)',
+                'except _ParseError:',
+                '    ' + self.error(field, 'type_error'),
+                'else:']
+
+    def cast_to_date(self, field):
+        return ['value = value.date()']
+
+    def write(self, field):
+        """Return the lines storing ``value`` in ``output`` at field.source."""
+
+        source = field.opts.source
+        if source == '__self__':
+            store = ['_attr_or_key_update(output, value)']
+        elif '.' in source:
+            store = ['%s(output, value)' % self.builder.ref(
+                field.opts._source_setter, prefix='_set')]
+        else:
+            store = ['if out_is_dict:',
+                     '    output[%r] = value' % source,
+                     'else:',
+                     '    _setattr(output, %r, value)' % source]
+
+        return (['try:'] +
+                ['    ' + line for line in store] +
+                ['except (TypeError, AttributeError):',
+                 "    raise _FieldError('output does not support attribute or "
+                 "key based set operations')"])
+
+    def field_lines(self, field):
+        """Return the lines marshaling ``field``.  Nested blocks are
+        expressed by the leading whitespace of each line.
+        """
+
+        opts = field.opts
+        b = self.builder
+
+        if not self.can_compile(field):
+            return ['try:',
+                    '    %s.marshal(session)' % b.ref(field, prefix='_field'),
+                    'except _FieldInvalid as e:',
+                    '    errors[%r] = e.message' % field.name,
+                    'except _MappingInvalid as e:',
+                    '    errors[%r] = e.errors' % field.name]
+
+        lines = ['value = %s' % read_expr(b, field.opts._name_getter)]
+        indent = ''
+        if opts.default is not None:
+            lines.extend(['if value is None:',
+                          '    value = %s' % b.ref(opts.default)])
+        elif opts.required or not opts.allow_none:
+            error_type = 'required' if opts.required else 'none_not_allowed'
+            lines.extend(['if value is None:',
+                          '    ' + self.error(field, error_type),
+                          'else:'])
+            indent = '    '
+        else:
+            lines.append('if value is None:')
+            lines.extend('    ' + line for line in self.write(field))
+            lines.append('else:')
+            indent = '    '
+
+        for pipe_func in field.marshal_pipes[2:-1]:
+            for line in self.pipes[pipe_func](field):
+                lines.append(indent + line)
+                if line == 'else:':
+                    indent += '    '
+
+        lines.extend(indent + line for line in self.write(field))
+        return lines
+
+    def compile(self):
+        b = self.builder
+
+        b.emit('is_dict = _isinstance(data, _dict)')
+        b.emit('out_is_dict = _isinstance(output, _dict)')
+        if not all(self.can_compile(f) for f in self.fields):
+            b.emit('if mapper is None:')
+            b.emit('mapper = %s(data=data, obj=output, partial=%r)'
+                   % (b.ref(self.mapper_cls), self.partial), 2)
+            b.emit('session = mapper.get_mapper_session(data, output)')
+        if self.partial:
+            b.emit('keys = data.keys()')
+
+        for field in self.fields:
+            indent = 1
+            if self.partial:
+                # Partial updates only marshal the fields present in data.
+                b.emit('if %r in keys:' % field.name)
+                indent = 2
+            for line in self.field_lines(field):
+                stripped = line.lstrip(' ')
+                b.emit(stripped, indent + (len(line) - len(stripped)) // 4)
+
+        if not self.fields:
+            b.emit('pass')
+
+        return b.build('data, output, errors, mapper=None')
+
+
+def compile_marshaler(mapper_cls, fields, role_name='__default__',
+                      partial=False):
+    """Generate a specialised marshal function for ``fields`` of
+    ``mapper_cls``.
+
+    Read only fields never write to the output of a marshal and are left
+    out of the generated function.
+
+    :param mapper_cls: the :class:`kim.mapper.Mapper` class being compiled
+    :param fields: ordered list of :class:`kim.field.Field` to marshal
+    :param role_name: name of the role used, only used to name the function
+    :param partial: only marshal the fields present in the data
+    :returns: function taking ``(data, output, errors, mapper=None)``
+    """
+
+    fields = [f for f in fields
+              if not (f.opts.read_only and f.marshal_pipes and
+                      f.marshal_pipes[0] is read_only)]
+    return MarshalerCompiler(
+        mapper_cls, fields, role_name, partial=partial).compile()
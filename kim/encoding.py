@@ -0,0 +1,467 @@
+# kim/encoding.py
+# Copyright (C) 2014-2016 the Kim authors and contributors
+# <see AUTHORS file>
+#
+# This module is part of Kim and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+import codecs
+import io
+import json
+import re
+
+import six
+
+from .compiler import serialize_kind, compile_serializer
+
+#: Number of characters buffered before JSON is written to a stream or
+#: yielded as a chunk of bytes.
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+#: Largest JSON value, in characters, :func:`iter_json_values` buffers while
+#: waiting for the rest of the value to be read.
+DEFAULT_MAX_VALUE_SIZE = 64 * 1024 * 1024
+
+_encoder = json.JSONEncoder()
+
+#: Encode a single python value the same way :func:`json.dumps` would.
+encode = _encoder.encode
+
+_decoder = json.JSONDecoder()
+
+_whitespace = re.compile(r'[ \t\n\r]*')
+_number_tail = re.compile(r'[0-9.eE+\-]*')
+_error_position = re.compile(r'\(char (\d+)\)')
+
+# Kinds of entries in a JSONPlan
+_VALUE, _NESTED, _COLLECTION = 0, 1, 2
+
+
+class JSONPlan(object):
+    """Describes how to write an object serialized by a Mapper and role
+    directly as JSON.
+
+    Keys are encoded once, when the plan is created.  Objects without nested
+    fields are encoded in one go from the output of a single serialize
+    function generated for the plan.  Otherwise values of
+    :class:`kim.field.Nested` fields and of :class:`kim.field.Collection`
+    fields wrapping a Nested field are written by recursing into the nested
+    Mapper, every other field is taken from the output of the serialize
+    function.
+
+    .. version-added: 1.2.0
+    """
+
+    __slots__ = ('mapper_cls', 'plan', 'entries', 'leaf', 'values',
+                 'get_compiled')
+
+    def __init__(self, mapper_cls, plan, role, deferred_role=None):
+        """Instantiate a new instance of :class:`JSONPlan`
+
+        :param mapper_cls: the :class:`kim.mapper.Mapper` being serialized
+        :param plan: the :class:`kim.mapper.FieldPlan` of the role
+        :param role: name of a role or a :class:`kim.role.Role` instance
+        :param deferred_role: optional :class:`kim.role.Role` intersected
+            with ``role``
+        """
+
+        self.mapper_cls = mapper_cls
+        self.plan = plan
+        self.entries = []
+
+        values = []
+        for i, field in enumerate(plan.fields):
+            prefix = ('{' if i == 0 else ', ') + encode(field.name) + ': '
+            kind = serialize_kind(field)
+            if kind == 'nested':
+                self.entries.append((_NESTED, prefix, field))
+            elif kind == 'collection' and \
+                    serialize_kind(field.opts.field) == 'nested':
+                self.entries.append((_COLLECTION, prefix, field))
+            else:
+                self.entries.append((_VALUE, prefix, field))
+                values.append(field)
+
+        self.values = values
+        # Objects without nested fields are small enough to be encoded in one
+        # go by the json module.
+        self.leaf = len(values) == len(self.entries)
+
+        # The serialize function is compiled once the role is hot, like the
+        # serializer of the Mapper, which leaf plans share.
+        if self.leaf:
+            def get_compiled():
+                return mapper_cls._get_serializer(
+                    role, deferred_role=deferred_role)
+        else:
+            key = ('json', mapper_cls._plan_key(
+                role, deferred_role=deferred_role, plan=plan))
+            role_name = role if isinstance(role, six.string_types) \
+                else 'role'
+
+            def compile_func():
+                return compile_serializer(
+                    mapper_cls, values, role_name='json_%s' % role_name)
+
+            def get_compiled():
+                return mapper_cls._get_compiled(
+                    mapper_cls._serializers, key, compile_func)
+
+        self.get_compiled = get_compiled
+
+    def serialize_values(self, data, mapper=None):
+        """Return the output of the fields of the plan written from a
+        serialized dict, compiled once the role is hot.
+
+        :param data: the object being serialized
+        :param mapper: an existing instance of the Mapper for ``data``
+        :rtype: dict
+        """
+
+        serialize = self.get_compiled()
+        if serialize is not None:
+            return serialize(data, mapper)
+
+        if mapper is None:
+            mapper = self.mapper_cls(obj=data)
+        output = {}
+        session = mapper.get_mapper_session(data, output)
+        for field in self.values:
+            field.serialize(session)
+        return output
+
+
+def get_json_plan(mapper_cls, role='__default__', deferred_role=None):
+    """Return the :class:`JSONPlan` of ``mapper_cls`` for ``role``, creating
+    it the first time the role is used.  Plans are recreated whenever the
+    fields of the role change.
+
+    :raises: :class:`kim.exception.MapperError`
+    :rtype: :class:`JSONPlan`
+    """
+
+    plan = mapper_cls._get_plan(role, deferred_role=deferred_role)
+    key = mapper_cls._plan_key(role, deferred_role=deferred_role, plan=plan)
+    json_plan = mapper_cls._json_plans.get(key)
+    if json_plan is None or json_plan.plan is not plan:
+        json_plan = mapper_cls._json_plans[key] = JSONPlan(
+            mapper_cls, plan, role, deferred_role=deferred_role)
+
+    return json_plan
+
+
+def iter_json(mapper_cls, obj, role='__default__', deferred_role=None,
+              mapper=None):
+    """Yield the JSON text of ``obj`` serialized by ``mapper_cls`` in small
+    pieces, without building the serialized dict of nested objects.
+
+    The output is identical to ``json.dumps(mapper.serialize(role=role))``.
+    Mappers that can't be planned, for instance because they override
+    :meth:`kim.mapper.Mapper.serialize`, are serialized as usual and then
+    encoded.
+
+    :param mapper_cls: :class:`kim.mapper.Mapper` class
+    :param obj: the object to serialize
+    :param role: name of a role or a :class:`kim.role.Role` instance
+    :param deferred_role: optional :class:`kim.role.Role` intersected with
+        ``role``
+    :param mapper: an existing instance of the Mapper for ``obj``
+    :returns: generator of strings
+    """
+
+    if mapper is None and getattr(mapper_cls, '_polymorphic_base', False):
+        # The concrete mapper depends on the object
+        mapper = mapper_cls(obj=obj)
+    if mapper is not None:
+        mapper_cls = type(mapper)
+
+    if not mapper_cls._supports_json_streaming() or \
+            (mapper is not None and mapper.raw):
+        if mapper is None:
+            mapper = mapper_cls(obj=obj)
+        yield encode(mapper.serialize(role=role, deferred_role=deferred_role))
+        return
+
+    plan = get_json_plan(mapper_cls, role, deferred_role=deferred_role)
+    values = plan.serialize_values(obj, mapper)
+    if plan.leaf:
+        yield encode(values)
+        return
+
+    for kind, prefix, field in plan.entries:
+        yield prefix
+        if kind == _VALUE:
+            yield encode(values[field.name])
+            continue
+
+        value = field.opts._source_getter(obj)
+        if value is None:
+            if kind == _NESTED:
+                yield encode(field.opts.null_default)
+            else:
+                yield 'null'
+        elif kind == _NESTED:
+            for piece in iter_json(field.get_mapper(as_class=True), value,
+                                   role=field.opts.role):
+                yield piece
+        else:
+            wrapped = field.opts.field
+            nested_cls = wrapped.get_mapper(as_class=True)
+            separator = '['
+            for item in value:
+                yield separator
+                separator = ', '
+                if item is None:
+                    yield encode(wrapped.opts.null_default)
+                else:
+                    for piece in iter_json(nested_cls, item,
+                                           role=wrapped.opts.role):
+                        yield piece
+            yield '[]' if separator == '[' else ']'
+
+    yield '}' if plan.entries else '{}'
+
+
+def iter_json_array(mapper_cls, objs, role='__default__', deferred_role=None,
+                    get_mapper=None):
+    """Yield the JSON text of a list of ``objs`` serialized by
+    ``mapper_cls``.  ``objs`` may be any iterable and is only iterated once.
+
+    :param get_mapper: optional function returning the Mapper instance to
+        use for each object
+    :returns: generator of strings
+    """
+
+    separator = '['
+    for obj in objs:
+        yield separator
+        separator = ', '
+        mapper = get_mapper(obj) if get_mapper is not None else None
+        for piece in iter_json(mapper_cls, obj, role=role,
+                               deferred_role=deferred_role, mapper=mapper):
+            yield piece
+
+    yield '[]' if separator == '[' else ']'
+
+
+def _is_binary(stream):
+    if isinstance(stream, io.TextIOBase):
+        return False
+    mode = getattr(stream, 'mode', None)
+    if isinstance(mode, six.string_types):
+        return 'b' in mode
+    return isinstance(stream, (io.BufferedIOBase, io.RawIOBase))
+
+
+def write_json(pieces, stream, buffer_size=DEFAULT_BUFFER_SIZE):
+    """Write the strings in ``pieces`` to ``stream`` in blocks of about
+    ``buffer_size`` characters.  Binary streams are written UTF-8 encoded
+    bytes.
+
+    :param pieces: iterable of strings, eg. from :func:`iter_json`
+    :param stream: file like object with a ``write`` method
+    :returns: None
+    """
+
+    binary = _is_binary(stream)
+    for chunk in iter_chunks(pieces, buffer_size=buffer_size, binary=binary):
+        stream.write(chunk)
+
+
+def iter_chunks(pieces, buffer_size=DEFAULT_BUFFER_SIZE, binary=True):
+    """Join the strings in ``pieces`` into chunks of about ``buffer_size``
+    characters.
+
+    :param pieces: iterable of strings, eg. from :func:`iter_json`
+    :param binary: yield UTF-8 encoded bytes rather than strings
+    :returns: generator of bytes or strings
+    """
+
+    buf = []
+    size = 0
+    for piece in pieces:
+        buf.append(piece)
+        size += len(piece)
+        if size >= buffer_size:
+            chunk = ''.join(buf)
+            yield chunk.encode('utf-8') if binary else chunk
+            buf = []
+            size = 0
+
+    if buf:
+        chunk = ''.join(buf)
+        yield chunk.encode('utf-8') if binary else chunk
+
+
+class _Reader(object):
+    """Buffers text read from a file like object, decoding bytes as UTF-8."""
+
+    def __init__(self, fp, buffer_size, max_value_size=DEFAULT_MAX_VALUE_SIZE):
+
+        self.fp = fp
+        self.buffer_size = buffer_size
+        self.max_value_size = max_value_size
+        self.decoder = None
+        self.buf = u''
+        self.pos = 0
+        #: Number of characters read and discarded before ``buf``.
+        self.offset = 0
+        self.eof = False
+
+    def fill(self):
+        """Read more text into the buffer, discarding what was consumed.
+        Reads grow with the buffer so large values are decoded in a linear
+        number of attempts.
+
+        :returns: False once the end of the stream was reached
+        """
+
+        if self.eof:
+            return False
+
+        chunk = self.fp.read(max(self.buffer_size, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+        if isinstance(chunk, bytes):
+            # Partial characters are held back by the decoder until the next
+            # read, so the text may be empty before the end of the stream.
+            if self.decoder is None:
+                self.decoder = codecs.getincrementaldecoder('utf-8-sig')()
+            chunk = self.decoder.decode(chunk, final=self.eof)
+        if not chunk:
+            # Leave the buffer alone so errors raised decoding it still
+            # point into it
+            return not self.eof
+
+        self.offset += self.pos
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return not self.eof
+
+    def skip_whitespace(self):
+        """Skip whitespace, reading more text as required.
+
+        :returns: the next character or an empty string at the end of the
+            stream
+        """
+
+        while True:
+            self.pos = _whitespace.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return u''
+
+    def decode(self):
+        """Decode the next complete JSON value, reading more text as required.
+        A value failing to decode may be cut off by the end of the buffer, so
+        more text is read until the value decodes, the end of the stream is
+        reached or the value is larger than ``max_value_size``.
+
+        :raises: ValueError
+        """
+
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except ValueError as e:
+                if self._fill_value():
+                    continue
+                raise self.error(e)
+
+            # A number at the end of the buffer may continue in the next read,
+            # eg. '12' of '12.5e3'.
+            if _number_tail.match(self.buf, end).end() == len(self.buf) and \
+                    self._fill_value():
+                continue
+
+            self.pos = end
+            return value
+
+    def error(self, error, pos=None):
+        """Return a ValueError for ``error``, an exception raised decoding
+        the buffer or a message, giving its position in the stream.
+
+        :param pos: position of the error in the buffer, read from ``error``
+            when it's an exception
+        :rtype: ValueError
+        """
+
+        message = getattr(error, 'msg', None)
+        if message is None:
+            message = str(error)
+            # python 2 only gives the position in the message
+            match = _error_position.search(message)
+            if match is not None:
+                pos = int(match.group(1))
+                message = message.split(':', 1)[0]
+        else:
+            pos = error.pos
+
+        if pos is None:
+            return ValueError(message)
+        return ValueError('%s (char %d)' % (message, self.offset + pos))
+
+    def _fill_value(self):
+        """Read more of the value being decoded.
+
+        :raises: ValueError if the value is larger than ``max_value_size``
+        :returns: False once the end of the stream was reached
+        """
+
+        if len(self.buf) - self.pos > self.max_value_size:
+            raise ValueError('JSON value is larger than %d characters'
+                             % self.max_value_size)
+        return self.fill()
+
+
+def iter_json_values(fp, buffer_size=DEFAULT_BUFFER_SIZE,
+                     max_value_size=DEFAULT_MAX_VALUE_SIZE):
+    """Incrementally decode the elements of a top level JSON array, or the
+    values of a newline delimited JSON document, read from ``fp``.  Only the
+    element being decoded is held in memory.
+
+    Documents starting with ``[`` are read as a single JSON array, whose
+    elements are yielded as they're decoded, so the values of newline
+    delimited JSON must not be arrays and such documents are rejected once
+    the data after the first array is reached.
+
+    :param fp: file like object opened in text or binary mode.  Bytes are
+        decoded as UTF-8
+    :param buffer_size: number of characters read from ``fp`` at a time
+    :param max_value_size: largest value, in characters, that may be read
+    :raises: ValueError if ``fp`` is not valid JSON or holds a value larger
+        than ``max_value_size``
+    :returns: generator of decoded values
+
+    .. version-added: 1.2.0
+    """
+
+    reader = _Reader(fp, buffer_size, max_value_size=max_value_size)
+    char = reader.skip_whitespace()
+    if char != u'[':
+        # Newline delimited JSON, or any whitespace separated values
+        while char:
+            yield reader.decode()
+            char = reader.skip_whitespace()
+        return
+
+    reader.pos += 1
+    if reader.skip_whitespace() == u']':
+        reader.pos += 1
+    else:
+        while True:
+            yield reader.decode()
+            char = reader.skip_whitespace()
+            reader.pos += 1
+            if char == u']':
+                break
+            if char != u',':
+                raise reader.error(
+                    "Expecting ',' delimiter or ']' in JSON array",
+                    reader.pos - 1)
+            reader.skip_whitespace()
+
+    if reader.skip_whitespace():
+        raise reader.error('Extra data after JSON array, newline delimited '
+                           'JSON values must not be arrays', reader.pos)
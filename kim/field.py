@@ -7,8 +7,12 @@
 
 from collections import defaultdict
 
+import six
+
 from .exception import FieldError, FieldInvalid, FieldOptsError
-from .utils import set_creation_order
+from .utils import (
+    set_creation_order, get_config_version, attr_or_key_getter,
+    attr_or_key_setter)
 from .pipelines import (
     StringMarshalPipeline, StringSerializePipeline,
     StaticSerializePipeline,
@@ -20,7 +24,7 @@ from .pipelines import (
     DateMarshalPipeline, DateSerializePipeline,
     DecimalSerializePipeline, DecimalMarshalPipeline,
 )
-from .pipelines.base import run_pipeline, Session
+from .pipelines.base import optimize_pipes, pipeline_runner, Session
 from .pipelines.marshaling import MarshalPipeline
 from .pipelines.serialization import SerializePipeline
 
@@ -58,6 +62,9 @@ class FieldOpts(object):
 
     extra_error_msgs = {}
 
+    #: :class:`kim.utils.ConfigVersion` of the field these options belong to.
+    _config_version = None
+
     def __init__(self, **opts):
         """ Construct a new instance of :class:`FieldOpts`
         and set config options
@@ -82,6 +89,10 @@ class FieldOpts(object):
         :param extra_marshal_pipes: dict of lists containing extra Pipe functions
             to be run at the end of each stage when marshaling.
             eg ``{'validate': [my_pipe, my_other_pipe]}```
+        :param io_bound: Specify that reading this field waits on I/O, such as a
+            property hitting a cache server, so it's resolved concurrently when
+            an ``executor`` is passed to :meth:`kim.mapper.Mapper.serialize`.
+            Defaults to True for Nested fields and Collections of them.
 
         :raises: :class:`.FieldOptsError`
         :returns: None
@@ -111,6 +122,7 @@ class FieldOpts(object):
         self.allow_none = opts.pop('allow_none', True)
         self.read_only = opts.pop('read_only', False)
         self.choices = opts.pop('choices', None)
+        self.io_bound = opts.pop('io_bound', None)
 
         self.extra_marshal_pipes = \
             opts.pop('extra_marshal_pipes', defaultdict(list))
@@ -119,6 +131,37 @@ class FieldOpts(object):
 
         self.validate()
 
+    def __setattr__(self, name, value):
+        """Bump the :class:`kim.utils.ConfigVersion` of the field whenever a
+        public option is set so compiled mappers using this field are
+        deoptimized, and precompile the accessors used to read and write
+        ``name`` and ``source``.
+        """
+
+        if not name.startswith('_') and self._config_version is not None:
+            self._config_version.bump()
+            self._track(value)
+        super(FieldOpts, self).__setattr__(name, value)
+
+        # Keep the precompiled accessors in step with name and source
+        if name == 'name':
+            self._name_getter = \
+                attr_or_key_getter(value) if value is not None else None
+        elif name == 'source':
+            if value is not None:
+                self._source_getter = attr_or_key_getter(value)
+                self._source_setter = attr_or_key_setter(value)
+            else:
+                self._source_getter = self._source_setter = None
+
+    def _track(self, value):
+        """Bump the version of the field when ``value``, a field wrapped by
+        the field, such as the field of a :class:`Collection`, changes.
+        """
+
+        if isinstance(value, Field):
+            get_config_version(value).add_dependent(self._config_version)
+
     def validate(self):
         """Allow users to perform checks for required config options.  Concrete
         classes should raise :class:`.FieldError` when invalid configuration
@@ -201,6 +244,9 @@ class Field(object):
     #: The Fields serialization pipeline
     serialize_pipeline = SerializePipeline
 
+    #: :class:`kim.utils.ConfigVersion` of the field, shared with its opts.
+    _config_version = None
+
     def __init__(self, *args, **field_opts):
         """Constructs a new instance of Field.  Each Field accepts a set of
         kwargs that will be passed directly to the fields
@@ -231,6 +277,87 @@ class Field(object):
         self.serialize_pipes = self.serialize_pipeline.get_pipeline(
             **self.opts.extra_serialize_pipes
         )
+        self._optimized_pipes = {}
+
+    def __setattr__(self, name, value):
+        """Bump the :class:`kim.utils.ConfigVersion` of the field whenever a
+        public attribute, such as the fields pipelines, is set.
+        """
+
+        if not name.startswith('_') and self._config_version is not None:
+            self._config_version.bump()
+        super(Field, self).__setattr__(name, value)
+
+        if name == 'opts':
+            value._config_version = get_config_version(self)
+            for option in list(vars(value).values()):
+                value._track(option)
+
+    def get_optimized_pipes(self, stage):
+        """Return the pipes run when marshaling or serializing this field.
+
+        The pipes of :attr:`marshal_pipes` or :attr:`serialize_pipes` are
+        passed through :func:`kim.pipelines.base.optimize_pipes`, removing
+        pipes that would do nothing given the options of this field.  The
+        result is cached until the configuration of the field changes.
+
+        :param stage: either ``marshal`` or ``serialize``
+        :raises: :class:`FieldError`
+        :returns: tuple of pipe functions
+
+        .. version-added: 1.2.0
+        """
+
+        return self._get_runner(stage).pipes
+
+    def _get_runner(self, stage):
+        """Return the :func:`kim.pipelines.base.pipeline_runner` for the
+        optimized pipes of ``stage``.
+        """
+
+        try:
+            version, runner = self._optimized_pipes[stage]
+        except KeyError:
+            if stage not in ('marshal', 'serialize'):
+                raise FieldError('stage must be marshal or serialize, got %s'
+                                 % stage)
+        else:
+            if version == self._config_version.value:
+                return runner
+
+        version = self._config_version.value
+        runner = pipeline_runner(
+            optimize_pipes(getattr(self, stage + '_pipes'), self))
+        self._optimized_pipes[stage] = (version, runner)
+        return runner
+
+    def _run(self, stage, mapper_session, parent):
+        """Run the pipes of ``stage`` for this field.
+
+        Mapper sessions hold a single field :class:`Session` which is reused
+        for every field unless it's already in use, for instance by a pipe
+        running another field with the same mapper session.
+        """
+
+        runner = self._get_runner(stage)
+        session = getattr(mapper_session, 'field_session', None)
+        if session is None or session.field is not None:
+            session = Session(
+                self, mapper_session.data, mapper_session.output,
+                mapper_session=mapper_session,
+                parent=parent)
+            runner(session)
+            return
+
+        session.field = self
+        session.data = mapper_session.data
+        session.output = mapper_session.output
+        session.parent = parent
+        session.nested_mapper = None
+        try:
+            runner(session)
+        finally:
+            session.field = None
 
     def get_error(self, error_type):
         """Return the error message for ``error_type`` from the error messages defined on
@@ -313,12 +440,7 @@ class Field(object):
             :meth:`kim.mapper.Mapper.marshal`
         """
 
-        parent = opts.get('parent_session', None)
-        session = Session(
-            self, mapper_session.data, mapper_session.output,
-            mapper_session=mapper_session,
-            parent=parent)
-        run_pipeline(self.marshal_pipes, session, self, **opts)
+        self._run('marshal', mapper_session, opts.get('parent_session', None))
 
     def serialize(self, mapper_session, **opts):
         """Run the serialize :class:`Pipeline` for this field for the given `data` and
@@ -332,13 +454,7 @@ class Field(object):
         .. seealso::
             :meth:`kim.mapper.Mapper.serialize`
         """
-        parent = opts.get('parent_session', None)
-        session = Session(
-            self, mapper_session.data, mapper_session.output,
-            mapper_session=mapper_session,
-            parent=parent)
-
-        run_pipeline(self.serialize_pipes, session, self, **opts)
+        self._run('serialize', mapper_session, opts.get('parent_session', None))
 
 
 class String(Field):
@@ -524,6 +640,15 @@ class NestedFieldOpts(FieldOpts):
             create a new instance.
         :param allow_partial_updates: Allow existing object to be updated using a subset
             of the fields defined on the Nested field.
+        :param batch_getter: provide a function taking a list of keys which returns
+            a dict of key to object, used instead of ``getter`` to load the objects
+            of every item of a Collection, or of a :meth:`MapperIterator.marshal`
+            batch, at once.  Objects are memoised for the duration of the marshal
+            so each key is only loaded once.
+        :param batch_key: the key of the data passed to ``batch_getter``, either the
+            name of a key in the data, defaulting to ``id``, or a function taking the
+            data and returning the key.
+        :raises: :class:`.FieldOptsError`
         """
         self.mapper = mapper_or_mapper_name
         self.role = kwargs.pop('role', '__default__')
@@ -535,8 +660,17 @@ class NestedFieldOpts(FieldOpts):
         self.allow_partial_updates = kwargs.pop(
             'allow_partial_updates', False)
         self.allow_create = kwargs.pop('allow_create', False)
+        self.batch_getter = kwargs.pop('batch_getter', None)
+        batch_key = kwargs.pop('batch_key', 'id')
+        if not callable(batch_key):
+            batch_key = attr_or_key_getter(batch_key)
+        self.batch_key = batch_key
         super(NestedFieldOpts, self).__init__(**kwargs)
 
+        if self.getter is not None and self.batch_getter is not None:
+            raise FieldOptsError('getter and batch_getter can not be used '
+                                 'together')
+
 
 class Nested(Field):
     """:class:`Nested` represents an object that is represented by another
@@ -615,7 +749,25 @@ class CollectionFieldOpts(FieldOpts):
             may be any :class:`Field` type.
         :param unique_on: Specify a key that is used to check the collection
             for duplicates.
-
+        :param match_on: name of the field of the nested mapper, or of an
+            attribute, pairing each item of the data with the existing element
+            of a collection of :class:`Nested` fields when marshaling.  Keys
+            in the data are converted by the field before being compared,
+            see :class:`kim.pipelines.collection.KeyIndex`.  Elements are
+            paired by position when not set.
+        :param limit: maximum number of elements serialized.  The limit and
+            ``offset`` are applied to the query of sources with ``limit`` and
+            ``offset`` methods, such as SQLAlchemy dynamic relationships, so
+            only those rows are loaded.
+        :param offset: number of elements skipped when serializing
+        :param paginate: serialize a dict of the ``items`` and of the offset
+            of the ``next`` page, or None on the last page, rather than a list
+        :param count: include the ``total`` number of elements when
+            paginating.  Queries are counted with an extra ``COUNT`` query
+
+        .. version-changed: 1.2.0
+            Added ``match_on``, ``limit``, ``offset``, ``paginate`` and
+            ``count``
         """
         self.field = field
         try:
@@ -628,6 +780,11 @@ class CollectionFieldOpts(FieldOpts):
 
         self.field.opts._is_wrapped = True
         self.unique_on = kwargs.pop('unique_on', None)
+        self.match_on = kwargs.pop('match_on', None)
+        self.limit = kwargs.pop('limit', None)
+        self.offset = kwargs.pop('offset', 0)
+        self.paginate = kwargs.pop('paginate', False)
+        self.count = kwargs.pop('count', False)
         super(CollectionFieldOpts, self).__init__(**kwargs)
 
     def set_name(self, *args, **kwargs):
@@ -661,6 +818,20 @@ class CollectionFieldOpts(FieldOpts):
             raise FieldOptsError('Collection requires a valid Field '
                                  'instance as its first argument')
 
+        if self.match_on is not None and not isinstance(self.field, Nested):
+            raise FieldOptsError('match_on requires a Collection of '
+                                 'Nested fields')
+
+        for name in ('limit', 'offset'):
+            value = getattr(self, name)
+            if value is not None and (
+                    not isinstance(value, six.integer_types) or value < 0):
+                raise FieldOptsError('%s must be a non-negative integer'
+                                     % name)
+
+        if (self.paginate or self.count) and self.limit is None:
+            raise FieldOptsError('paginate and count require a limit')
+
 
 class Collection(Field):
     """:class:`Collection` represents collection of other field types,
@@ -9,14 +9,34 @@ import warnings
 import weakref
 import six
 import inspect
+import itertools
+import threading
 
-from collections import OrderedDict, defaultdict
+from collections import OrderedDict, defaultdict, namedtuple
 
 from .exception import MapperError, MappingInvalid
-from .field import Field, FieldError, FieldInvalid
+from .field import (
+    Field, FieldError, FieldInvalid, Nested, Collection, DEFAULT_ERROR_MSGS)
+from .compiler import (
+    compile_serializer, compile_marshaler, is_overridden, CompiledEntry)
+from .encoding import (
+    iter_json, iter_json_array, iter_chunks, iter_json_values, write_json,
+    DEFAULT_BUFFER_SIZE)
+from .parallel import (
+    map_chunks, serialize_chunk, serialize_json_chunk, marshal_chunk,
+    iter_marshal_file, DEFAULT_PARALLEL_CHUNK_SIZE, _chunks)
 from .role import whitelist, blacklist, Role
-from .utils import recursive_defaultdict, attr_or_key
-from .pipelines.base import pipe
+from .rows import row_reader, get_row_columns, get_role_columns
+from .utils import (
+    recursive_defaultdict, attr_or_key, config_version,
+    TrackedDict, TrackedOrderedDict, LRUCache, _new_config_version)
+from .pipelines.base import pipe, Session
+from .pipelines.nested import batch_load
+from .pipelines.collection import KeyIndex
+
+# Held while compiling so threads sharing a Mapper compile each role once.
+# Reentrant as compiling a Mapper may compile its nested Mappers.
+_compile_lock = threading.RLock()
 
 
 def mapper_is_defined(mapper_name):
@@ -79,6 +99,30 @@ def add_class_to_registry(classname, cls):
         _MapperConfig.MAPPER_REGISTRY[classname] = cls
 
 
+def get_compilation_stats():
+    """Return the compilation statistics of every registered Mapper that has
+    been used.
+
+    :returns: dict of mapper name to :meth:`Mapper.compilation_stats`
+    :rtype: dict
+
+    Usage::
+
+        >>> get_compilation_stats()
+        {'UserMapper': {'serialize': {'public': {'calls': 120, 'compiled': True,
+                                                 ...}},
+                        'marshal': {}}}
+    """
+
+    stats = {}
+    for name, mapper in list(_MapperConfig.MAPPER_REGISTRY.items()):
+        mapper_stats = mapper.compilation_stats()
+        if mapper_stats['serialize'] or mapper_stats['marshal']:
+            stats[name] = mapper_stats
+
+    return stats
+
+
 # TODO(mike) __docs__
 class _MapperConfig(object):
 
@@ -94,6 +138,15 @@ class _MapperConfig(object):
         self.dict = dict_
         self.cls = cls_
 
+        # Each Mapper class has its own version, bumped when its fields,
+        # roles or attributes change and when those of its bases change.
+        version = _new_config_version()
+        for base in self.cls.__mro__[1:]:
+            base_version = base.__dict__.get('_config_version')
+            if base_version is not None:
+                base_version.add_dependent(version)
+        self.cls._config_version = version
+
         for base in reversed(self.cls.__mro__):
             self._extract_defined_pipes(base)
             self._extract_fields(base)
@@ -108,6 +161,14 @@ class _MapperConfig(object):
 
         self._remove_fields()
 
+        # Compiled serializers and marshalers are cached per class, make sure
+        # subclasses never share the cache of their parent.
+        size = self.cls.__cache_size__
+        self.cls._serializers = LRUCache(size)
+        self.cls._marshalers = LRUCache(size)
+        self.cls._plans = PlanCache(size, version)
+        self.cls._json_plans = LRUCache(size)
+
         for base in reversed(self.cls.__mro__):
             self._set_polymorphic_base(base)
 
@@ -261,8 +322,9 @@ class _MapperConfig(object):
                 self._set_field_pipes(obj, cls.defined_processors, 'process')
                 self._set_field_pipes(obj, cls.defined_outputs, 'output')
 
-        cls.fields = OrderedDict(
-            sorted(_fields.items(), key=lambda o: o[1]._creation_order))
+        cls.fields = TrackedOrderedDict(
+            sorted(_fields.items(), key=lambda o: o[1]._creation_order),
+            version=cls._config_version)
 
     def _extract_roles(self, base):
         """update ``roles`` with any roles defined previously in
@@ -294,7 +356,7 @@ class _MapperConfig(object):
                                             type(role))
                 raise MapperError(msg)
 
-        cls.roles = _roles
+        cls.roles = TrackedDict(_roles, version=cls._config_version)
 
 
 # TODO(mike) __docs__
@@ -304,32 +366,208 @@ class MapperMeta(type):
         _MapperConfig.setup_mapping(cls, classname, dict_)
         type.__init__(cls, classname, bases, dict_)
 
+    def __setattr__(cls, name, value):
+        # Changing the configuration of a Mapper deoptimizes its compiled
+        # mappers and those of its subclasses
+        version = cls.__dict__.get('_config_version')
+        if version is not None:
+            version.bump()
+        type.__setattr__(cls, name, value)
+
+    def __delattr__(cls, name):
+        version = cls.__dict__.get('_config_version')
+        if version is not None:
+            version.bump()
+        type.__delattr__(cls, name)
+
 
 class MapperSession(object):
     """Object that represents the state of a :class:`Mapper` during the execution of
     marshaling and serialization :class:`Pipeline`.
     """
 
-    __slots__ = ('mapper', 'data', 'output', 'partial')
+    __slots__ = ('mapper', 'data', 'output', 'partial', 'changes',
+                 'field_session')
 
-    def __init__(self, mapper, data, output, partial=None):
+    def __init__(self, mapper, data, output, partial=None, changes=None):
         """Instantiate a new instance of :class:`MapperSession`
 
         :param mapper: :class:`Mapper <Mapper>` instance.
         :param data: The data marshaled by the :class:`Mapper`
         :param output: The object the :class:`Mapper` is outputting  to.
+        :param changes: dict the changes made to ``output`` are recorded in
+            when tracking changes
         :return: None
         :rtype: None
 
         .. seealso::
             get_mapper_session method :func:`~Mapper.get_mapper_session`
 
+        .. version-changed: 1.2.0
+            Added ``changes``
         """
 
         self.mapper = mapper
         self.data = data
         self.output = output
         self.partial = partial
+        self.changes = changes
+
+        #: :class:`kim.pipelines.base.Session` reused by each field run with
+        #: this mapper session.
+        self.field_session = Session(mapper_session=self)
+
+
+def _is_marshaled(field):
+    """Return False if marshaling ``field`` would never do anything, such as
+    for a read only field, which can then be left out of marshal plans.
+    """
+
+    return is_overridden(type(field), Field, 'marshal') or \
+        bool(field.get_optimized_pipes('marshal'))
+
+
+def _is_io_bound(field):
+    """Return True if ``field`` should be resolved concurrently when
+    serializing with an executor.
+    """
+
+    if field.opts.io_bound is not None:
+        return field.opts.io_bound
+
+    return isinstance(field, Nested) or (
+        isinstance(field, Collection) and
+        isinstance(field.opts.field, Nested))
+
+
+def _mapping_tree(fields):
+    """Return nested dicts of the parents of the dotted sources of
+    ``fields``, eg. ``{'profile': {}}`` for a field sourced from
+    ``profile.name``.
+    """
+
+    tree = {}
+    for field in fields:
+        node = tree
+        for component in field.opts.source.split('.')[:-1]:
+            node = node.setdefault(component, {})
+
+    return tree
+
+
+class _Mapping(dict):
+    """dict whose keys may also be read and set as attributes, so
+    :meth:`Mapper.validate` overrides written for objects of ``__type__``
+    work with the mappings of ``as_mappings``.
+    """
+
+    __slots__ = ()
+
+    def __getattr__(self, name):
+
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+
+        self[name] = value
+
+
+def _new_mapping(tree):
+
+    return _Mapping((key, _new_mapping(node)) for key, node in tree.items())
+
+
+def _flatten_mapping(mapping, tree, prefix='', output=None):
+    """Flatten the dicts created from ``tree`` into ``output``, joining the
+    keys of dotted sources with ``__``.
+    """
+
+    if output is None:
+        output = {}
+
+    for key, value in mapping.items():
+        if key in tree and isinstance(value, dict):
+            _flatten_mapping(value, tree[key], prefix + key + '__', output)
+        else:
+            output[prefix + key] = value
+
+    return output
+
+
+class FieldPlan(object):
+    """The fields of a :class:`Mapper` resolved for a role and deferred role.
+
+    .. version-added: 1.2.0
+    """
+
+    __slots__ = ('fields', 'names', 'marshal_fields', 'marshal_names',
+                 'version')
+
+    def __init__(self, fields, version):
+        """Instantiate a new instance of :class:`FieldPlan`
+
+        :param fields: :class:`Field` instances permitted by the role in the
+            order they were declared
+        :param version: value of the :class:`kim.utils.ConfigVersion` of the
+            Mapper class the plan was resolved against
+        """
+
+        self.fields = tuple(fields)
+        self.names = frozenset(f.name for f in self.fields)
+        self.marshal_fields = tuple(f for f in self.fields if _is_marshaled(f))
+        self.marshal_names = frozenset(f.name for f in self.marshal_fields)
+        self.version = version
+
+
+class PlanCache(LRUCache):
+    """Holds the :class:`FieldPlan` instances of a :class:`Mapper`, along
+    with statistics about how the cache is used.  Plans resolved against an
+    old version of the Mapper's configuration are discarded and the least
+    recently used plans are discarded once the cache is full.
+
+    .. version-added: 1.2.0
+    """
+
+    def __init__(self, maxsize=256, version=config_version):
+        """Instantiate a new instance of :class:`PlanCache`
+
+        :param maxsize: maximum number of plans to hold
+        :param version: :class:`kim.utils.ConfigVersion` of the Mapper
+        """
+
+        super(PlanCache, self).__init__(maxsize)
+        self.config_version = version
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def lookup(self, key):
+        """Return the valid plan stored at ``key`` or None."""
+
+        with self.lock:
+            plan = self.get(key)
+            if plan is not None:
+                if plan.version == self.config_version.value:
+                    self.hits += 1
+                    return plan
+                self.invalidations += 1
+                self.pop(key, None)
+
+            self.misses += 1
+            return None
+
+    def stats(self):
+        """Return the cache statistics as a dict."""
+
+        return {
+            'size': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+        }
 
 
 class Mapper(six.with_metaclass(MapperMeta, object)):
@@ -364,24 +602,35 @@ class Mapper(six.with_metaclass(MapperMeta, object)):
     #: dictionary containing the role definitions for this mapper.
     __roles__ = {}
 
+    #: Number of times a role has to be used before the Mapper compiles a
+    #: specialised function for it.  Set to None to never compile automatically.
+    __compile_threshold__ = 10
+
+    #: Maximum number of field plans, compiled functions and JSON plans cached
+    #: for the roles and deferred roles this Mapper is used with.
+    __cache_size__ = 256
+
     @classmethod
     def many(cls, **mapper_params):
         """Provide access to a :class:`MapperIterator` to allow multiple
         items to be mapped by a mapper.
 
         :param mapper_params: dict of params passed to each new instance of the mapper.
+            ``parallel`` and ``parallel_chunk_size`` are passed to the
+            :class:`MapperIterator` to map items in worker processes.
         :return: :class:`MapperIterator <MapperIterator>` object
         :rtype: :class:`MapperIterator`
 
         Usage::
 
             >>> mapper = Mapper.many(data=data).marshal()
+            >>> rows = Mapper.many(parallel=8).serialize(objs)
         """
 
         return MapperIterator(cls, **mapper_params)
 
     def __init__(self, obj=None, data=None, partial=False, raw=False,
-                 parent=None):
+                 parent=None, track_changes=False):
         """Initialise a Mapper with the object and/or the data to be
         serialzed/marshaled. Mappers must be instantiated once per object/data.
         At least one of obj or data must be passed.
@@ -394,10 +643,17 @@ class Mapper(six.with_metaclass(MapperMeta, object)):
             or fall back to standard checks.
         :param parent: The parent of this Mapper.  Set internally when a Mapper
             is being used as a nested field.
+        :param track_changes: when marshaling, only write values that differ
+            from the existing value of ``obj`` and record the changes in
+            :attr:`changes`.  Nested mappers track changes when their parent
+            does.
 
         :raises: :class:`MapperError`
         :returns: None
         :rtype: None
+
+        .. version-changed: 1.2.0
+            Added ``track_changes``
         """
 
         if obj is None and data is None:
@@ -411,6 +667,17 @@ class Mapper(six.with_metaclass(MapperMeta, object)):
         self.raw = raw
         self.partial = partial
         self.parent = parent
+        self.track_changes = track_changes or bool(
+            parent is not None and getattr(parent, 'track_changes', False))
+
+        #: Dict of the fields changed by the last call to :meth:`marshal`
+        #: when tracking changes, or None.  Values are tuples of the old and
+        #: new value, or the dict of changes of a Nested object updated in
+        #: place.
+        self.changes = None
+
+        # Objects loaded by the batch_getter of Nested fields
+        self._batch_memo = None
 
     @property
     def initial_errors(self):
@@ -441,7 +708,8 @@ class Mapper(six.with_metaclass(MapperMeta, object)):
         else:
             return self._get_mapper_type()()
 
-    def _get_role(self, name_or_role, deferred_role=None):
+    @classmethod
+    def _resolve_role(cls, name_or_role, deferred_role=None):
         """Resolve a string to a role and check it exists, or check a
         directly passed role is a Role instance and return it.
 
@@ -461,7 +729,7 @@ class Mapper(six.with_metaclass(MapperMeta, object)):
                     'overview': whitelist('id', 'name'),
                 }
 
-            mapper._get_role('overview', deferred_role=whitelist('id'))
+            mapper._resolve_role('overview', deferred_role=whitelist('id'))
 
         Deferred roles can be used for things like allowing end users to provide a list
         of fields they want back from your API but only if they appear in a role you've
@@ -476,10 +744,10 @@ class Mapper(six.with_metaclass(MapperMeta, object)):
         """
         if isinstance(name_or_role, six.string_types):
             try:
-                role = self.roles[name_or_role]
+                role = cls.roles[name_or_role]
             except KeyError:
                 raise MapperError("Role '%s' not found on %s" % (
-                                  name_or_role, self.__class__.__name__))
+                                  name_or_role, cls.__name__))
         elif isinstance(name_or_role, Role):
             role = name_or_role
         else:
@@ -496,6 +764,61 @@ class Mapper(six.with_metaclass(MapperMeta, object)):
         else:
             return role
 
+    def _get_role(self, name_or_role, deferred_role=None):
+        """Return the role to use for ``name_or_role`` and ``deferred_role``.
+
+        .. seealso::
+            :meth:`~Mapper._resolve_role`
+        """
+
+        return self._resolve_role(name_or_role, deferred_role=deferred_role)
+
+    @classmethod
+    def _role_key(cls, name_or_role, deferred_role=None):
+        """Return a hashable key identifying the combination of ``name_or_role``
+        and ``deferred_role``.  Roles are sets and so can not be used as
+        dictionary keys directly.
+
+        :raises: :class:`MapperError`
+        :returns: hashable key
+        """
+
+        if isinstance(name_or_role, six.string_types):
+            key = name_or_role
+        elif isinstance(name_or_role, Role):
+            key = (name_or_role.whitelist, frozenset(name_or_role))
+        else:
+            raise MapperError('role must be string or Role instance, got %s'
+                              % type(name_or_role))
+
+        if deferred_role is not None:
+            if not isinstance(deferred_role, Role):
+                raise MapperError('deferred_role must be instance of Role')
+
+            key = (key, deferred_role.whitelist, frozenset(deferred_role))
+
+        return key
+
+    @classmethod
+    def _plan_key(cls, name_or_role, deferred_role=None, plan=None):
+        """Return the key used to cache what is generated for the fields of
+        ``name_or_role`` and ``deferred_role``, such as compiled functions.
+        Like their :class:`FieldPlan`, deferred roles are keyed by the names
+        of the fields they resolve to.
+
+        :param plan: the :class:`FieldPlan` of ``name_or_role`` and
+            ``deferred_role`` when it has already been resolved
+        :raises: :class:`MapperError`
+        :returns: hashable key
+        """
+
+        if deferred_role is None:
+            return cls._role_key(name_or_role)
+
+        if plan is None:
+            plan = cls._get_plan(name_or_role, deferred_role=deferred_role)
+        return plan.names
+
     def _field_in_data(self, field):
         """Validate if a field.name appears in the provided data
 
@@ -508,6 +831,63 @@ class Mapper(six.with_metaclass(MapperMeta, object)):
                 return True
         return False
 
+    @classmethod
+    def _get_role_fields(cls, role):
+        """Return the list of :class:`Field` instances permitted by ``role``
+        in the order they were declared.
+
+        :param role: :class:`Role` instance
+        :rtype: list
+        """
+
+        return [f for name, f in six.iteritems(cls.fields) if name in role]
+
+    @classmethod
+    def _get_plan(cls, name_or_role, deferred_role=None):
+        """Return the :class:`FieldPlan` for ``name_or_role`` and
+        ``deferred_role``, resolving and caching it on the Mapper class the
+        first time a role is used.
+
+        Deferred roles are often built from user input for each request, so
+        equivalent deferred roles, resolving to the same field names, share a
+        single plan, which is also cached under those names.
+
+        :raises: :class:`MapperError`
+        :rtype: :class:`FieldPlan`
+        """
+
+        key = cls._role_key(name_or_role, deferred_role=deferred_role)
+        plan = cls._plans.lookup(key)
+        if plan is not None:
+            return plan
+
+        version = cls._config_version.value
+        role = cls._resolve_role(name_or_role, deferred_role=deferred_role)
+        fields = cls._get_role_fields(role)
+        if deferred_role is None:
+            plan = FieldPlan(fields, version)
+        else:
+            # Share the plan of an equivalent deferred role
+            names = frozenset(f.name for f in fields)
+            plan = cls._plans.get(names)
+            if plan is None or plan.version != version:
+                plan = cls._plans[names] = FieldPlan(fields, version)
+
+        cls._plans[key] = plan
+        return plan
+
+    @classmethod
+    def plan_cache_stats(cls):
+        """Return statistics about the cache of fields resolved for each
+        role used with this Mapper.
+
+        :returns: dict with ``size``, ``hits``, ``misses`` and
+            ``invalidations`` keys
+        :rtype: dict
+        """
+
+        return cls._plans.stats()
+
     def _get_fields(self, name_or_role, deferred_role=None, for_marshal=False):
         """Returns a list of :class:`Field` instances providing they are
         registered in the specified :class:`Role`.
@@ -517,23 +897,41 @@ class Mapper(six.with_metaclass(MapperMeta, object)):
 
         :param deferred_role: an instance of role used to dynamically a new role.
         :param name_or_role: the name of a role as a string or a :class:`Role` instance.
-        :param for_marshal: Indicate that the mapper is marshaling data.
+        :param for_marshal: Indicate that the mapper is marshaling data.  Fields
+            that would never be marshaled, such as read only fields, are excluded.
         :raises: :class:`MapperError`
         :returns: list of :class:`Field <Field>` instances
         :rtype: list
         """
 
-        role = self._get_role(name_or_role, deferred_role=deferred_role)
-
-        fields = [f for name, f in six.iteritems(self.fields) if name in role]
+        cls = type(self)
+        if is_overridden(cls, Mapper, '_get_role'):
+            # The role is decided by the instance so can't be cached
+            role = self._get_role(name_or_role, deferred_role=deferred_role)
+            fields = self._get_role_fields(role)
+            if for_marshal:
+                fields = [f for f in fields if _is_marshaled(f)]
+            names = None
+        elif for_marshal:
+            plan = self._get_plan(name_or_role, deferred_role=deferred_role)
+            fields = plan.marshal_fields
+            names = plan.marshal_names
+        else:
+            plan = self._get_plan(name_or_role, deferred_role=deferred_role)
+            fields = plan.fields
+            names = plan.names
 
         if self.partial and for_marshal:
             # If this is a partial update, rather than going through all fields
             # in the role, select those fields which are actually present in
             # the data - as long as they're also present in the role.
+            if names is not None and \
+                    not is_overridden(cls, Mapper, '_field_in_data'):
+                present = names.intersection(self.data.keys())
+                return [f for f in fields if f.name in present]
             return [f for f in fields if self._field_in_data(f)]
         else:
-            return fields
+            return list(fields)
 
     def _data_supports_transform(self, data):
         """return a boolean indicating if the given data object supports key
@@ -622,15 +1020,286 @@ class Mapper(six.with_metaclass(MapperMeta, object)):
         :rtype: :class:`MapperSession` object
         """
 
-        return MapperSession(self, data, output, partial=self.partial)
+        return MapperSession(self, data, output, partial=self.partial,
+                             changes=self.changes)
+
+    @classmethod
+    def _supports_compilation(cls):
+        """Return a boolean indicating if the fields used by this Mapper can
+        be resolved without an instance, which is required to compile it.
+
+        Mappers overriding :meth:`_get_role`, :meth:`_get_fields` or
+        :meth:`_field_in_data` decide on their fields at runtime and are
+        always interpreted.
+
+        :rtype: boolean
+        """
+
+        return not (is_overridden(cls, Mapper, '_get_role') or
+                    is_overridden(cls, Mapper, '_get_fields') or
+                    is_overridden(cls, Mapper, '_field_in_data'))
+
+    @classmethod
+    def _supports_reuse(cls):
+        """Return a boolean indicating if a single instance of this Mapper may
+        be reused for many objects by swapping its ``obj`` and ``data``.  This
+        is the case unless the Mapper is the base of a polymorphic hierarchy
+        or customises how it is constructed.
+
+        :rtype: boolean
+        """
+
+        return not (getattr(cls, '_polymorphic_base', False) or
+                    is_overridden(cls, Mapper, '__init__'))
+
+    @classmethod
+    def _supports_direct_serialize(cls):
+        """Return a boolean indicating if objects may be passed straight to
+        the compiled serializer of this Mapper without creating an instance
+        first.  This is the case unless the Mapper is the base of a polymorphic
+        hierarchy or customises how it is constructed or serialized.
+
+        :rtype: boolean
+        """
+
+        return not (not cls._supports_reuse() or
+                    is_overridden(cls, Mapper, 'serialize') or
+                    not cls._supports_compilation())
+
+    @classmethod
+    def _supports_json_streaming(cls):
+        """Return a boolean indicating if this Mapper can be written as JSON
+        field by field by :mod:`kim.encoding`.
+
+        :rtype: boolean
+        """
+
+        return cls._supports_compilation() and \
+            not is_overridden(cls, Mapper, 'serialize')
+
+    @classmethod
+    def _get_compiled(cls, cache, key, compile_func, force=False):
+        """Return the compiled function stored at ``key`` in ``cache``, or None
+        if the Mapper should be interpreted.  The function is compiled using
+        ``compile_func`` once the Mapper has been used more than
+        ``__compile_threshold__`` times for ``key``.
+
+        :param cache: :class:`kim.utils.LRUCache` of
+            :class:`kim.compiler.CompiledEntry`
+        :param key: hashable key identifying the role
+        :param compile_func: callable returning the compiled function
+        :param force: compile immediately regardless of the threshold
+        :returns: compiled function or None
+        """
+
+        entry = cache.get(key)
+        if entry is None:
+            with _compile_lock:
+                # Never replace an entry another thread already stored
+                entry = cache.setdefault(
+                    key, CompiledEntry(cls._config_version))
+
+        func = entry.lookup()
+        if func is None and entry.should_compile(
+                cls.__compile_threshold__, force=force):
+            with _compile_lock:
+                # Another thread may have compiled it while we waited
+                if entry.func is not None and \
+                        entry.version == cls._config_version.value:
+                    func = entry.func
+                else:
+                    entry.supported = cls._supports_compilation()
+                    if entry.supported:
+                        version = cls._config_version.value
+                        func = compile_func()
+                        entry.promote(func, version)
+
+        return func
+
+    @classmethod
+    def _get_serializer(cls, role='__default__', deferred_role=None,
+                        force=False):
+        """Return the compiled serializer for ``role`` and ``deferred_role``,
+        or None if the interpreted pipelines should be used.
+
+        :raises: :class:`MapperError`
+        :returns: function taking ``(obj, mapper=None)`` or None
+        """
+
+        def compile_func():
+            fields = cls._get_plan(role, deferred_role=deferred_role).fields
+            role_name = role if isinstance(role, six.string_types) else 'role'
+            return compile_serializer(cls, fields, role_name=role_name)
+
+        key = cls._plan_key(role, deferred_role=deferred_role)
+        return cls._get_compiled(
+            cls._serializers, key, compile_func, force=force)
+
+    @classmethod
+    def compile_serializer(cls, role='__default__', deferred_role=None):
+        """Return a function that serializes objects using the fields of
+        ``role`` without going through each field's pipeline.
+
+        Field reads, :class:`~kim.field.Static` values and the formatting of
+        :class:`~kim.field.DateTime` and :class:`~kim.field.Decimal` fields are
+        generated as straight-line python for this Mapper and role.  Nested
+        mappers call their own compiled serializers.  Fields using custom
+        pipelines or ``extra_serialize_pipes`` are still run through their
+        pipeline.
+
+        Mappers compile themselves automatically once a role has been used
+        by :meth:`serialize` or :meth:`MapperIterator.serialize` more than
+        ``__compile_threshold__`` times.  Calling this method compiles the
+        role immediately.
+
+        :param role: name of a role or a :class:`Role` instance
+        :param deferred_role: optional :class:`Role` intersected with ``role``
+        :raises: :class:`MapperError`
+        :returns: function taking ``(obj, mapper=None)`` returning a dict
+
+        Usage::
+
+            >>> serialize = UserMapper.compile_serializer(role='public')
+            >>> serialize(user)
+            {'id': 1, 'name': 'mike'}
+        """
+
+        serializer = cls._get_serializer(
+            role, deferred_role=deferred_role, force=True)
+        if serializer is None:
+            raise MapperError('%s can not be compiled as it overrides how '
+                              'its fields are resolved' % cls.__name__)
+
+        return serializer
+
+    @classmethod
+    def _get_marshaler(cls, role='__default__', partial=False, force=False):
+        """Return the compiled marshaler for ``role``, or None if the
+        interpreted pipelines should be used.
+
+        :raises: :class:`MapperError`
+        :returns: function taking ``(data, output, errors, mapper=None)`` or None
+        """
+
+        def compile_func():
+            fields = cls._get_plan(role).fields
+            role_name = role if isinstance(role, six.string_types) else 'role'
+            return compile_marshaler(
+                cls, fields, role_name=role_name, partial=partial)
+
+        key = (cls._role_key(role), bool(partial))
+        return cls._get_compiled(
+            cls._marshalers, key, compile_func, force=force)
+
+    @classmethod
+    def compile_marshaler(cls, role='__default__', partial=False):
+        """Return a function that validates and marshals data using the
+        fields of ``role`` without going through each field's pipeline.
+
+        The generated function performs the same checks as the marshal
+        pipelines of the stock field types and collects errors using the same
+        messages, so :class:`MappingInvalid` errors are identical to those
+        produced by the pipelines.  :class:`~kim.field.Nested` and
+        :class:`~kim.field.Collection` fields and fields using custom
+        pipelines or ``extra_marshal_pipes`` are still run through their
+        pipeline.
+
+        Mappers compile themselves automatically once a role has been used
+        by :meth:`marshal` more than ``__compile_threshold__`` times.  Calling
+        this method compiles the role immediately.
+
+        :param role: name of a role or a :class:`Role` instance
+        :param partial: only marshal the fields present in the data
+        :raises: :class:`MapperError`
+        :returns: function taking ``(data, output, errors, mapper=None)``
+
+        Usage::
+
+            >>> marshal = UserMapper.compile_marshaler(role='public')
+            >>> user, errors = User(), {}
+            >>> marshal({'name': 'mike'}, user, errors)
+        """
+
+        marshaler = cls._get_marshaler(role, partial=partial, force=True)
+        if marshaler is None:
+            raise MapperError('%s can not be compiled as it overrides how '
+                              'its fields are resolved' % cls.__name__)
 
-    def serialize(self, role='__default__', raw=False, deferred_role=None):
+        return marshaler
+
+    @classmethod
+    def serializer(cls, role='__default__', deferred_role=None):
+        """Return a :class:`Serializer` for ``role``.  Serializers hold no
+        state between calls and may be shared between threads.
+
+        :param role: name of a role or a :class:`Role` instance
+        :param deferred_role: optional :class:`Role` intersected with ``role``
+        :raises: :class:`MapperError`
+        :rtype: :class:`Serializer`
+
+        Usage::
+
+            >>> serialize_user = UserMapper.serializer(role='public')
+            >>> serialize_user(user)
+            {'id': 1, 'name': 'mike'}
+
+        .. version-added: 1.2.0
+        """
+
+        return Serializer(cls, role=role, deferred_role=deferred_role)
+
+    @classmethod
+    def marshaler(cls, role='__default__', partial=False):
+        """Return a :class:`Marshaler` for ``role``.  Marshalers hold no
+        state between calls and may be shared between threads.
+
+        :param role: name of a role or a :class:`Role` instance
+        :param partial: only marshal the fields present in the data
+        :raises: :class:`MapperError`
+        :rtype: :class:`Marshaler`
+
+        Usage::
+
+            >>> marshal_user = UserMapper.marshaler(role='create')
+            >>> user = marshal_user({'name': 'mike'})
+
+        .. version-added: 1.2.0
+        """
+
+        return Marshaler(cls, role=role, partial=partial)
+
+    @classmethod
+    def compilation_stats(cls):
+        """Return statistics about the usage and compilation of this Mapper
+        for each role it has been used with.
+
+        :returns: dict with ``serialize`` and ``marshal`` keys, each a dict of
+            role to :meth:`kim.compiler.CompiledEntry.stats`.  Roles written
+            as JSON with nested fields are also listed under ``serialize``,
+            keyed by ``('json', role)``
+        :rtype: dict
+        """
+
+        return {
+            'serialize': dict(
+                (key, entry.stats())
+                for key, entry in cls._serializers.items()),
+            'marshal': dict(
+                (key, entry.stats())
+                for key, entry in cls._marshalers.items()),
+        }
+
+    def serialize(self, role='__default__', raw=False, deferred_role=None,
+                  executor=None):
         """Serialize ``self.obj`` into a dict according to the fields
         defined on this Mapper.
 
         :param role: specify the role to use when serializing this mapper
         :param raw: instruct the mapper to transform the data before serializing.
             This option overrides the Mapper.raw setting.
+        :param executor: optional :class:`concurrent.futures.Executor`, such as
+            a ``ThreadPoolExecutor``, used to resolve ``io_bound`` fields
+            concurrently.  The output is the same, in the declared field order.
         :raises: :class:`FieldInvalid` :class:`MapperError`
         :returns: dict containing serialized object
         :rtype: mixed
@@ -638,9 +1307,14 @@ class Mapper(six.with_metaclass(MapperMeta, object)):
         Usage::
             >>> mapper = UserMapper(obj=user)
             >>> mapper.serialize(role='public')
+            >>> with ThreadPoolExecutor(8) as executor:
+            ...     mapper.serialize(executor=executor)
 
         .. seealso::
             :func:`~Mapper.transform_data`
+
+        .. version-changed: 1.2.0
+            Added ``executor``
         """
 
         output = {}  # Should this be user definable?
@@ -651,17 +1325,104 @@ class Mapper(six.with_metaclass(MapperMeta, object)):
         else:
             data = self._get_obj()
 
+        if executor is not None:
+            return self._serialize_fields_concurrently(
+                data, output, role, deferred_role, executor)
+
+        serializer = self._get_serializer(role, deferred_role=deferred_role)
+        if serializer is not None:
+            return serializer(data, self)
+
+        return self._serialize_fields(data, output, role, deferred_role)
+
+    def serialize_json(self, role='__default__', stream=None,
+                       deferred_role=None):
+        """Serialize ``self.obj`` straight to JSON text.
+
+        The output is the same as ``json.dumps(mapper.serialize(role))`` but
+        nested mappers and collections of nested mappers are written as they
+        are serialized rather than building the whole dict first.
+
+        :param role: specify the role to use when serializing this mapper
+        :param stream: optional file like object the JSON is written to.  Text
+            streams are written strings, binary streams UTF-8 encoded bytes.
+        :param deferred_role: optional :class:`Role` intersected with ``role``
+        :raises: :class:`FieldInvalid` :class:`MapperError`
+        :returns: None when ``stream`` is provided, otherwise a generator of
+            UTF-8 encoded chunks of bytes
+
+        Usage::
+
+            >>> with open('user.json', 'w') as fp:
+            ...     UserMapper(obj=user).serialize_json(stream=fp)
+            >>> b''.join(UserMapper(obj=user).serialize_json())
+            b'{"id": 1, "name": "mike"}'
+
+        .. version-added: 1.2.0
+        """
+
+        pieces = iter_json(type(self), self._get_obj(), role=role,
+                           deferred_role=deferred_role, mapper=self)
+        if stream is not None:
+            return write_json(pieces, stream)
+
+        return iter_chunks(pieces)
+
+    def _serialize_fields(self, data, output, role, deferred_role=None):
+        """Serialize ``data`` into ``output`` by running the pipeline of each
+        field of ``role``.
+
+        :returns: output
+        """
+
         mapper_session = self.get_mapper_session(data, output)
         for field in self._get_fields(role, deferred_role=deferred_role):
             field.serialize(mapper_session)
 
         return output
 
+    def _serialize_fields_concurrently(self, data, output, role,
+                                       deferred_role, executor):
+        """Serialize ``data`` into ``output``, submitting the io bound
+        fields of ``role`` to ``executor`` and serializing the other fields
+        while they are resolved.
+
+        :returns: output
+        """
+
+        fields = self._get_fields(role, deferred_role=deferred_role)
+
+        def serialize_field(field):
+            # Each field gets its own session, sessions aren't thread safe.
+            field_output = {}
+            field.serialize(self.get_mapper_session(data, field_output))
+            return field_output
+
+        futures = [
+            executor.submit(serialize_field, field)
+            if _is_io_bound(field) else None for field in fields]
+
+        mapper_session = self.get_mapper_session(data, output)
+        for field, future in zip(fields, futures):
+            if future is None:
+                field.serialize(mapper_session)
+            else:
+                output.update(future.result())
+
+        return output
+
     def marshal(self, role='__default__'):
         """Marshal ``self.data`` into ``self.obj`` according to the fields
         defined on this Mapper.
 
         :returns: Object of ``__type__`` populated with data
+
+        Usage::
+
+            >>> mapper = UserMapper(obj=user, data=data, track_changes=True)
+            >>> mapper.marshal()
+            >>> mapper.changes
+            {'name': ('mike', 'jack'), 'company': {'name': ('Acme', 'Foo')}}
         """
 
         # Polymorphic mappers do some validation on incoming data.
@@ -672,16 +1433,27 @@ class Mapper(six.with_metaclass(MapperMeta, object)):
         output = self._get_obj()
         data = self.data
 
-        fields = self._get_fields(role, for_marshal=True)
+        marshaler = None
+        if self.track_changes:
+            # Changes are recorded by the pipelines
+            self.changes = {}
+        elif data is not None:
+            marshaler = self._get_marshaler(role, partial=self.partial)
 
-        for field in fields:
-            try:
-                field.marshal(self.get_mapper_session(data, output))
-            except FieldInvalid as e:
-                self.errors[field.name] = e.message
-            except MappingInvalid as e:
-                # handle errors from nested mappers.
-                self.errors[field.name] = e.errors
+        if marshaler is not None:
+            marshaler(data, output, self.errors, self)
+        else:
+            fields = self._get_fields(role, for_marshal=True)
+            mapper_session = self.get_mapper_session(data, output)
+
+            for field in fields:
+                try:
+                    field.marshal(mapper_session)
+                except FieldInvalid as e:
+                    self.errors[field.name] = e.message
+                except MappingInvalid as e:
+                    # handle errors from nested mappers.
+                    self.errors[field.name] = e.errors
 
         # Call top level mapper validator for validations involving more
         # than one field
@@ -697,6 +1469,33 @@ class Mapper(six.with_metaclass(MapperMeta, object)):
 
         return output
 
+    def marshal_async(self, role='__default__', concurrency=None):
+        """Marshal ``self.data`` into ``self.obj`` from a coroutine.  Pipes,
+        getters of Nested fields and :meth:`validate` may be coroutine
+        functions, and fields are awaited concurrently.  Requires python 3.5
+        or later.
+
+        :param role: name of a role to use when marshaling
+        :param concurrency: maximum number of fields awaited at once
+        :raises: :class:`MappingInvalid`
+        :returns: awaitable returning the object of ``__type__`` populated
+            with data
+
+        Usage::
+
+            >>> user = await UserMapper(data=data).marshal_async(
+            ...     role='create', concurrency=5)
+
+        .. seealso::
+            :func:`kim.aio.marshal`
+
+        .. version-added: 1.2.0
+        """
+
+        from .aio import marshal
+
+        return marshal(self, role=role, concurrency=concurrency)
+
     def validate(self, output):
         """Mappers may subclass this method to perform top-level validation
         on multiple related fields, raising `FieldInvalid` or `MappingInvalid`
@@ -871,17 +1670,43 @@ class MapperIterator(object):
 
         objs = User.query.all()
         results = UserMapper.many().serialize(objs)
+
+    Large batches may be split in chunks mapped by a pool of worker
+    processes, preserving the order of the output::
+
+        results = UserMapper.many(parallel=8).serialize(objs)
     """
 
-    def __init__(self, mapper, **mapper_params):
+    def __init__(self, mapper, parallel=None,
+                 parallel_chunk_size=DEFAULT_PARALLEL_CHUNK_SIZE,
+                 **mapper_params):
         """Constructs a new instance of a MapperIterator.
 
         :param mapper: a :class:`.Mapper` to map each item too.
+        :param parallel: number of worker processes used to map items.
+            Items are mapped in this process when not set.  The Mapper must be
+            importable from its module and items and marshaled objects must
+            be picklable.
+        :param parallel_chunk_size: number of items sent to a worker at a
+            time
         :param mapper_params: a dict of kwargs passed to each mapper
+        :raises: :class:`MapperError`
+
+        .. version-changed: 1.2.0
+            Added ``parallel`` and ``parallel_chunk_size``
         """
 
+        for name, value in (('parallel', parallel),
+                            ('parallel_chunk_size', parallel_chunk_size)):
+            if value is not None and (
+                    not isinstance(value, six.integer_types) or value < 1):
+                raise MapperError('%s must be a positive integer, got %r'
+                                  % (name, value))
+
         self.mapper = mapper
         self.mapper_params = mapper_params
+        self.parallel = parallel
+        self.parallel_chunk_size = parallel_chunk_size
 
     def get_mapper(self, data=None, obj=None):
         """Return a new instance of the provided mapper.
@@ -893,40 +1718,811 @@ class MapperIterator(object):
         :returns: a new :class:`.Mapper`
         """
 
-        self.mapper_params.update({
-            'data': data,
-            'obj': obj
-        })
-        return self.mapper(**self.mapper_params)
+        params = dict(self.mapper_params, data=data, obj=obj)
+        return self.mapper(**params)
+
+    def _chunked(self, items, chunk_size=None, callback=None):
+        """Yield ``items`` one at a time or in lists of ``chunk_size``,
+        calling ``callback`` with each item or chunk before it is yielded.
+        """
+
+        if chunk_size is None:
+            for item in items:
+                if callback is not None:
+                    callback(item)
+                yield item
+            return
+
+        if not isinstance(chunk_size, six.integer_types) or chunk_size < 1:
+            raise MapperError('chunk_size must be a positive integer, got %r'
+                              % (chunk_size, ))
+
+        for _, chunk in _chunks(items, chunk_size):
+            if callback is not None:
+                callback(chunk)
+            yield chunk
+
+    def _map_parallel(self, task, items, *args):
+        """Run ``task`` for chunks of ``items`` in worker processes.
+
+        .. seealso::
+            :func:`kim.parallel.map_chunks`
+        """
+
+        return map_chunks(
+            task, self.mapper, items, self.parallel,
+            chunk_size=self.parallel_chunk_size,
+            args=(self._worker_params(), ) + args)
+
+    def _worker_params(self):
+        """Return the params passed to mappers in worker processes."""
+
+        return dict(self.mapper_params)
+
+    def _iter_serialize(self, objs, role, deferred_role, executor=None):
 
-    def serialize(self, objs, role='__default__', deferred_role=None):
-        """Serializes each item in ``objs`` creating a new mapper each time.
+        if executor is not None:
+            if self.parallel:
+                raise MapperError('executor can not be used with parallel')
+            for obj in objs:
+                yield self.get_mapper(obj=obj).serialize(
+                    role=role, deferred_role=deferred_role, executor=executor)
+            return
+
+        if self.parallel:
+            for chunk in self._map_parallel(
+                    serialize_chunk, objs, role, deferred_role):
+                for serialized in chunk:
+                    yield serialized
+            return
+
+        mapper_cls = self.mapper
+        direct = not self.mapper_params.get('raw') and \
+            mapper_cls._supports_direct_serialize()
+        mapper = None
+
+        for obj in objs:
+            # None is left to a new mapper which raises an error.
+            if not direct or obj is None:
+                yield self.get_mapper(obj=obj).serialize(
+                    role=role, deferred_role=deferred_role)
+                continue
+
+            # The serializer is looked up for every object so the Mapper is
+            # compiled once hot and deoptimized if its configuration changes.
+            serializer = mapper_cls._get_serializer(
+                role, deferred_role=deferred_role)
+            if serializer is not None:
+                yield serializer(obj)
+                continue
+
+            if mapper is None:
+                mapper = self.get_mapper(obj=obj)
+            else:
+                mapper.obj = obj
+            yield mapper._serialize_fields(obj, {}, role, deferred_role)
+
+    def iter_serialize(self, objs, role='__default__', deferred_role=None,
+                       chunk_size=None, callback=None, executor=None):
+        """Lazily serialize each item in ``objs``, which may be any iterable
+        such as a generator or a database cursor.
+
+        A single mapper is reused for every object unless the Mapper is
+        polymorphic or customises how it is constructed.
 
         :param objs: iterable of objects to serialize
         :param role: name of a role to use when serializing
+        :param deferred_role: optional :class:`Role` intersected with ``role``
+        :param chunk_size: yield lists of up to ``chunk_size`` serialized
+            objects instead of one object at a time
+        :param callback: function called with each serialized object, or
+            each chunk when ``chunk_size`` is set, before it is yielded
+        :param executor: optional executor resolving ``io_bound`` fields of
+            each object concurrently, see :meth:`Mapper.serialize`
+        :raises: :class:`MapperError`
+        :returns: generator of serialized objects or of lists of them
 
-        :returns: list of serialized objects
+        Usage::
+
+            >>> for chunk in UserMapper.many().iter_serialize(
+            ...         User.query.yield_per(1000), chunk_size=1000,
+            ...         callback=write_rows):
+            ...     pass
+
+        .. version-added: 1.2.0
         """
 
-        output = []  # TODO should this be user defined?
-        for obj in objs:
-            output.append(self.get_mapper(obj=obj).serialize(
-                role=role,
-                deferred_role=deferred_role))
+        return self._chunked(
+            self._iter_serialize(objs, role, deferred_role, executor=executor),
+            chunk_size=chunk_size, callback=callback)
 
-        return output
+    def _iter_rows(self, rows, columns, role, deferred_role):
+
+        rows = iter(rows)
+        if columns is None:
+            try:
+                first = next(rows)
+            except StopIteration:
+                return
+            columns = get_row_columns(first)
+            rows = itertools.chain([first], rows)
+
+        read = row_reader(columns, names=get_role_columns(
+            self.mapper, role, deferred_role=deferred_role))
+        for row in rows:
+            yield read(row)
+
+    def iter_serialize_rows(self, rows, columns=None, role='__default__',
+                            deferred_role=None, chunk_size=None,
+                            callback=None):
+        """Lazily serialize database rows, such as SQLAlchemy Core result
+        rows or plain tuples, without creating an object per row.
+
+        Only the columns read by the fields of ``role`` are looked up, by
+        position, and columns named with dunder_scores are grouped into
+        nested dicts as they are for Mappers created with ``raw=True``.
+
+        :param rows: iterable of rows, eg. a cursor using ``yield_per``
+        :param columns: list of the column names of each row, taken from the
+            first row by default
+        :param role: name of a role to use when serializing
+        :param deferred_role: optional :class:`Role` intersected with ``role``
+        :param chunk_size: yield lists of up to ``chunk_size`` serialized
+            rows instead of one row at a time
+        :param callback: function called with each serialized row, or each
+            chunk when ``chunk_size`` is set, before it is yielded
+        :raises: :class:`MapperError`
+        :returns: generator of serialized rows or of lists of them
+
+        Usage::
+
+            >>> query = select([users.c.id, users.c.name,
+            ...                 companies.c.name.label('company__name')])
+            >>> rows = conn.execution_options(stream_results=True).execute(
+            ...     query)
+            >>> for chunk in UserMapper.many().iter_serialize_rows(
+            ...         rows, chunk_size=1000):
+            ...     write(chunk)
+
+        .. seealso::
+            :func:`kim.rows.row_reader`
+
+        .. version-added: 1.2.0
+        """
+
+        iterator = self
+        if self.mapper_params.get('raw'):
+            # Rows are already grouped
+            iterator = MapperIterator(
+                self.mapper, **dict(self.mapper_params, raw=False))
+
+        data = self._iter_rows(rows, columns, role, deferred_role)
+        return self._chunked(
+            iterator._iter_serialize(data, role, deferred_role),
+            chunk_size=chunk_size, callback=callback)
 
-    def marshal(self, data, role='__default__'):
-        """Marshals each item in ``data`` creating a new mapper each time.
+    def serialize_rows(self, rows, columns=None, role='__default__',
+                       deferred_role=None):
+        """Serialize each row in ``rows``.
+
+        :returns: list of serialized rows
+
+        .. seealso::
+            :meth:`iter_serialize_rows`
+
+        .. version-added: 1.2.0
+        """
+
+        return list(self.iter_serialize_rows(
+            rows, columns=columns, role=role, deferred_role=deferred_role))
+
+    def _iter_marshal(self, data, role, index_errors=False,
+                      raise_errors=True, as_mappings=False):
+        """Marshal each item in ``data``.  With ``index_errors`` the errors
+        of invalid items are keyed by the index of the item and, unless
+        ``raise_errors`` is set, yielded as :class:`MappingInvalid` instances
+        instead of being raised.
+        """
+
+        if self.parallel:
+            for result in self._iter_marshal_parallel(
+                    data, role, index_errors=index_errors,
+                    raise_errors=raise_errors, as_mappings=as_mappings):
+                yield result
+            return
+
+        tree = None
+        if as_mappings:
+            tree = _mapping_tree(self.mapper._get_plan(role).marshal_fields)
+
+        mapper = None
+        reuse = self.mapper._supports_reuse()
+
+        # Objects loaded by batch getters are shared by the whole batch
+        memo = {}
+        if isinstance(data, (list, tuple)):
+            self._batch_load(data, role, memo)
+
+        for index, datum in enumerate(data):
+            if mapper is None or not reuse:
+                mapper = self.get_mapper(data=datum)
+                mapper._batch_memo = memo
+            else:
+                mapper.data = datum
+                mapper.obj = None
+                mapper.errors = {}
+
+            if tree is not None:
+                # Marshal into a dict rather than a new object of __type__
+                mapper.obj = _new_mapping(tree)
+
+            try:
+                result = mapper.marshal(role=role)
+            except MappingInvalid as e:
+                if not index_errors:
+                    raise
+                result = MappingInvalid({index: e.errors})
+                if raise_errors:
+                    raise result
+            else:
+                if tree is not None:
+                    result = _flatten_mapping(result, tree)
+            yield result
+
+    def _batch_load(self, data, role, memo):
+        """Load the objects of the Nested fields with a ``batch_getter``, and
+        of Collections of them, for every item of ``data`` at once.
+        """
+
+        for field in self.mapper._get_plan(role).marshal_fields:
+            if isinstance(field, Collection):
+                nested = field.opts.field
+                items = []
+                for datum in data:
+                    value = field.opts._name_getter(datum)
+                    if isinstance(value, (list, tuple)):
+                        items.extend(value)
+            else:
+                nested = field
+                items = [field.opts._name_getter(datum) for datum in data]
+
+            if isinstance(nested, Nested) and nested.opts.batch_getter:
+                batch_load(nested, items, memo)
+
+    def _iter_marshal_parallel(self, data, role, index_errors=False,
+                               raise_errors=True, errors=None,
+                               as_mappings=False):
+        """Marshal ``data`` in worker processes.  When ``errors`` is
+        provided the errors of every invalid item are added to it, keyed by
+        index, and marshaling carries on.
+        """
+
+        for start, results, chunk_errors in self._map_parallel(
+                marshal_chunk, data, role, as_mappings):
+            for index, result in enumerate(results, start):
+                if index not in chunk_errors:
+                    yield result
+                    continue
+
+                if errors is not None:
+                    errors[index] = chunk_errors[index]
+                    continue
+                if not index_errors:
+                    raise MappingInvalid(chunk_errors[index])
+
+                result = MappingInvalid({index: chunk_errors[index]})
+                if raise_errors:
+                    raise result
+                yield result
+
+    def iter_marshal(self, data, role='__default__', chunk_size=None,
+                     callback=None, as_mappings=False):
+        """Lazily marshal each item in ``data``, which may be any iterable.
+
+        A single mapper is reused for every item unless the Mapper is
+        polymorphic or customises how it is constructed.
+
+        :param data: iterable of data to marshal
+        :param role: name of a role to use when marshaling
+        :param chunk_size: yield lists of up to ``chunk_size`` marshaled
+            objects instead of one object at a time
+        :param callback: function called with each marshaled object, or
+            each chunk when ``chunk_size`` is set, before it is yielded
+        :param as_mappings: yield dicts instead of objects, see
+            :meth:`marshal`
+        :raises: :class:`MapperError`, :class:`MappingInvalid`
+        :returns: generator of marshaled objects or of lists of them
+
+        Usage::
+
+            >>> for users in UserMapper.many().iter_marshal(
+            ...         rows, chunk_size=500, callback=session.add_all):
+            ...     session.flush()
+
+        .. version-added: 1.2.0
+        """
+
+        return self._chunked(
+            self._iter_marshal(data, role, as_mappings=as_mappings),
+            chunk_size=chunk_size, callback=callback)
+
+    def _not_found_error(self, key, key_field=None):
+        """Return the errors of an item of :meth:`marshal_into` whose ``key``
+        matched no existing object, using the ``not_found`` error message of
+        ``key_field`` when ``key`` is a field.
+        """
+
+        if key_field is None:
+            return {key: DEFAULT_ERROR_MSGS['not_found'].format(name=key)}
+
+        try:
+            key_field.invalid('not_found')
+        except FieldInvalid as e:
+            return {key_field.name: e.message}
+
+    def marshal_into(self, data, existing, key='id', role='__default__',
+                     allow_create=True):
+        """Marshal each item in ``data`` into the object of ``existing`` with
+        the same ``key``, creating a new object of ``__type__`` for items
+        without a match.
+
+        ``existing`` is indexed by key once, so each item is paired with its
+        object by a single lookup.  Items sharing a key are marshaled into the
+        same object in turn.  Every item is marshaled before the errors of
+        all the invalid items are raised in a single
+        :class:`MappingInvalid`, keyed by index.
+
+        :param data: iterable of data to marshal
+        :param existing: iterable of objects to update
+        :param key: name of the field, or attribute when no field of that name
+            is defined, identifying an object.  Objects are read at the
+            source of the field and data at its name, converted by the field
+            so ``'5'`` matches ``5`` for an Integer field
+        :param role: name of a role to use when marshaling
+        :param allow_create: create objects for items without a match.  Such
+            items are invalid otherwise
+        :raises: :class:`MapperError` when marshaling in ``parallel``, the
+            existing objects being updated in this process,
+            :class:`MappingInvalid`
+        :returns: :class:`MarshalIntoResult` of the marshaled objects in the
+            order of ``data`` and of the objects created and updated
+
+        Usage::
+
+            >>> result = UserMapper.many(partial=True).marshal_into(
+            ...     payload, existing=User.query.filter(User.id.in_(ids)))
+            >>> session.add_all(result.created)
+
+        .. version-added: 1.2.0
+        """
+
+        if self.parallel:
+            raise MapperError('marshal_into can not be used with parallel')
+
+        index = KeyIndex(self.mapper, key, existing)
+
+        objs, created, updated, errors = [], [], [], {}
+        seen = set()
+        mapper = None
+        reuse = self.mapper._supports_reuse()
+        memo = {}
+        if isinstance(data, (list, tuple)):
+            self._batch_load(data, role, memo)
+
+        for i, datum in enumerate(data):
+            target = index.find(datum)
+            if target is None and not allow_create:
+                errors[i] = self._not_found_error(key, index.key_field)
+                continue
+
+            if mapper is None or not reuse:
+                mapper = self.get_mapper(data=datum, obj=target)
+                mapper._batch_memo = memo
+            else:
+                mapper.data = datum
+                mapper.obj = target
+                mapper.errors = {}
+
+            try:
+                obj = mapper.marshal(role=role)
+            except MappingInvalid as e:
+                errors[i] = e.errors
+                continue
+
+            objs.append(obj)
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            if target is not None:
+                updated.append(obj)
+            else:
+                created.append(obj)
+                index.add(obj)
+
+        if errors:
+            raise MappingInvalid(errors)
+
+        return MarshalIntoResult(objs, created, updated)
+
+    def aiter_serialize(self, objs, role='__default__', deferred_role=None,
+                        as_json=False, buffer_size=DEFAULT_BUFFER_SIZE):
+        """Serialize each object of the async iterable ``objs`` as it's
+        received, yielding serialized objects or, with ``as_json``, chunks of
+        a JSON array.  Objects are only requested from ``objs`` as the output
+        is consumed, so a slow consumer never causes unbounded buffering.
+        Requires python 3.6 or later.
+
+        :param objs: async iterable, or iterable, of objects
+        :param role: name of a role to use when serializing
+        :param deferred_role: optional :class:`Role` intersected with ``role``
+        :param as_json: yield UTF-8 encoded chunks of a JSON array of about
+            ``buffer_size`` characters instead of serialized objects
+        :returns: async generator
+
+        Usage::
+
+            >>> async for chunk in UserMapper.many().aiter_serialize(
+            ...         cursor, role='public', as_json=True):
+            ...     await send({'type': 'http.response.body', 'body': chunk,
+            ...                 'more_body': True})
+
+        .. seealso::
+            :func:`kim.aiostream.iter_serialize`
+            :func:`kim.aiostream.iter_serialize_json`
+
+        .. version-added: 1.2.0
+        """
+
+        from .aiostream import iter_serialize, iter_serialize_json
+
+        if as_json:
+            return iter_serialize_json(
+                self, objs, role=role, deferred_role=deferred_role,
+                buffer_size=buffer_size)
+
+        return iter_serialize(
+            self, objs, role=role, deferred_role=deferred_role)
+
+    def iter_marshal_json(self, fp, role='__default__', chunk_size=None,
+                          callback=None, raise_errors=True,
+                          buffer_size=DEFAULT_BUFFER_SIZE):
+        """Incrementally parse a top level JSON array, or newline delimited
+        JSON, from ``fp`` and marshal each element as soon as it has been
+        read.  Only the element being marshaled is held in memory rather
+        than the whole document.
+
+        Errors are keyed by the index of the invalid element.  When
+        ``raise_errors`` is False a :class:`MappingInvalid` is yielded in
+        place of each invalid element and marshaling carries on with the
+        next one.
+
+        :param fp: file like object opened in text or binary mode
+        :param role: name of a role to use when marshaling
+        :param chunk_size: yield lists of up to ``chunk_size`` results
+            instead of one at a time
+        :param callback: function called with each result, or each chunk
+            when ``chunk_size`` is set, before it is yielded
+        :param raise_errors: raise :class:`MappingInvalid` for the first
+            invalid element instead of yielding it
+        :param buffer_size: number of characters read from ``fp`` at a time
+        :raises: :class:`MapperError`, :class:`MappingInvalid`, ValueError
+            if ``fp`` is not valid JSON
+        :returns: generator of marshaled objects or of lists of them
+
+        Usage::
+
+            >>> for result in UserMapper.many().iter_marshal_json(
+            ...         request.stream, raise_errors=False):
+            ...     if isinstance(result, MappingInvalid):
+            ...         errors.update(result.errors)
+            ...     else:
+            ...         session.add(result)
+
+        .. seealso::
+            :func:`kim.encoding.iter_json_values`
+
+        .. version-added: 1.2.0
+        """
+
+        data = iter_json_values(fp, buffer_size=buffer_size)
+        return self._chunked(
+            self._iter_marshal(data, role, index_errors=True,
+                               raise_errors=raise_errors),
+            chunk_size=chunk_size, callback=callback)
+
+    def iter_marshal_file(self, path, role='__default__'):
+        """Marshal each line of the NDJSON file at ``path`` in worker
+        processes, using ``parallel`` workers or one per CPU.  The file is
+        memory mapped and split on newlines in byte ranges marshaled by the
+        workers, so it's never read as a whole by this process.
+
+        :param path: path of an NDJSON file
+        :param role: name of a role to use when marshaling
+        :raises: :class:`MapperError`
+        :returns: generator of a tuple for each range of the file of a dict
+            of marshaled objects and a dict of errors, keyed by line number
+
+        Usage::
+
+            >>> for users, errors in UserMapper.many(
+            ...         parallel=16).iter_marshal_file('users.ndjson'):
+            ...     session.add_all(users.values())
+            ...     log_errors(errors)
+
+        .. seealso::
+            :func:`kim.parallel.iter_marshal_file`
+
+        .. version-added: 1.2.0
+        """
+
+        return iter_marshal_file(
+            self.mapper, path, role=role, workers=self.parallel,
+            mapper_params=self._worker_params())
+
+    def marshal_file(self, path, role='__default__'):
+        """Marshal each line of the NDJSON file at ``path`` in worker
+        processes.
+
+        :param path: path of an NDJSON file
+        :param role: name of a role to use when marshaling
+        :raises: :class:`MapperError`
+        :returns: tuple of an ordered dict of marshaled objects and a dict of
+            errors, keyed by line number starting from 1
+
+        .. seealso::
+            :meth:`iter_marshal_file`
+
+        .. version-added: 1.2.0
+        """
+
+        results, errors = OrderedDict(), {}
+        for range_results, range_errors in self.iter_marshal_file(
+                path, role=role):
+            results.update(range_results)
+            errors.update(range_errors)
+
+        return results, errors
+
+    def serialize_json(self, objs, role='__default__', deferred_role=None,
+                       stream=None):
+        """Serialize each item in ``objs`` straight to a JSON array.  ``objs``
+        may be any iterable and objects are written as they are serialized.
+
+        :param objs: iterable of objects to serialize
+        :param role: name of a role to use when serializing
+        :param deferred_role: optional :class:`Role` intersected with ``role``
+        :param stream: optional file like object the JSON is written to
+        :returns: None when ``stream`` is provided, otherwise a generator of
+            UTF-8 encoded chunks of bytes
+
+        Usage::
+
+            >>> with open('users.json', 'wb') as fp:
+            ...     UserMapper.many().serialize_json(
+            ...         User.query.yield_per(1000), stream=fp)
+
+        .. seealso::
+            :meth:`Mapper.serialize_json`
+
+        .. version-added: 1.2.0
+        """
+
+        if self.parallel:
+            pieces = self._iter_json_parallel(objs, role, deferred_role)
+            if stream is not None:
+                return write_json(pieces, stream)
+            return iter_chunks(pieces)
+
+        def _raw_mapper(obj):
+            return self.get_mapper(obj=obj)
+
+        pieces = iter_json_array(
+            self.mapper, objs, role=role, deferred_role=deferred_role,
+            get_mapper=_raw_mapper if self.mapper_params.get('raw') else None)
+        if stream is not None:
+            return write_json(pieces, stream)
+
+        return iter_chunks(pieces)
+
+    def _iter_json_parallel(self, objs, role, deferred_role):
+
+        # Workers return chunks of JSON, which are cheaper to send back than
+        # the serialized objects.
+        separator = '['
+        for text in self._map_parallel(
+                serialize_json_chunk, objs, role, deferred_role):
+            yield separator
+            yield text
+            separator = ', '
+
+        yield '[]' if separator == '[' else ']'
+
+    def serialize(self, objs, role='__default__', deferred_role=None,
+                  executor=None):
+        """Serializes each item in ``objs``.
+
+        :param objs: iterable of objects to serialize
+        :param role: name of a role to use when serializing
+        :param executor: optional executor resolving ``io_bound`` fields of
+            each object concurrently, see :meth:`Mapper.serialize`
+
+        :returns: list of serialized objects
+
+        .. seealso::
+            :meth:`iter_serialize`
+        """
+
+        return list(self._iter_serialize(
+            objs, role, deferred_role, executor=executor))
+
+    def marshal(self, data, role='__default__', as_mappings=False):
+        """Marshals each item in ``data``.
 
         :param objs: iterable of objects to marshal
         :param role: name of a role to use when marshaling
+        :param as_mappings: return a flat dict for each item instead of an
+            object of ``__type__``, eg. for ``Session.bulk_insert_mappings``
+            or an ``executemany`` insert.  Items are validated exactly as
+            they are otherwise and dicts are keyed by field source, the
+            components of dotted sources being joined with ``__``.
+            :meth:`Mapper.validate` is passed a dict whose keys may also be
+            read as attributes, eg. ``output.name``, and nested dicts for
+            dotted sources.
 
         :returns: list of marshaled objects
+
+        In parallel every item is marshaled before the errors of all the
+        invalid items are raised in a single :class:`MappingInvalid`, keyed
+        by index.
+
+        Usage::
+
+            >>> session.bulk_insert_mappings(
+            ...     User, UserMapper.many().marshal(rows, as_mappings=True))
+
+        .. seealso::
+            :meth:`iter_marshal`
+
+        .. version-changed: 1.2.0
+            Added ``as_mappings``
         """
 
-        output = []  # TODO should this be user defined?
-        for datum in data:
-            output.append(self.get_mapper(data=datum).marshal(role=role))
+        if self.parallel:
+            errors = {}
+            results = list(self._iter_marshal_parallel(
+                data, role, errors=errors, as_mappings=as_mappings))
+            if errors:
+                raise MappingInvalid(errors)
+            return results
 
-        return output
+        return list(self._iter_marshal(data, role, as_mappings=as_mappings))
+
+
+#: The result of :meth:`MapperIterator.marshal_into`.  ``objs`` holds every
+#: marshaled object in the order of the data, ``created`` and ``updated`` the
+#: objects created and updated.
+MarshalIntoResult = namedtuple(
+    'MarshalIntoResult', ['objs', 'created', 'updated'])
+
+
+class Serializer(object):
+    """A reusable callable serializing objects with a :class:`Mapper` and
+    role.
+
+    Serializers only hold the Mapper, role and deferred role.  Objects are
+    passed straight to the compiled serializer of the Mapper, compiled on
+    first use, without creating a Mapper instance, so a single serializer may
+    be shared between threads and called for any number of objects.  Mappers
+    that are polymorphic or customise how they are constructed or serialized
+    are instantiated for each object.
+
+    .. seealso::
+        :meth:`Mapper.serializer`
+
+    .. version-added: 1.2.0
+    """
+
+    __slots__ = ('mapper', 'role', 'deferred_role', 'direct')
+
+    def __init__(self, mapper, role='__default__', deferred_role=None):
+        """Instantiate a new instance of :class:`Serializer`
+
+        :param mapper: :class:`Mapper` class
+        :param role: name of a role or a :class:`Role` instance
+        :param deferred_role: optional :class:`Role` intersected with ``role``
+        :raises: :class:`MapperError` if the role is not defined
+        """
+
+        mapper._get_plan(role, deferred_role=deferred_role)
+
+        self.mapper = mapper
+        self.role = role
+        self.deferred_role = deferred_role
+        self.direct = mapper._supports_direct_serialize()
+
+    def __call__(self, obj):
+        """Serialize ``obj``.
+
+        :raises: :class:`FieldInvalid` :class:`MapperError`
+        :returns: dict containing serialized object
+        """
+
+        if self.direct and obj is not None:
+            serializer = self.mapper._get_serializer(
+                self.role, deferred_role=self.deferred_role, force=True)
+            if serializer is not None:
+                return serializer(obj)
+
+        return self.mapper(obj=obj).serialize(
+            role=self.role, deferred_role=self.deferred_role)
+
+    def many(self, objs):
+        """Serialize each object in ``objs``.
+
+        :returns: list of serialized objects
+        """
+
+        return [self(obj) for obj in objs]
+
+
+class Marshaler(object):
+    """A reusable callable marshaling data with a :class:`Mapper` and role.
+
+    Like :class:`Serializer`, marshalers hold no state between calls and may
+    be shared between threads.  Data is passed straight to the compiled
+    marshaler of the Mapper unless the Mapper is polymorphic, customises how
+    it is constructed, how it marshals or validates, or uses fields that
+    can't be compiled, in which case a Mapper is instantiated for each call.
+
+    .. seealso::
+        :meth:`Mapper.marshaler`
+
+    .. version-added: 1.2.0
+    """
+
+    __slots__ = ('mapper', 'role', 'partial', 'direct')
+
+    def __init__(self, mapper, role='__default__', partial=False):
+        """Instantiate a new instance of :class:`Marshaler`
+
+        :param mapper: :class:`Mapper` class
+        :param role: name of a role or a :class:`Role` instance
+        :param partial: only marshal the fields present in the data
+        :raises: :class:`MapperError` if the role is not defined
+        """
+
+        mapper._get_plan(role)
+
+        self.mapper = mapper
+        self.role = role
+        self.partial = partial
+        self.direct = not (
+            not mapper._supports_reuse() or
+            not mapper._supports_compilation() or
+            mapper.__type__ is None or
+            is_overridden(mapper, Mapper, 'marshal') or
+            is_overridden(mapper, Mapper, 'validate') or
+            is_overridden(mapper, Mapper, '_get_obj') or
+            is_overridden(mapper, Mapper, '_get_mapper_type'))
+
+    def __call__(self, data, obj=None):
+        """Marshal ``data`` into ``obj``, or a new instance of the Mapper's
+        ``__type__``.
+
+        :raises: :class:`MappingInvalid`, :class:`MapperError`
+        :returns: the marshaled object
+        """
+
+        if self.direct and data is not None:
+            marshaler = self.mapper._get_marshaler(
+                self.role, partial=self.partial, force=True)
+            if marshaler is not None:
+                output = obj if obj is not None else self.mapper.__type__()
+                errors = {}
+                marshaler(data, output, errors)
+                if errors:
+                    raise MappingInvalid(errors)
+                return output
+
+        return self.mapper(data=data, obj=obj, partial=self.partial).marshal(
+            role=self.role)
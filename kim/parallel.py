@@ -0,0 +1,328 @@
+# kim/parallel.py
+# Copyright (C) 2014-2016 the Kim authors and contributors
+# <see AUTHORS file>
+#
+# This module is part of Kim and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+"""Map chunks of objects, or ranges of lines of NDJSON files, in a pool of
+worker processes.
+
+Workers are sent the module and registry name of the Mapper rather than the
+class itself, along with the chunk of objects to map.  Objects passed to
+``Mapper.many(parallel=N)`` and the objects returned by marshaling must be
+picklable.
+
+.. version-added: 1.2.0
+"""
+
+import collections
+import importlib
+import json
+import mmap
+import multiprocessing
+import os
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:  # pragma: no cover
+    # python 2 without the futures backport
+    ProcessPoolExecutor = None
+
+from .exception import MapperError, MappingInvalid
+
+#: Number of objects sent to a worker at a time.
+DEFAULT_PARALLEL_CHUNK_SIZE = 1000
+
+#: Number of ranges each worker marshals when a file is split, so workers
+#: finishing early pick up more of the file.
+RANGES_PER_WORKER = 4
+
+
+def resolve_mapper(module_name, mapper_name):
+    """Find the Mapper called ``mapper_name`` in a worker, importing the
+    module that defines it so it's added to the registry.
+
+    :raises: :class:`kim.exception.MapperError`
+    :rtype: :class:`kim.mapper.Mapper`
+    """
+
+    from .mapper import get_mapper_from_registry, mapper_is_defined
+
+    module = importlib.import_module(module_name)
+    if mapper_is_defined(mapper_name):
+        return get_mapper_from_registry(mapper_name)
+
+    # The registry may have been cleared after the module was imported.
+    mapper = getattr(module, mapper_name, None)
+    if mapper is None:
+        raise MapperError('%s is not a valid Mapper. Is this Mapper defined?'
+                          % mapper_name)
+    return mapper
+
+
+def serialize_chunk(mapper_ref, start, objs, mapper_params, role,
+                    deferred_role):
+    """Serialize a chunk of objects in a worker.
+
+    :returns: list of serialized objects
+    """
+
+    mapper = resolve_mapper(*mapper_ref)
+    return mapper.many(**mapper_params).serialize(
+        objs, role=role, deferred_role=deferred_role)
+
+
+def serialize_json_chunk(mapper_ref, start, objs, mapper_params, role,
+                         deferred_role):
+    """Serialize a chunk of objects to JSON in a worker.
+
+    :returns: the JSON of each object separated by commas, without the
+        surrounding brackets
+    """
+
+    mapper = resolve_mapper(*mapper_ref)
+    chunks = mapper.many(**mapper_params).serialize_json(
+        objs, role=role, deferred_role=deferred_role)
+    return b''.join(chunks).decode('utf-8')[1:-1]
+
+
+def marshal_chunk(mapper_ref, start, data, mapper_params, role,
+                  as_mappings=False):
+    """Marshal a chunk of data in a worker.
+
+    :returns: tuple of ``start``, the list of marshaled objects, holding None
+        for invalid items, and a dict of the errors of invalid items keyed by
+        their index in the whole input
+    """
+
+    mapper = resolve_mapper(*mapper_ref)
+    results, errors = [], {}
+    items = mapper.many(**mapper_params)._iter_marshal(
+        data, role, index_errors=True, raise_errors=False,
+        as_mappings=as_mappings)
+    for i, result in enumerate(items):
+        if isinstance(result, MappingInvalid):
+            errors[start + i] = result.errors[i]
+            result = None
+        results.append(result)
+
+    return start, results, errors
+
+
+# Value of blank lines
+_BLANK = object()
+
+
+def _iter_lines(path, start, end):
+    """Yield the number, counted from the start of the range, and the
+    decoded value of each line between the byte offsets ``start`` and
+    ``end`` of ``path``.  Lines that are not valid JSON yield the ValueError
+    raised decoding them.
+    """
+
+    with open(path, 'rb') as fp:
+        data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            line_number, pos = 0, start
+            while pos < end:
+                newline = data.find(b'\n', pos, end)
+                if newline == -1:
+                    newline = end
+                line = data[pos:newline].strip()
+                pos = newline + 1
+                line_number += 1
+
+                if not line:
+                    yield line_number, _BLANK
+                    continue
+                try:
+                    value = json.loads(line.decode('utf-8'))
+                except ValueError as e:
+                    value = e
+                yield line_number, value
+        finally:
+            data.close()
+
+
+def marshal_range(mapper_ref, path, start, end, mapper_params, role):
+    """Marshal the lines of an NDJSON file between the byte offsets
+    ``start`` and ``end`` in a worker.
+
+    :returns: tuple of the number of lines in the range, a dict of marshaled
+        objects and a dict of errors, both keyed by the number of the line
+        in the range starting from 1
+    """
+
+    mapper = resolve_mapper(*mapper_ref)
+    results, errors = collections.OrderedDict(), {}
+
+    # Line numbers are queued as values are handed to the mapper, which
+    # marshals each value before asking for the next one.
+    line_numbers = collections.deque()
+    line_count = [0]
+
+    def iter_values():
+        for line_number, value in _iter_lines(path, start, end):
+            line_count[0] = line_number
+            if value is _BLANK:
+                continue
+            if isinstance(value, ValueError):
+                errors[line_number] = 'Invalid JSON: %s' % value
+                continue
+            line_numbers.append(line_number)
+            yield value
+
+    items = mapper.many(**mapper_params)._iter_marshal(
+        iter_values(), role, index_errors=True, raise_errors=False)
+    for i, result in enumerate(items):
+        line_number = line_numbers.popleft()
+        if isinstance(result, MappingInvalid):
+            errors[line_number] = result.errors[i]
+        else:
+            results[line_number] = result
+
+    return line_count[0], results, errors
+
+
+def split_file(path, parts):
+    """Split ``path`` in up to ``parts`` ranges of roughly the same size
+    ending on a newline.  Only the bytes around each boundary are read.
+
+    :param path: path of an NDJSON file
+    :param parts: number of ranges wanted
+    :returns: list of tuples of the start and end byte offsets of each range
+    """
+
+    size = os.path.getsize(path)
+    if not size:
+        return []
+
+    ranges = []
+    with open(path, 'rb') as fp:
+        data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            start = 0
+            for i in range(1, parts + 1):
+                if start >= size:
+                    break
+                end = size * i // parts
+                if end < size:
+                    newline = data.find(b'\n', max(end - 1, start))
+                    end = size if newline == -1 else newline + 1
+                if end > start:
+                    ranges.append((start, end))
+                    start = end
+        finally:
+            data.close()
+
+    return ranges
+
+
+def _chunks(items, chunk_size):
+    """Yield the index of the first item and the list of items of each chunk
+    of up to ``chunk_size`` ``items``.
+    """
+
+    start, chunk = 0, []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield start, chunk
+            start += len(chunk)
+            chunk = []
+
+    if chunk:
+        yield start, chunk
+
+
+def map_chunks(task, mapper_cls, items, workers,
+               chunk_size=DEFAULT_PARALLEL_CHUNK_SIZE, args=()):
+    """Call ``task`` for chunks of ``items`` in a pool of ``workers``
+    processes and yield the results in the order of ``items``.  At most two
+    chunks per worker are submitted ahead of the result being consumed so
+    ``items`` may be a large generator.
+
+    :param task: function called in the worker with a reference to
+        ``mapper_cls``, the index of the first item of the chunk, the chunk
+        and ``args``
+    :param mapper_cls: :class:`kim.mapper.Mapper` mapping the items
+    :param items: iterable of objects or data
+    :param workers: number of worker processes
+    :param chunk_size: number of items sent to a worker at a time
+    :raises: :class:`kim.exception.MapperError`
+    :returns: generator of the result of ``task`` for each chunk
+    """
+
+    mapper_ref = _mapper_ref(mapper_cls)
+    calls = ((mapper_ref, start, chunk) + tuple(args)
+             for start, chunk in _chunks(items, chunk_size))
+
+    return _map_ordered(task, calls, workers)
+
+
+def iter_marshal_file(mapper_cls, path, role='__default__', workers=None,
+                      mapper_params=None):
+    """Marshal every line of the NDJSON file at ``path`` in a pool of
+    ``workers`` processes.  The file is split on newlines in byte ranges
+    which workers read through ``mmap``, so this process only reads the
+    bytes around the boundaries of each range.
+
+    :param mapper_cls: :class:`kim.mapper.Mapper` marshaling each line
+    :param path: path of an NDJSON file
+    :param role: name of a role to use when marshaling
+    :param workers: number of worker processes, defaults to the number of
+        CPUs
+    :param mapper_params: dict of kwargs passed to each mapper
+    :raises: :class:`kim.exception.MapperError`
+    :returns: generator of a tuple for each range, in the order of the file,
+        of a dict of marshaled objects and a dict of errors, keyed by line
+        number starting from 1.  Lines that are not valid JSON have a string
+        error
+    """
+
+    workers = workers or multiprocessing.cpu_count()
+    params = dict(mapper_params or {})
+    ranges = split_file(path, workers * RANGES_PER_WORKER)
+    calls = ((_mapper_ref(mapper_cls), path, start, end, params, role)
+             for start, end in ranges)
+
+    offset = 0
+    for line_count, results, errors in _map_ordered(
+            marshal_range, calls, workers):
+        yield (
+            collections.OrderedDict(
+                (offset + line, obj) for line, obj in results.items()),
+            dict((offset + line, e) for line, e in errors.items()))
+        offset += line_count
+
+
+def _mapper_ref(mapper_cls):
+
+    return mapper_cls.__module__, mapper_cls.__name__
+
+
+def _map_ordered(task, calls, workers):
+    """Call ``task`` with the args of each item of ``calls`` in a pool of
+    ``workers`` processes, yielding the results in order with at most two
+    calls per worker in flight.
+    """
+
+    if ProcessPoolExecutor is None:
+        raise MapperError('Mapping in parallel requires concurrent.futures, '
+                          'install the futures package on python 2')
+
+    executor = ProcessPoolExecutor(workers)
+    pending = collections.deque()
+    try:
+        for args in calls:
+            pending.append(executor.submit(task, *args))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
@@ -9,7 +9,7 @@ from itertools import chain
 from functools import wraps
 
 from kim.exception import StopPipelineExecution, FieldError
-from kim.utils import attr_or_key, set_attr_or_key, attr_or_key_update
+from kim.utils import attr_or_key, set_attr_or_key, attr_or_key_update  # noqa
 
 
 class Session(object):
@@ -84,6 +84,18 @@ def pipe(**pipe_kwargs):
 
     :param run_if_none: Specify wether the pipe function should be called if session.data
         is None.
+    :param precondition: A function taking the :class:`kim.field.Field` the pipe
+        runs for.  When it returns False the pipe does nothing for that field and
+        is removed by :func:`optimize_pipes`.
+    :param halts: When the precondition holds, the pipe always stops the
+        pipeline, so any pipes following it are removed by :func:`optimize_pipes`.
+    :param ensures_data: True, or a function taking the field returning True,
+        when session.data is never None after the pipe has run.
+    :param preserves_data: The pipe never sets session.data to None when it
+        was not None to begin with.
+    :param style: ``session`` (the default) for pipes taking the session and
+        updating ``session.data``, or ``value`` for pipes taking the session and
+        the current value and returning the new value.
 
     Usage::
 
@@ -93,25 +105,123 @@ def pipe(**pipe_kwargs):
         def my_pipe(session):
 
             do_stuff(session)
+
+        @pipe(style='value')
+        def upper(session, value):
+
+            return value.upper()
+
+    Value pipes avoid reading and writing ``session.data`` for every pipe when
+    run by a field, but may still be called with a session like any other
+    pipe, in which case ``session.data`` is updated with the returned value.
+
+    .. versionchanged:: 1.2.0
+        added ``precondition``, ``halts``, ``ensures_data``, ``preserves_data``
+        and ``style``
     """
 
+    run_if_none = pipe_kwargs.get('run_if_none', False)
+    style = pipe_kwargs.get('style', 'session')
+    if style not in ('session', 'value'):
+        raise ValueError("pipe style must be 'session' or 'value', got %s"
+                         % style)
+
     def pipe_decorator(pipe_func):
 
-        @wraps(pipe_func)
-        def inner(session, *args, **kwargs):
+        if style == 'value':
 
-            if session.data is not None:
-                return pipe_func(session)
-            elif session.data is None and pipe_kwargs.get('run_if_none'):
-                return pipe_func(session)
-            else:
+            def unchecked(session, *args, **kwargs):
+                session.data = pipe_func(session, session.data)
+                return session.data
+
+            @wraps(pipe_func)
+            def inner(session, *args, **kwargs):
+
+                if session.data is not None or run_if_none:
+                    session.data = pipe_func(session, session.data)
                 return session.data
 
+            unchecked = wraps(pipe_func)(unchecked)
+            unchecked.value_func = inner.value_func = pipe_func
+            unchecked.checks_none = False
+            inner.checks_none = not run_if_none
+
+        else:
+
+            unchecked = pipe_func
+
+            @wraps(pipe_func)
+            def inner(session, *args, **kwargs):
+
+                if session.data is not None:
+                    return pipe_func(session)
+                elif session.data is None and run_if_none:
+                    return pipe_func(session)
+                else:
+                    return session.data
+
+        inner.pipe_func = pipe_func
+        inner.unchecked = unchecked
+        inner.style = style
+        inner.run_if_none = run_if_none
+        inner.precondition = pipe_kwargs.get('precondition')
+        inner.halts = pipe_kwargs.get('halts', False)
+        inner.ensures_data = pipe_kwargs.get('ensures_data', False)
+        inner.preserves_data = pipe_kwargs.get('preserves_data', False)
+
         return inner
 
     return pipe_decorator
 
 
+def optimize_pipes(pipes, field):
+    """Return the chain of ``pipes`` that has to run for ``field``.
+
+    * Pipes whose precondition is false for ``field`` are removed, eg.
+      :func:`is_valid_choice` when no choices are set.
+    * A pipe that ``halts`` the pipeline, like :func:`read_only` for read
+      only fields, and all the pipes after it are removed.
+    * The check for ``session.data`` being None added by :func:`pipe` is
+      removed for pipes marked ``run_if_none`` and for pipes that can only
+      receive data once an earlier pipe ``ensures_data``.
+
+    Functions not decorated with :func:`pipe` are left untouched.
+
+    :param pipes: list of pipe functions
+    :param field: the :class:`kim.field.Field` the pipes will run for
+    :returns: tuple of pipe functions
+
+    .. version-added: 1.2.0
+    """
+
+    chain = []
+    has_data = False
+    for pipe_func in pipes:
+        unchecked = getattr(pipe_func, 'unchecked', None)
+        if unchecked is None:
+            chain.append(pipe_func)
+            has_data = False
+            continue
+
+        precondition = pipe_func.precondition
+        if precondition is not None and not precondition(field):
+            continue
+        if pipe_func.halts:
+            break
+
+        if pipe_func.run_if_none or has_data:
+            chain.append(unchecked)
+        else:
+            chain.append(pipe_func)
+
+        ensures_data = pipe_func.ensures_data
+        if callable(ensures_data):
+            ensures_data = ensures_data(field)
+        has_data = ensures_data or (has_data and pipe_func.preserves_data)
+
+    return tuple(chain)
+
+
 class Pipeline(object):
     """Pipelines provide a simple, extensible way of processing data for
     a :class:`kim.field.Field`.  Each pipeline provides 4 input groups,
@@ -159,6 +269,54 @@ class Pipeline(object):
         return chain
 
 
+def pipeline_runner(pipes):
+    """Return a function running ``pipes`` for a session, equivalent to
+    :func:`run_pipeline`.
+
+    Pipes using the ``value`` style of :func:`pipe` are passed the current
+    value directly, ``session.data`` is only updated before calling a
+    ``session`` style pipe and once the pipeline has finished.
+
+    :param pipes: list of pipe functions, typically the result of
+        :func:`optimize_pipes`
+    :returns: function taking a :class:`Session` and returning
+        ``session.output``
+
+    .. version-added: 1.2.0
+    """
+
+    # 0: session pipe, 1: value pipe, 2: value pipe skipped when data is None
+    steps = []
+    for pipe_func in pipes:
+        value_func = getattr(pipe_func, 'value_func', None)
+        if value_func is None:
+            steps.append((pipe_func, 0))
+        else:
+            steps.append((value_func, 2 if pipe_func.checks_none else 1))
+    steps = tuple(steps)
+
+    def run(session):
+        data = session.data
+        try:
+            for func, mode in steps:
+                if mode == 1:
+                    data = func(session, data)
+                elif mode == 0:
+                    session.data = data
+                    func(session)
+                    data = session.data
+                elif data is not None:
+                    data = func(session, data)
+        except StopPipelineExecution:
+            return session.output
+
+        session.data = data
+        return session.output
+
+    run.pipes = tuple(pipes)
+    return run
+
+
 def run_pipeline(pipeline, session, field, **opts):
     """ Iterate over all of the defined ``pipes`` for this pipeline.
 
@@ -181,72 +339,78 @@ def run_pipeline(pipeline, session, field, **opts):
         return session.output
 
 
-@pipe(run_if_none=True)
-def get_data_from_name(session):
+def _data_from_name_is_set(field):
+    opts = field.opts
+    return not opts._is_wrapped and (
+        opts.required or opts.default is not None or not opts.allow_none)
+
+
+@pipe(style='value', run_if_none=True, ensures_data=_data_from_name_is_set)
+def get_data_from_name(session, value):
     """Extracts a specific key from data using ``field.name``.  This pipe is
     typically used as the entry point to a chain of input pipes.
 
     :param session: Kim pipeline session instance
+    :param value: the data being marshaled
 
     :rtype: mixed
     :returns: the key found in data using field.name
 
     """
 
+    opts = session.field.opts
+
     # If the field is wrapped by another field then the relevant data
     # will have already been pulled from the name.
-    if session.field.opts._is_wrapped:
-        return session.data
+    if opts._is_wrapped:
+        return value
 
-    value = attr_or_key(session.data, session.field.name)
+    value = opts._name_getter(value)
 
     if value is None:
-        if session.field.opts.required and session.field.opts.default is None:
+        if opts.required and opts.default is None:
             raise session.field.invalid(error_type='required')
-        elif session.field.opts.default is not None:
-            session.data = session.field.opts.default
-            return session.data
-        elif not session.field.opts.allow_none:
+        elif opts.default is not None:
+            return opts.default
+        elif not opts.allow_none:
             raise session.field.invalid(error_type='none_not_allowed')
 
-    session.data = value
-    return session.data
+    return value
 
 
-@pipe()
-def get_data_from_source(session):
+@pipe(style='value')
+def get_data_from_source(session, value):
     """Extracts a specific key from data using ``field.source``.  This pipe is
     typically used as the entry point to a chain of output pipes.
 
     :param session: Kim pipeline session instance
+    :param value: the object being serialized
 
     :rtype: mixed
     :returns: the key found in data using field.source
 
     """
 
-    source = session.field.opts.source
+    opts = session.field.opts
 
     # If the field is wrapped by another field then the relevant data
     # will have already been pulled from the source.
-    if session.field.opts._is_wrapped or source == '__self__':
-        return session.data
+    if opts._is_wrapped or opts.source == '__self__':
+        return value
 
-    value = attr_or_key(session.data, source)
-    session.data = value
-    return session.data
+    return opts._source_getter(value)
 
 
-@pipe(run_if_none=True)
-def get_field_if_required(session):
+@pipe(style='value', run_if_none=True)
+def get_field_if_required(session, value):
 
-    if session.data is None:
-        session.data = session.field.opts.default
+    if value is None:
+        return session.field.opts.default
 
-    return session.data
+    return value
 
 
-@pipe()
+@pipe(precondition=lambda field: field.opts.read_only, halts=True)
 def read_only(session):
     """End processing of a pipeline if a Field is marked as read_only.
 
@@ -261,51 +425,71 @@ def read_only(session):
     return session.data
 
 
-@pipe()
-def is_valid_choice(session):
-    """End processing of a pipeline if a Field is marked as read_only.
+@pipe(style='value', preserves_data=True,
+      precondition=lambda field: field.opts.choices is not None)
+def is_valid_choice(session, value):
+    """Check the value is one of the choices set on the field.
 
     :param session: Kim pipeline session instance
+    :param value: the current value
 
-    :raises  StopPipelineExecution:
+    :raises: :class:`kim.exception.FieldInvalid`
     """
 
     choices = session.field.opts.choices
-    if choices is not None and session.data not in choices:
+    if choices is not None and value not in choices:
         raise session.field.invalid('invalid_choice')
 
-    return session.data
+    return value
 
 
-@pipe(run_if_none=True)
-def update_output_to_name(session):
+@pipe(style='value', run_if_none=True)
+def update_output_to_name(session, value):
     """Store ``data`` at ``field[name]`` for a ``field`` inside
     of ``output``
 
     :param session: Kim pipeline session instance
+    :param value: the serialized value
 
-    :returns: None
+    :returns: value
     """
-    session.output[session.field.name] = session.data
+    session.output[session.field.name] = value
+    return value
 
 
-@pipe(run_if_none=True)
-def update_output_to_source(session):
+@pipe(style='value', run_if_none=True)
+def update_output_to_source(session, value):
     """Store ``data`` at field.opts.source for a ``field`` inside
     of ``output``
 
+    When the mapper tracks changes, values equal to the existing value are
+    not written and changed values are recorded in the ``changes`` of the
+    mapper session.
+
     :param session: Kim pipeline session instance
+    :param value: the marshaled value
 
     :raises: FieldError
-    :returns: None
+    :returns: value
+
+    .. version-changed: 1.2.0
+        Skip unchanged values when tracking changes
     """
 
-    source = session.field.opts.source
+    opts = session.field.opts
+    changes = getattr(session.mapper_session, 'changes', None)
+    if changes is not None and opts.source != '__self__':
+        old = opts._source_getter(session.output)
+        if old is value or (type(old) is type(value) and old == value):
+            return value
+        # Pipes may have already recorded a more detailed change
+        if session.field.name not in changes:
+            changes[session.field.name] = (old, value)
+
     try:
-        if source == '__self__':
-            attr_or_key_update(session.output, session.data)
-        else:
-            set_attr_or_key(session.output, session.field.opts.source, session.data)
+        opts._source_setter(session.output, value)
     except (TypeError, AttributeError):
         raise FieldError('output does not support attribute or '
                          'key based set operations')
+
+    return value
@@ -10,19 +10,16 @@ from .marshaling import MarshalPipeline
 from .serialization import SerializePipeline
 
 
-@pipe()
-def coerce_to_boolean(session):
+@pipe(style='value', preserves_data=True)
+def coerce_to_boolean(session, value):
     """Given a valid boolean value, ie True, 'true', 'false', False, 0, 1
     set the data to the python boolean type True or False
 
     :param session: Kim pipeline session instance
+    :param value: the current value
     """
-    if session.data in session.field.opts.true_boolean_values:
-        session.data = True
-    else:
-        session.data = False
 
-    return session.data
+    return value in session.field.opts.true_boolean_values
 
 
 class BooleanMarshalPipeline(MarshalPipeline):
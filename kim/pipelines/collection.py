@@ -5,14 +5,252 @@
 # This module is part of Kim and is released under
 # the MIT License: http://www.opensource.org/licenses/mit-license.php
 
+import itertools
+from collections import namedtuple
+
 from kim.exception import FieldInvalid
-from kim.utils import attr_or_key
+from kim.utils import attr_or_key, attr_or_key_getter
 
-from .base import pipe
+from .base import (
+    pipe, optimize_pipes, pipeline_runner, read_only, update_output_to_source,
+    Session)
+from .nested import batch_load, get_batch_memo
 from .marshaling import MarshalPipeline
 from .serialization import SerializePipeline
 
 
+#: The changes made to a Collection of Nested fields by a mapper tracking
+#: changes.  ``added`` holds the elements created or added, ``updated`` the
+#: existing elements changed in place and ``removed`` the existing elements
+#: no longer in the collection.
+CollectionChanges = namedtuple(
+    'CollectionChanges', ['added', 'updated', 'removed'])
+
+# Returned when no existing element is paired with an item
+_missing = object()
+
+
+def _key_reader(key_field):
+    """Return a function reading the key of an item of data at the name of
+    ``key_field`` and converting it with the field, so ``'5'`` is read as
+    ``5`` by an Integer field.  Items whose key the field rejects have no
+    key.
+    """
+
+    # The key is read even when the field is read only, and never written
+    pipes = [p for p in key_field.marshal_pipes
+             if p is not read_only and p is not update_output_to_source]
+    runner = pipeline_runner(optimize_pipes(pipes, key_field))
+
+    def read(datum):
+        session = Session(key_field, datum, {})
+        try:
+            runner(session)
+        except FieldInvalid:
+            return None
+        return session.data
+
+    return read
+
+
+class KeyIndex(object):
+    """Index of objects by the value identifying them, used to pair items of
+    data with the existing objects they should be marshaled into.
+
+    Objects are read at the source of the field named ``key`` and data at
+    its name, through the marshal pipes of the field, so the data is
+    compared in the form it would be marshaled.  When the Mapper has no
+    field named ``key`` both are read at ``key``.
+
+    .. version-added: 1.2.0
+    """
+
+    def __init__(self, mapper_cls, key, objs=()):
+        """Instantiate a new instance of :class:`KeyIndex`
+
+        :param mapper_cls: :class:`kim.mapper.Mapper` class of the objects
+        :param key: name of the field, or attribute, identifying an object
+        :param objs: iterable of objects to index
+        """
+
+        #: The field named ``key`` or None.
+        self.key_field = mapper_cls.fields.get(key)
+        if self.key_field is not None:
+            self.obj_key = self.key_field.opts._source_getter
+            self.data_key = _key_reader(self.key_field)
+        else:
+            self.obj_key = self.data_key = attr_or_key_getter(key)
+
+        self.index = {}
+        for obj in objs:
+            self.add(obj)
+
+    def add(self, obj):
+        """Index ``obj`` by its key, unless it has none."""
+
+        if obj is not None:
+            key = self.obj_key(obj)
+            if key is not None:
+                self.index[key] = obj
+
+    def find(self, datum):
+        """Return the object whose key is the key of ``datum`` or None."""
+
+        if datum is None:
+            return None
+        key = self.data_key(datum)
+        if key is None:
+            return None
+        return self.index.get(key)
+
+
+class ExistingElements(object):
+    """Pairs the items of the data marshaled by a Collection with the
+    elements of the existing collection, by position or, for Collections
+    with ``match_on``, through a :class:`KeyIndex` of the elements built
+    once.
+
+    .. version-added: 1.2.0
+    """
+
+    def __init__(self, field, existing_value):
+        """Instantiate a new instance of :class:`ExistingElements`
+
+        :param field: the :class:`kim.field.Collection` being marshaled
+        :param existing_value: the existing collection or None
+        """
+
+        self.field = field
+        self.existing = existing_value
+        self.index = None
+
+        match_on = field.opts.match_on
+        if match_on is None or existing_value is None:
+            return
+
+        self.existing = list(existing_value)
+        self.index = KeyIndex(
+            field.opts.field.get_mapper(as_class=True), match_on,
+            self.existing)
+
+    def find(self, i, datum):
+        """Return the existing element the ``i`` th item of the data,
+        ``datum``, should be marshaled into, or ``_missing``.
+        """
+
+        if self.existing is None:
+            return _missing
+
+        if self.index is None:
+            try:
+                return self.existing[i]
+            except IndexError:
+                return _missing
+
+        element = self.index.find(datum)
+        return _missing if element is None else element
+
+    def get_changes(self, output, updated):
+        """Return the :class:`CollectionChanges` of replacing the existing
+        elements with ``output``, or None if nothing changed.
+
+        :param output: list of marshaled elements
+        :param updated: list of existing elements changed in place
+        """
+
+        existing = self.existing or []
+        existing_ids = set(id(e) for e in existing)
+        output_ids = set(id(e) for e in output)
+
+        added = [e for e in output if id(e) not in existing_ids]
+        removed = [e for e in existing if id(e) not in output_ids]
+        if added or updated or removed:
+            return CollectionChanges(added, updated, removed)
+
+
+class CollectionItems(object):
+    """Iterates over the items of the data marshaled by a Collection, setting
+    up a :class:`kim.mapper.MapperSession` for each item and collecting the
+    element it's marshaled into.
+
+    Iterating yields the mapper session of each item, which must be marshaled
+    through :attr:`field` before the next item is requested.  Used by
+    :func:`marshall_collection` and by :mod:`kim.aio`, which await each item.
+
+    .. version-added: 1.2.0
+    """
+
+    def __init__(self, session):
+        """Instantiate a new instance of :class:`CollectionItems`
+
+        :param session: Kim pipeline session of the Collection
+        :raises: :class:`kim.exception.FieldInvalid`
+        """
+
+        self.session = session
+        #: The field wrapped by the Collection each item is marshaled with.
+        self.field = session.field.opts.field
+        self.existing = ExistingElements(
+            session.field, session.field.opts._source_getter(session.output))
+        self.changes = getattr(session.mapper_session, 'changes', None)
+        # Elements of Nested fields may be updated in place, whether they're
+        # paired by position or with match_on
+        self.track = self.changes is not None and \
+            hasattr(self.field, 'get_mapper')
+        self.output = []
+        self.updated = []
+
+        if session.data is not None:
+            if not hasattr(session.data, '__iter__'):
+                raise session.field.invalid('type_error')
+
+            # Load the objects of every item at once
+            if getattr(self.field.opts, 'batch_getter', None):
+                batch_load(self.field, session.data, get_batch_memo(session))
+
+    def __iter__(self):
+
+        session = self.session
+        if session.data is None:
+            return
+
+        source = self.field.opts.source
+        mapper_session = session.mapper.get_mapper_session(None, None)
+        mapper_session.changes = None
+        for i, datum in enumerate(session.data):
+            _output = {}
+            # If the object already exists, try to match up the existing
+            # elements with those in the input json
+            element = self.existing.find(i, datum)
+            if element is not _missing:
+                _output[source] = element
+
+            if self.track:
+                mapper_session.changes = {}
+            mapper_session.data = datum
+            mapper_session.output = _output
+            yield mapper_session
+
+            result = _output[source]
+            self.output.append(result)
+            if self.track and mapper_session.changes and result is element:
+                self.updated.append(result)
+
+    def finish(self):
+        """Record the changes made to the collection and return the list of
+        marshaled elements as the data of the session.
+        """
+
+        if self.track:
+            collection_changes = self.existing.get_changes(
+                self.output, self.updated)
+            if collection_changes is not None:
+                self.changes[self.session.field.name] = collection_changes
+
+        self.session.data = self.output
+        return self.session.data
+
+
 @pipe(run_if_none=True)
 def marshall_collection(session):
     """iterate over each item in ``data`` and marshal the item through the
@@ -22,33 +260,64 @@ def marshall_collection(session):
 
     TODO(mike) this should be called marshal_collection
     """
-    wrapped_field = session.field.opts.field
-    existing_value = attr_or_key(session.output, session.field.opts.source)
 
-    output = []
+    items = CollectionItems(session)
+    for mapper_session in items:
+        items.field.marshal(mapper_session, parent_session=session)
 
-    if session.data is not None:
-        if not hasattr(session.data, '__iter__'):
-            raise session.field.invalid('type_error')
+    return items.finish()
 
-        for i, datum in enumerate(session.data):
-            _output = {}
-            # If the object already exists, try to match up the existing elements
-            # with those in the input json
-            if existing_value is not None:
-                try:
-                    _output[wrapped_field.opts.source] = existing_value[i]
-                except IndexError:
-                    pass
 
-            mapper_session = session.mapper.get_mapper_session(datum, _output)
-            wrapped_field.marshal(mapper_session, parent_session=session)
+def _is_query(value):
 
-            result = _output[wrapped_field.opts.source]
-            output.append(result)
+    return callable(getattr(value, 'limit', None)) and \
+        callable(getattr(value, 'offset', None))
 
-    session.data = output
-    return session.data
+
+def get_page(value, limit, offset=0, count=False):
+    """Return up to ``limit`` elements of ``value``, or all of them when
+    ``limit`` is None, starting at ``offset``.
+    Queries, objects with ``limit`` and ``offset`` methods such as SQLAlchemy
+    dynamic relationships, are limited so only the rows returned are loaded.
+
+    One more element than ``limit`` is read to find out if there's a next
+    page, so the total is only computed when ``count`` is set.
+
+    :param value: list, iterable or query of elements
+    :param limit: maximum number of elements returned or None
+    :param offset: number of elements skipped
+    :param count: compute the total number of elements
+    :returns: tuple of the list of elements, the offset of the next page or
+        None, and the total number of elements or None
+
+    .. version-added: 1.2.0
+    """
+
+    total = None
+    if _is_query(value):
+        query = value.offset(offset)
+        items = list(query if limit is None else query.limit(limit + 1))
+        if count:
+            total = value.count()
+    elif isinstance(value, (list, tuple)):
+        items = list(value[offset:] if limit is None
+                     else value[offset:offset + limit + 1])
+        if count:
+            total = len(value)
+    else:
+        iterator = iter(value)
+        skipped = sum(1 for _ in itertools.islice(iterator, offset))
+        items = list(itertools.islice(
+            iterator, None if limit is None else limit + 1))
+        if count:
+            total = skipped + len(items) + sum(1 for _ in iterator)
+
+    next_offset = None
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        next_offset = offset + limit
+
+    return items, next_offset, total
 
 
 @pipe()
@@ -58,11 +327,19 @@ def serialize_collection(session):
 
     :param session: Kim pipeline session instance
 
+    .. version-changed: 1.2.0
+        Apply the ``limit`` and ``offset`` of the collection
     """
-    wrapped_field = session.field.opts.field
+    opts = session.field.opts
+    wrapped_field = opts.field
     field_name = wrapped_field.name
     output = []
 
+    data = session.data
+    if opts.limit is not None or opts.offset:
+        data, next_offset, total = get_page(
+            data, opts.limit, offset=opts.offset or 0, count=opts.count)
+
     mapper_session = session.mapper.get_mapper_session(None, {})
 
     # If the wrapped field uses a mapper, fetch it once to avoid looking up the mapper
@@ -72,12 +349,17 @@ def serialize_collection(session):
         'get_mapper',
         lambda **kwargs: None)(as_class=True)
 
-    for datum in session.data:
+    for datum in data:
         mapper_session.data = datum
         mapper_session.output = {}
         wrapped_field.serialize(mapper_session, parent_session=session)
         output.append(mapper_session.output[field_name])
 
+    if opts.paginate:
+        output = {'items': output, 'next': next_offset}
+        if opts.count:
+            output['total'] = total
+
     session.data = output
     return session.data
 
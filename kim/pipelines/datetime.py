@@ -12,29 +12,27 @@ from .marshaling import MarshalPipeline
 from .serialization import SerializePipeline
 
 
-@pipe()
-def is_valid_datetime(session):
+@pipe(style='value', preserves_data=True)
+def is_valid_datetime(session, value):
     """Pipe used to determine if a value can be coerced to a datetime
 
     :param session: Kim pipeline session instance
+    :param value: the current value
 
     """
 
-    if session.data is not None:
-        try:
-            session.data = iso8601.parse_date(session.data)
-        except iso8601.ParseError:
-            raise session.field.invalid(error_type='type_error')
-    return session.data
+    try:
+        return iso8601.parse_date(value)
+    except iso8601.ParseError:
+        raise session.field.invalid(error_type='type_error')
 
 
-@pipe()
-def format_datetime(session):
+@pipe(style='value', preserves_data=True)
+def format_datetime(session, value):
     """convert datetime object to isoformat() datetime str
     """
-    if session.data is not None:
-        session.data = session.data.isoformat()
-    return session.data
+
+    return value.isoformat()
 
 
 class DateTimeMarshalPipeline(MarshalPipeline):
@@ -60,13 +58,12 @@ class DateTimeSerializePipeline(SerializePipeline):
     process_pipes = [format_datetime, ] + SerializePipeline.process_pipes
 
 
-@pipe()
-def cast_to_date(session):
+@pipe(style='value', preserves_data=True)
+def cast_to_date(session, value):
     """cast session.data datetime object to a date() instance
     """
-    if session.data is not None:
-        session.data = session.data.date()
-    return session.data
+
+    return value.date()
 
 
 class DateMarshalPipeline(DateTimeMarshalPipeline):
@@ -5,8 +5,6 @@
 # This module is part of Kim and is released under
 # the MIT License: http://www.opensource.org/licenses/mit-license.php
 
-from kim.utils import attr_or_key
-
 from .base import pipe
 from .marshaling import MarshalPipeline
 from .serialization import SerializePipeline
@@ -16,6 +14,70 @@ def _call_getter(session):
     if session.field.opts.getter:
         result = session.field.opts.getter(session)
         return result
+    if session.field.opts.batch_getter:
+        return batch_get(session.field, session.data, get_batch_memo(session))
+
+
+def get_batch_memo(session):
+    """Return the dict memoising the objects loaded by ``batch_getter``
+    functions for the marshal ``session`` is part of.  The memo is stored on
+    the outermost mapper so nested mappers share it.
+
+    :returns: dict of ``batch_getter`` to a dict of key to object
+    """
+
+    mapper = session.mapper
+    while mapper.parent is not None:
+        mapper = mapper.parent
+
+    memo = getattr(mapper, '_batch_memo', None)
+    if memo is None:
+        memo = mapper._batch_memo = {}
+    return memo
+
+
+def batch_load(field, items, memo):
+    """Load the objects of every item of ``items`` not already in ``memo``
+    with a single call to the ``batch_getter`` of the Nested ``field``.
+
+    :param field: :class:`kim.field.Nested` field with a ``batch_getter``
+    :param items: iterable of input data for ``field``
+    :param memo: dict returned by :func:`get_batch_memo`
+    """
+
+    opts = field.opts
+    loaded = memo.setdefault(opts.batch_getter, {})
+
+    keys = []
+    for item in items:
+        if item is None:
+            continue
+        key = opts.batch_key(item)
+        if key is not None and key not in loaded:
+            loaded[key] = None
+            keys.append(key)
+
+    if keys:
+        loaded.update(opts.batch_getter(keys))
+
+
+def batch_get(field, item, memo):
+    """Return the object loaded by the ``batch_getter`` of ``field`` for
+    ``item``, loading it if it hasn't been already.
+
+    :returns: object or None
+    """
+
+    key = field.opts.batch_key(item)
+    if key is None:
+        return None
+
+    loaded = memo.get(field.opts.batch_getter)
+    if loaded is None or key not in loaded:
+        batch_load(field, [item], memo)
+        loaded = memo[field.opts.batch_getter]
+
+    return loaded[key]
 
 
 @pipe()
@@ -44,6 +106,33 @@ def marshal_nested(session):
     """
 
     resolved = _call_getter(session)
+    nested_mapper = _get_nested_mapper(session, resolved)
+    if nested_mapper is None:
+        session.data = resolved
+    else:
+        session.data = nested_mapper.marshal(role=session.field.opts.role)
+        _record_changes(session, nested_mapper)
+
+    return session.data
+
+
+def _record_changes(session, nested_mapper):
+    """Record the changes made by ``nested_mapper`` when the mapper of
+    ``session`` tracks changes and the existing object was updated in place.
+    """
+
+    changes = getattr(session.mapper_session, 'changes', None)
+    if changes is not None and nested_mapper.changes and \
+            session.data is session.field.opts._source_getter(session.output):
+        changes[session.field.name] = nested_mapper.changes
+
+
+def _get_nested_mapper(session, resolved):
+    """Return the nested mapper marshaling ``session.data`` given the object
+    ``resolved`` by the getter, or None if ``resolved`` should be used as is.
+
+    :raises: :class:`kim.exception.FieldInvalid`
+    """
 
     partial = session.mapper_session.partial
     parent_mapper = session.mapper
@@ -55,29 +144,23 @@ def marshal_nested(session):
 
     if resolved is not None:
         if session.field.opts.allow_updates:
-            nested_mapper = nested_mapper_class(
+            return nested_mapper_class(
                 data=session.data, obj=resolved, partial=partial,
                 parent=parent_mapper)
-            session.data = nested_mapper.marshal(role=session.field.opts.role)
-        else:
-            session.data = resolved
+        return None
+
+    existing_value = session.field.opts._name_getter(session.output)
+    if (session.field.opts.allow_updates_in_place or
+            session.field.opts.allow_partial_updates) and \
+            existing_value is not None:
+        return nested_mapper_class(
+            data=session.data, obj=existing_value, partial=partial,
+            parent=parent_mapper)
+    elif session.field.opts.allow_create:
+        return nested_mapper_class(
+            data=session.data, partial=partial, parent=parent_mapper)
     else:
-        existing_value = attr_or_key(session.output, session.field.name)
-        if (session.field.opts.allow_updates_in_place or
-                session.field.opts.allow_partial_updates) and \
-                existing_value is not None:
-            nested_mapper = nested_mapper_class(
-                data=session.data, obj=existing_value, partial=partial,
-                parent=parent_mapper)
-            session.data = nested_mapper.marshal(role=session.field.opts.role)
-        elif session.field.opts.allow_create:
-            nested_mapper = nested_mapper_class(
-                data=session.data, partial=partial, parent=parent_mapper)
-            session.data = nested_mapper.marshal(role=session.field.opts.role)
-        else:
-            raise session.field.invalid(error_type='not_found')
-
-    return session.data
+        raise session.field.invalid(error_type='not_found')
 
 
 @pipe(run_if_none=True)
@@ -12,41 +12,43 @@ from .marshaling import MarshalPipeline
 from .serialization import SerializePipeline
 
 
-@pipe()
-def is_valid_integer(session):
+@pipe(style='value', preserves_data=True)
+def is_valid_integer(session, value):
     """Pipe used to determine if a value can be coerced to an int
 
     :param session: Kim pipeline session instance
+    :param value: the current value
 
     """
 
     try:
-        session.data = int(session.data)
+        return int(value)
     except TypeError:
         raise session.field.invalid(error_type='type_error')
     except ValueError:
         raise session.field.invalid(error_type='type_error')
-    return session.data
 
 
-@pipe()
-def bounds_check(session):
+@pipe(style='value', preserves_data=True, precondition=lambda field: (
+    field.opts.min is not None or field.opts.max is not None))
+def bounds_check(session, value):
     """Pipe used to determine if a value is within the min and max bounds on
     the field
 
     :param session: Kim pipeline session instance
+    :param value: the current value
 
     """
 
     max_ = session.field.opts.max
     min_ = session.field.opts.min
 
-    if max_ is not None and session.data > max_:
+    if max_ is not None and value > max_:
         raise session.field.invalid(error_type='out_of_bounds')
-    if min_ is not None and session.data < min_:
+    if min_ is not None and value < min_:
         raise session.field.invalid(error_type='out_of_bounds')
 
-    return session.data
+    return value
 
 
 class IntegerMarshalPipeline(MarshalPipeline):
@@ -72,7 +74,7 @@ class IntegerSerializePipeline(SerializePipeline):
     pass
 
 
-@pipe()
+@pipe(preserves_data=True)
 def is_valid_decimal(session):
     """Pipe used to determine if a value can be coerced to a Decimal
 
@@ -85,14 +87,13 @@ def is_valid_decimal(session):
         raise session.field.invalid(error_type='type_error')
 
 
-@pipe()
-def coerce_to_decimal(session):
+@pipe(style='value', preserves_data=True)
+def coerce_to_decimal(session, value):
     """Coerce str representation of a decimal into a valid Decimal object.
     """
     decimals = session.field.opts.precision
     precision = Decimal('0.' + '0' * (decimals - 1) + '1')
-    session.data = Decimal(session.data).quantize(precision)
-    return session.data
+    return Decimal(value).quantize(precision)
 
 
 class DecimalMarshalPipeline(MarshalPipeline):
@@ -109,13 +110,12 @@ class DecimalMarshalPipeline(MarshalPipeline):
 
 
 # TODO(mike) This should probably move to base
-@pipe()
-def to_string(session):
+@pipe(style='value', preserves_data=True)
+def to_string(session, value):
     """coerce decimal value into str so it's valid for json
     """
-    if session.data is not None:
-        session.data = str(session.data)
-        return session.data
+
+    return str(value)
 
 
 class DecimalSerializePipeline(SerializePipeline):
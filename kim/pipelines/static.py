@@ -9,14 +9,12 @@ from .base import pipe
 from .serialization import SerializePipeline
 
 
-@pipe(run_if_none=True)
-def get_static_value(session):
+@pipe(style='value', run_if_none=True)
+def get_static_value(session, value):
     """return the static value specified in FieldOpts
     """
 
-    session.data = session.field.opts.value
-
-    return session.data
+    return session.field.opts.value
 
 
 class StaticSerializePipeline(SerializePipeline):
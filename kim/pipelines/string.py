@@ -12,16 +12,16 @@ from .marshaling import MarshalPipeline
 from .serialization import SerializePipeline
 
 
-@pipe()
-def is_valid_string(session):
+@pipe(style='value', preserves_data=True)
+def is_valid_string(session, value):
     """Pipe used to determine if a value can be coerced to a string
 
     :param session: Kim pipeline session instance
+    :param value: the current value
     """
 
     try:
-        session.data = six.text_type(session.data)
-        return session.data
+        return six.text_type(value)
     except ValueError:
         raise session.field.invalid(error_type='type_error')
 
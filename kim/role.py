@@ -34,6 +34,10 @@ class Role(set):
 
     """
 
+    #: :class:`kim.utils.ConfigVersion` of the role, created once the role is
+    #: used by a Mapper.
+    _config_version = None
+
     def __init__(self, *args, **kwargs):
         """initialise a new :class:`Role`.
 
@@ -44,6 +48,11 @@ class Role(set):
         self.whitelist = kwargs.pop('whitelist', True)
         super(Role, self).__init__(args)
 
+    def __reduce__(self):
+        # set pickles its items as a single list, roles are created from
+        # positional args.  Used to send deferred roles to worker processes.
+        return self.__class__, tuple(self), self.__dict__
+
     @property
     def fields(self):
         """return an iterable containing all the field names defined in this
@@ -174,6 +183,31 @@ class Role(set):
         return Role(*[k for k in result], whitelist=whitelist)
 
 
+def _track_mutation(name):
+    """Wrap the set method ``name`` so mutating a :class:`Role` in place
+    bumps its :class:`kim.utils.ConfigVersion`, deoptimizing the Mappers
+    using it.
+    """
+
+    method = getattr(set, name)
+
+    def mutate(self, *args):
+        if self._config_version is not None:
+            self._config_version.bump()
+        return method(self, *args)
+
+    mutate.__name__ = name
+    mutate.__doc__ = method.__doc__
+    return mutate
+
+
+for _name in ('add', 'clear', 'discard', 'pop', 'remove', 'update',
+              'difference_update', 'intersection_update',
+              'symmetric_difference_update', '__ior__', '__iand__',
+              '__isub__', '__ixor__'):
+    setattr(Role, _name, _track_mutation(_name))
+
+
 class whitelist(Role):
     """ Whitelists are roles that define a list of fields that are
     permitted for inclusion when marhsaling or serializing.
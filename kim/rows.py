@@ -0,0 +1,124 @@
+# kim/rows.py
+# Copyright (C) 2014-2016 the Kim authors and contributors
+# <see AUTHORS file>
+#
+# This module is part of Kim and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+"""Read database rows, such as SQLAlchemy Core result rows or plain tuples,
+by position so they can be serialized without building ORM objects.
+
+Columns are grouped by their dunder_score names the same way Mappers
+created with ``raw=True`` transform data, so a ``company__name`` column is
+read as ``{'company': {'name': ...}}``.
+
+.. version-added: 1.2.0
+"""
+
+from collections import OrderedDict
+
+from .exception import MapperError
+from .field import Static
+
+
+def get_row_columns(row):
+    """Return the column names of ``row``.
+
+    :param row: a SQLAlchemy row or a namedtuple
+    :raises: :class:`kim.exception.MapperError`
+    :returns: list of column names
+    """
+
+    columns = getattr(row, '_fields', None)
+    if columns is None and hasattr(row, 'keys'):
+        columns = row.keys()
+    if columns is None:
+        raise MapperError('%s object does not name its columns, columns are '
+                          'required to serialize rows' % type(row))
+    return list(columns)
+
+
+def get_role_columns(mapper_cls, role='__default__', deferred_role=None):
+    """Return the names of the top level keys read by the fields of
+    ``mapper_cls`` for ``role``, or None if a field reads the whole object.
+
+    :rtype: frozenset or None
+    """
+
+    names = set()
+    plan = mapper_cls._get_plan(role, deferred_role=deferred_role)
+    for field in plan.fields:
+        if isinstance(field, Static):
+            continue
+        if field.opts.source == '__self__':
+            return None
+        names.add(field.opts.source.split('.', 1)[0])
+
+    return frozenset(names)
+
+
+def _group_reader(tree, top_level=False):
+
+    values = [(key, index) for key, index in tree.items()
+              if not isinstance(index, dict)]
+    groups = [(key, _group_reader(node)) for key, node in tree.items()
+              if isinstance(node, dict)]
+
+    def read(row):
+        output = {}
+        empty = True
+        for key, index in values:
+            value = output[key] = row[index]
+            if value is not None:
+                empty = False
+        for key, read_group in groups:
+            value = output[key] = read_group(row)
+            if value is not None:
+                empty = False
+
+        # Groups of an outer join that didn't match are None.
+        if empty and not top_level:
+            return None
+        return output
+
+    return read
+
+
+def row_reader(columns, names=None):
+    """Return a function reading a row with ``columns`` into a dict.  The
+    position of each column is looked up once, when the reader is created,
+    and rows are then read by index.
+
+    :param columns: list of column names of the rows.  ``__`` separates the
+        keys of nested dicts
+    :param names: optional set of top level keys to read, columns of other
+        keys are skipped
+    :returns: function taking a row and returning a dict
+
+    Usage::
+
+        >>> read = row_reader(['id', 'company__id', 'company__name'])
+        >>> read((1, 2, 'Acme'))
+        {'id': 1, 'company': {'id': 2, 'name': 'Acme'}}
+        >>> read((1, None, None))
+        {'id': 1, 'company': None}
+    """
+
+    tree = OrderedDict()
+    for index, column in enumerate(columns):
+        path = column.split('__')
+        if names is not None and path[0] not in names:
+            continue
+
+        node = tree
+        for component in path[:-1]:
+            node = node.setdefault(component, OrderedDict())
+            if not isinstance(node, dict):
+                raise MapperError('column %s conflicts with column %s'
+                                  % (column, component))
+        if isinstance(node.get(path[-1]), dict):
+            raise MapperError('column %s conflicts with the columns '
+                              'grouped under it' % column)
+        node[path[-1]] = index
+
+    return _group_reader(tree, top_level=True)
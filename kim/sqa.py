@@ -0,0 +1,220 @@
+# kim/sqa.py
+# Copyright (C) 2014-2016 the Kim authors and contributors
+# <see AUTHORS file>
+#
+# This module is part of Kim and is released under
+# the MIT License: http://www.opensource.org/licenses/mit-license.php
+
+"""SQLAlchemy support for Kim.  This module requires SQLAlchemy.
+
+Serializing :class:`kim.field.Nested` and :class:`kim.field.Collection`
+fields backed by relationships lazy loads each relationship of each object.
+:func:`eager_load` prepares a query to load everything a Mapper serializes
+for a role up front, in one query per relationship, and only the columns the
+role uses::
+
+    query = eager_load(session.query(Post), PostMapper, role='public')
+    data = PostMapper.many().serialize(query.all(), role='public')
+
+.. version-added: 1.2.0
+"""
+
+import collections
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only
+
+try:
+    from sqlalchemy.orm import selectinload
+except ImportError:  # pragma: no cover
+    # SQLAlchemy < 1.2
+    from sqlalchemy.orm import subqueryload as selectinload
+
+from .field import Collection, Nested, Static
+
+
+class LoadPlan(object):
+    """The columns and relationships of a model serialized by a Mapper for a
+    role.
+
+    .. version-added: 1.2.0
+    """
+
+    def __init__(self, model):
+        """Instantiate a new instance of :class:`LoadPlan`
+
+        :param model: the mapped class being loaded
+        """
+
+        self.model = model
+        #: Names of the column attributes used, or None when every column
+        #: should be loaded because a field reads an attribute that isn't a
+        #: column, such as a property.
+        self.columns = []
+        #: :class:`LoadPlan` of each relationship used, keyed by name.
+        self.relationships = collections.OrderedDict()
+
+    def _add_column(self, name):
+
+        if self.columns is not None and name not in self.columns:
+            self.columns.append(name)
+
+    def options(self, collection_loader=selectinload,
+                scalar_loader=joinedload):
+        """Return the loader options loading this plan.
+
+        :param collection_loader: loader used for one to many and many to
+            many relationships, :func:`sqlalchemy.orm.selectinload` by
+            default
+        :param scalar_loader: loader used for many to one and one to one
+            relationships, :func:`sqlalchemy.orm.joinedload` by default
+        :returns: list of loader options
+        """
+
+        options = []
+        if self.columns is not None:
+            options.append(load_only(*self.columns))
+        options.extend(self._relationship_options(
+            None, collection_loader, scalar_loader))
+        return options
+
+    def _relationship_options(self, parent, collection_loader,
+                              scalar_loader):
+
+        options = []
+        relationships = inspect(self.model).relationships
+        for name, plan in self.relationships.items():
+            prop = relationships[name]
+            loader = collection_loader if prop.uselist else scalar_loader
+            attr = getattr(self.model, name)
+            if parent is None:
+                option = loader(attr)
+            else:
+                option = getattr(parent, loader.__name__)(attr)
+
+            if plan.columns is not None:
+                option = option.load_only(*plan.columns)
+            options.append(option)
+            options.extend(plan._relationship_options(
+                option, collection_loader, scalar_loader))
+
+        return options
+
+
+def _nested_field(field):
+
+    if isinstance(field, Nested):
+        return field
+    if isinstance(field, Collection) and isinstance(field.opts.field, Nested):
+        return field.opts.field
+    return None
+
+
+def _plan_mapper(plan, mapper_cls, role, deferred_role=None, path=()):
+
+    # The Mappers and roles being planned between the root and this plan.
+    # Self referencing Mappers, such as those of adjacency list trees, nest
+    # themselves and would be planned forever, so a Mapper and role already
+    # on the path is left to load lazily.
+    path = path + ((mapper_cls, role),)
+    model = plan.model
+    mapper = inspect(model)
+    fields = mapper_cls._get_plan(role, deferred_role=deferred_role).fields
+
+    for field in fields:
+        if isinstance(field, Static):
+            continue
+
+        if field.opts.source == '__self__':
+            if isinstance(field, Nested):
+                # The nested mapper reads the same object, so whatever it
+                # loads is loaded as part of this plan.
+                nested_cls = field.get_mapper(as_class=True)
+                if (nested_cls, field.opts.role) not in path:
+                    _plan_mapper(plan, nested_cls, field.opts.role,
+                                 path=path)
+            else:
+                plan.columns = None
+            continue
+
+        name, _, rest = field.opts.source.partition('.')
+        if name in mapper.relationships:
+            prop = mapper.relationships[name]
+            if prop.lazy == 'dynamic':
+                # Dynamic relationships are queried when they're read.
+                continue
+
+            for column in prop.local_columns:
+                plan._add_column(mapper.get_property_by_column(column).key)
+
+            nested = _nested_field(field)
+            if nested is not None and not rest:
+                nested_cls = nested.get_mapper(as_class=True)
+                if (nested_cls, nested.opts.role) in path:
+                    continue
+
+            related = plan.relationships.get(name)
+            if related is None:
+                related = plan.relationships[name] = LoadPlan(
+                    prop.mapper.class_)
+
+            if nested is not None and not rest:
+                _plan_mapper(related, nested_cls, nested.opts.role,
+                             path=path)
+            elif rest and rest in prop.mapper.column_attrs:
+                related._add_column(rest)
+            else:
+                related.columns = None
+        elif name in mapper.column_attrs and not rest:
+            plan._add_column(name)
+        else:
+            plan.columns = None
+
+    return plan
+
+
+def get_load_plan(mapper_cls, role='__default__', deferred_role=None):
+    """Walk the fields ``mapper_cls`` serializes for ``role``, and the
+    fields of nested Mappers for their roles, returning the columns and
+    relationships of the model that are read.
+
+    Fields sourced from a relationship are loaded with the relationship and
+    Nested fields sourced from ``__self__`` load what their Mapper uses.
+    Fields sourced from anything but a column or a relationship, such as a
+    property, require every column of their model to be loaded.
+
+    :param mapper_cls: :class:`kim.mapper.Mapper` whose ``__type__`` is a
+        mapped class
+    :param role: name of a role or a :class:`kim.role.Role` instance
+    :param deferred_role: optional :class:`kim.role.Role` intersected with
+        ``role``
+    :raises: :class:`kim.exception.MapperError`
+    :rtype: :class:`LoadPlan`
+    """
+
+    return _plan_mapper(LoadPlan(mapper_cls.__type__), mapper_cls, role,
+                        deferred_role=deferred_role)
+
+
+def eager_load(query, mapper_cls, role='__default__', deferred_role=None,
+               collection_loader=selectinload, scalar_loader=joinedload):
+    """Return ``query`` with the loader options needed to serialize its
+    results with ``mapper_cls`` and ``role`` without lazy loading.
+
+    :param query: :class:`sqlalchemy.orm.query.Query` of the ``__type__``
+        of ``mapper_cls``
+    :param mapper_cls: :class:`kim.mapper.Mapper` class
+    :param role: name of a role or a :class:`kim.role.Role` instance
+    :param deferred_role: optional :class:`kim.role.Role` intersected with
+        ``role``
+    :param collection_loader: loader used for one to many and many to many
+        relationships
+    :param scalar_loader: loader used for many to one and one to one
+        relationships
+    :raises: :class:`kim.exception.MapperError`
+    :returns: :class:`sqlalchemy.orm.query.Query`
+    """
+
+    plan = get_load_plan(mapper_cls, role=role, deferred_role=deferred_role)
+    return query.options(*plan.options(
+        collection_loader=collection_loader, scalar_loader=scalar_loader))
@@ -8,7 +8,222 @@
 
 _creation_order = 1
 
-from collections import defaultdict
+import threading
+import weakref
+
+from collections import defaultdict, OrderedDict
+from operator import attrgetter
+
+
+class ConfigVersion(object):
+    """A counter incremented every time the configuration of a Mapper, Field
+    or Role is changed at runtime.
+
+    Each Mapper class, Field and Role tracked by a Mapper has its own version.
+    Versions may have dependents, bumped along with them, so changing a Field
+    only bumps the versions of the Mappers using it.  Compiled mappers record
+    the version of their Mapper class they were generated against and are
+    discarded (deoptimized) as soon as it changes.
+
+    .. version-added: 1.2.0
+    """
+
+    __slots__ = ('value', 'dependents', '__weakref__')
+
+    def __init__(self):
+        self.value = 0
+        self.dependents = weakref.WeakSet()
+
+    def __reduce__(self):
+        # Versions only mean something to the objects they were created for,
+        # copies start with a version of their own.
+        return _new_config_version, ()
+
+    def add_dependent(self, version):
+        """Bump ``version`` whenever this version is bumped.
+
+        :param version: :class:`ConfigVersion` instance
+        """
+
+        if version is not self:
+            self.dependents.add(version)
+
+    def bump(self):
+        """Record that the configuration of a Mapper, Field or Role changed,
+        bumping every version depending on this one.
+        """
+
+        pending, seen = [self], set()
+        while pending:
+            version = pending.pop()
+            if id(version) not in seen:
+                seen.add(id(version))
+                version.value += 1
+                pending.extend(version.dependents)
+
+
+#: The global :class:`ConfigVersion` used by kim.  Every other version
+#: depends on it, so bumping it deoptimizes every compiled Mapper.
+config_version = ConfigVersion()
+
+
+def _new_config_version():
+
+    version = ConfigVersion()
+    config_version.add_dependent(version)
+    return version
+
+
+def get_config_version(obj):
+    """Return the :class:`ConfigVersion` of ``obj``, a Field, Role or Mapper
+    class, creating it the first time it's needed.
+
+    .. version-added: 1.2.0
+    """
+
+    version = obj._config_version
+    if version is None:
+        version = obj._config_version = _new_config_version()
+    return version
+
+
+class TrackedDict(dict):
+    """A dict that bumps the :class:`ConfigVersion` of its owner whenever it
+    is mutated.  Used to hold the configuration of Mappers, such as their
+    roles.  Changing a Role or Field stored in the dict bumps the version as
+    well.
+
+    .. version-added: 1.2.0
+    """
+
+    def __init__(self, data=(), version=None):
+        """Instantiate a new instance of :class:`TrackedDict`
+
+        :param data: mapping or iterable of key, value pairs
+        :param version: :class:`ConfigVersion` of the owner of the dict,
+            defaults to :data:`config_version`
+        """
+
+        self.config_version = version or config_version
+        super(TrackedDict, self).__init__(data)
+        self._track_values()
+
+    def _track_values(self):
+
+        for value in self.values():
+            self._track(value)
+
+    def _track(self, value):
+
+        if getattr(value, '_config_version', False) is not False:
+            get_config_version(value).add_dependent(self.config_version)
+
+    def __setitem__(self, key, value):
+        self.config_version.bump()
+        self._track(value)
+        super(TrackedDict, self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.config_version.bump()
+        super(TrackedDict, self).__delitem__(key)
+
+    def clear(self):
+        self.config_version.bump()
+        super(TrackedDict, self).clear()
+
+    def pop(self, *args):
+        self.config_version.bump()
+        return super(TrackedDict, self).pop(*args)
+
+    def popitem(self, *args):
+        self.config_version.bump()
+        return super(TrackedDict, self).popitem(*args)
+
+    def setdefault(self, key, default=None):
+        self.config_version.bump()
+        self._track(default)
+        return super(TrackedDict, self).setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        self.config_version.bump()
+        super(TrackedDict, self).update(*args, **kwargs)
+        self._track_values()
+
+
+class TrackedOrderedDict(TrackedDict, OrderedDict):
+    """An OrderedDict that bumps the :class:`ConfigVersion` of its owner
+    whenever it is mutated.  Used to hold the fields of Mappers.
+
+    .. version-added: 1.2.0
+    """
+
+    def move_to_end(self, *args, **kwargs):
+        self.config_version.bump()
+        super(TrackedOrderedDict, self).move_to_end(*args, **kwargs)
+
+
+class LRUCache(OrderedDict):
+    """An OrderedDict holding at most ``maxsize`` items.  Reading an item
+    with :meth:`get` marks it as recently used and storing an item when the
+    cache is full discards the least recently used one.
+
+    Reads and writes hold a lock so the cache may be shared between threads.
+
+    .. version-added: 1.2.0
+    """
+
+    def __init__(self, maxsize=256):
+        """Instantiate a new instance of :class:`LRUCache`
+
+        :param maxsize: maximum number of items to hold
+        """
+
+        self.lock = threading.RLock()
+        super(LRUCache, self).__init__()
+        self.maxsize = maxsize
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = OrderedDict.__getitem__(self, key)
+            except KeyError:
+                return default
+            self._touch(key, value)
+            return value
+
+    def setdefault(self, key, default=None):
+        """Return the item stored at ``key``, storing ``default`` there
+        first if there isn't one.
+        """
+
+        with self.lock:
+            value = self.get(key, self)
+            if value is self:
+                self[key] = value = default
+            return value
+
+    def pop(self, key, *args):
+        with self.lock:
+            return OrderedDict.pop(self, key, *args)
+
+    def items(self):
+        with self.lock:
+            return list(OrderedDict.items(self))
+
+    def _touch(self, key, value):
+        """Mark ``key`` as the most recently used item."""
+
+        if hasattr(self, 'move_to_end'):
+            self.move_to_end(key)
+        else:  # pragma: no cover (python 2)
+            OrderedDict.__delitem__(self, key)
+            OrderedDict.__setitem__(self, key, value)
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            OrderedDict.__setitem__(self, key, value)
+            while len(self) > self.maxsize:
+                self.popitem(last=False)
 
 
 def set_creation_order(instance):
@@ -111,6 +326,126 @@ def set_attr_or_key(obj, name, value):
     _set_attr_or_key(obj, components[-1], value)
 
 
+def _component_getter(name, _isinstance=isinstance, _dict=dict,
+                      _attrgetter=attrgetter):
+    """Return a function reading ``name`` from a dict or an object.
+
+    How to read from an object is cached for the last type the function was
+    called with, so a getter used with a single type of object (the normal
+    case for a field) skips the ``isinstance`` check.
+    """
+
+    # (type, is_dict) of the last object seen.  Stored as a single tuple so
+    # concurrent calls with different types can't corrupt the cache.
+    state = [(None, False)]
+    read = _attrgetter(name)
+
+    def get(obj):
+        cls = obj.__class__
+        cached = state[0]
+        if cached[0] is cls:
+            is_dict = cached[1]
+        else:
+            is_dict = _isinstance(obj, _dict)
+            state[0] = (cls, is_dict)
+
+        if is_dict:
+            return obj.get(name)
+        try:
+            return read(obj)
+        except AttributeError:
+            return None
+
+    return get
+
+
+def _self_getter(obj):
+    return obj
+
+
+_self_getter.path = '__self__'
+
+
+def attr_or_key_getter(path):
+    """Return a function equivalent to ``lambda obj: attr_or_key(obj, path)``
+    with ``path`` split ahead of time.  ``__self__`` returns the obj itself.
+
+    Usage::
+
+        >>> get_name = attr_or_key_getter('user.name')
+        >>> get_name({'user': User(name='mike')})
+        'mike'
+
+    :param path: name of the attribute or key, supports dot syntax
+    :returns: function taking an obj, with the original ``path`` stored at
+        ``getter.path``
+
+    .. version-added: 1.2.0
+    """
+
+    if path == '__self__':
+        getter = _self_getter
+    else:
+        components = [_component_getter(c) for c in path.split('.')]
+        if len(components) == 1:
+            getter = components[0]
+        else:
+            def getter(obj):
+                for get in components:
+                    obj = get(obj)
+                return obj
+
+        getter.path = path
+
+    return getter
+
+
+def attr_or_key_setter(path, _isinstance=isinstance, _dict=dict,
+                       _setattr=setattr):
+    """Return a function equivalent to
+    ``lambda obj, value: set_attr_or_key(obj, path, value)`` with ``path``
+    split ahead of time.  ``__self__`` updates the obj using
+    :func:`attr_or_key_update`.
+
+    :param path: name of the attribute or key, supports dot syntax
+    :returns: function taking an obj and a value, with the original ``path``
+        stored at ``setter.path``
+
+    .. version-added: 1.2.0
+    """
+
+    if path == '__self__':
+        def setter(obj, value):
+            attr_or_key_update(obj, value)
+
+        setter.path = path
+        return setter
+
+    parent_path, _, name = path.rpartition('.')
+    get_parent = attr_or_key_getter(parent_path) if parent_path else None
+    state = [(None, False)]
+
+    def setter(obj, value):
+        if get_parent is not None:
+            obj = get_parent(obj)
+
+        cls = obj.__class__
+        cached = state[0]
+        if cached[0] is cls:
+            is_dict = cached[1]
+        else:
+            is_dict = _isinstance(obj, _dict)
+            state[0] = (cls, is_dict)
+
+        if is_dict:
+            obj[name] = value
+        else:
+            _setattr(obj, name, value)
+
+    setter.path = path
+    return setter
+
+
 def attr_or_key_update(obj, value):
     """If obj is a dict, add keys from value to it with update(),
     otherwise use setattr to set every attribute from value on obj
@@ -107,7 +107,9 @@ setup(
         'test': PyTest
     },
     dependency_links=[],
-    entry_points={},
+    entry_points={
+        'console_scripts': ['kim = kim.cli:main'],
+    },
     classifiers=(
         'Development Status :: 5 - Production/Stable',
         'Intended Audience :: Developers',
@@ -1,7 +1,15 @@
+import sys
+
 import pytest
 
 from kim.mapper import _MapperConfig, Mapper
 
+collect_ignore = []
+if sys.version_info < (3, 5):
+    collect_ignore.append('test_aio.py')
+if sys.version_info < (3, 6):
+    collect_ignore.append('test_aiostream.py')
+
 
 @pytest.fixture(scope='function', autouse=True)
 def empty_registry():
@@ -0,0 +1,192 @@
+import asyncio
+
+import pytest
+
+from kim import Mapper, MappingInvalid, field, pipe
+
+from .helpers import TestType
+
+
+def run(coro):
+
+    if hasattr(asyncio, 'run'):
+        return asyncio.run(coro)
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+@pipe(style='value')
+async def not_taken(session, value):
+
+    await asyncio.sleep(0)
+    if value == 'taken':
+        raise session.field.invalid('invalid_name')
+    return value.upper()
+
+
+@pipe()
+async def check_email(session):
+
+    await asyncio.sleep(0)
+    if '@' not in session.data:
+        raise session.field.invalid('invalid_email')
+
+
+async def get_company(session):
+
+    await asyncio.sleep(0)
+    if session.data['id'] == 1:
+        return TestType(id=1, name='existing')
+
+
+@pytest.fixture
+def mappers():
+
+    class CompanyMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        name = field.String()
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        name = field.String(
+            extra_marshal_pipes={'validation': [not_taken]},
+            error_msgs={'invalid_name': 'Name taken'})
+        email = field.String(
+            extra_marshal_pipes={'validation': [check_email]},
+            error_msgs={'invalid_email': 'Invalid email'})
+        company = field.Nested(
+            'CompanyMapper', getter=get_company, allow_create=True)
+        previous = field.Collection(
+            field.Nested('CompanyMapper', getter=get_company,
+                         allow_create=True), required=False)
+
+        async def validate(self, output):
+            await asyncio.sleep(0)
+            if getattr(output, 'name', None) == 'ADMIN':
+                raise MappingInvalid({'name': 'Reserved'})
+
+    return UserMapper, CompanyMapper
+
+
+def test_marshal_async(mappers):
+
+    UserMapper, CompanyMapper = mappers
+
+    data = {'name': 'mike', 'email': 'mike@example.com',
+            'company': {'id': 1, 'name': 'ignored'},
+            'previous': [{'id': 1}, {'id': 2, 'name': 'new'}]}
+
+    user = run(UserMapper(data=data).marshal_async(concurrency=2))
+
+    assert user.name == 'MIKE'
+    assert user.email == 'mike@example.com'
+    assert user.company.name == 'existing'
+    assert user.previous[0].name == 'existing'
+    assert user.previous[1].name == 'new'
+
+
+def test_marshal_async_errors(mappers):
+
+    UserMapper, CompanyMapper = mappers
+
+    data = {'name': 'taken', 'email': 'mike',
+            'company': {'id': 'x', 'name': 'a'}}
+
+    with pytest.raises(MappingInvalid) as e:
+        run(UserMapper(data=data).marshal_async())
+
+    assert e.value.errors == {
+        'name': 'Name taken',
+        'email': 'Invalid email',
+        'company': {'id': 'Invalid type'},
+    }
+    assert list(e.value.errors) == ['name', 'email', 'company']
+
+    data = {'name': 'admin', 'email': 'mike@example.com',
+            'company': {'id': 1}}
+    with pytest.raises(MappingInvalid) as e:
+        run(UserMapper(data=data).marshal_async())
+    assert e.value.errors == {'name': 'Reserved'}
+
+
+def test_marshal_async_matches_sync_errors():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        name = field.String()
+        tags = field.Collection(field.String())
+
+    data = {'id': 'x', 'tags': 'a'}
+    with pytest.raises(MappingInvalid) as sync:
+        UserMapper(data=data).marshal()
+    with pytest.raises(MappingInvalid) as async_:
+        run(UserMapper(data=data).marshal_async())
+
+    assert async_.value.errors == sync.value.errors
+
+
+def test_marshal_async_concurrency():
+
+    running = []
+    peak = []
+
+    @pipe(style='value')
+    async def slow(session, value):
+        running.append(value)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(value)
+        return value
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        a = field.String(extra_marshal_pipes={'process': [slow]})
+        b = field.String(extra_marshal_pipes={'process': [slow]})
+        c = field.String(extra_marshal_pipes={'process': [slow]})
+
+    data = {'a': 'a', 'b': 'b', 'c': 'c'}
+
+    run(UserMapper(data=data).marshal_async())
+    assert max(peak) == 3
+
+    del peak[:]
+    run(UserMapper(data=data).marshal_async(concurrency=2))
+    assert max(peak) == 2
+
+
+def test_marshal_async_collection_match_on():
+
+    class MemberMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        name = field.String()
+
+    class TeamMapper(Mapper):
+
+        __type__ = TestType
+
+        members = field.Collection(
+            field.Nested('MemberMapper', allow_updates_in_place=True),
+            match_on='id')
+
+    members = [TestType(id=1, name='mike'), TestType(id=2, name='jack')]
+    team = TestType(members=list(members))
+    data = {'members': [{'id': 2, 'name': 'bob'}]}
+
+    mapper = TeamMapper(obj=team, data=data, track_changes=True)
+    assert run(mapper.marshal_async()) is team
+
+    assert team.members == [members[1]]
+    assert members[1].name == 'bob'
+    assert mapper.changes['members'] == ([], [members[1]], [members[0]])
@@ -0,0 +1,85 @@
+import asyncio
+
+from kim import Mapper, field
+
+from .helpers import TestType
+from .test_aio import run
+
+
+async def _cursor(objs, fetched):
+
+    for obj in objs:
+        fetched.append(obj)
+        await asyncio.sleep(0)
+        yield obj
+
+
+async def _collect(agen):
+
+    return [item async for item in agen]
+
+
+def test_aiter_serialize():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        name = field.String()
+
+    objs = [TestType(id=i, name='name %s' % i) for i in range(5)]
+    expected = UserMapper.many().serialize(objs)
+
+    result = run(_collect(UserMapper.many().aiter_serialize(
+        _cursor(objs, []))))
+    assert result == expected
+
+    assert run(_collect(UserMapper.many().aiter_serialize(objs))) == expected
+    assert run(_collect(UserMapper.many(partial=True).aiter_serialize(
+        _cursor(objs, [])))) == expected
+
+
+def test_aiter_serialize_json():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        name = field.String()
+
+    objs = [TestType(id=i, name='name %s' % i) for i in range(50)]
+
+    chunks = run(_collect(UserMapper.many().aiter_serialize(
+        _cursor(objs, []), as_json=True, buffer_size=100)))
+    assert len(chunks) > 1
+    assert all(isinstance(chunk, bytes) for chunk in chunks)
+    assert b''.join(chunks) == b''.join(UserMapper.many().serialize_json(objs))
+
+    chunks = run(_collect(UserMapper.many().aiter_serialize(
+        _cursor([], []), as_json=True)))
+    assert chunks == [b'[]']
+
+
+def test_aiter_serialize_json_backpressure():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+
+    fetched = []
+    objs = [TestType(id=i) for i in range(100)]
+
+    async def first_chunk():
+        chunks = UserMapper.many().aiter_serialize(
+            _cursor(objs, fetched), as_json=True, buffer_size=20)
+        chunk = await chunks.__anext__()
+        await chunks.aclose()
+        return chunk
+
+    chunk = run(first_chunk())
+    assert chunk.startswith(b'[{"id": 0}')
+    assert len(fetched) < 5
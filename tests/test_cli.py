@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+
+import pytest
+
+from kim import Mapper, field
+from kim.cli import main, load_mapper
+from kim.exception import MapperError
+
+from .helpers import TestType
+
+
+class UserMapper(Mapper):
+
+    __type__ = TestType
+
+    id = field.Integer()
+    name = field.String()
+
+
+class UserOutMapper(Mapper):
+
+    __type__ = TestType
+
+    name = field.String()
+    object_type = field.Static('user')
+
+
+def _write(tmpdir, name, text):
+
+    path = tmpdir.join(name)
+    path.write_binary(text.encode('utf-8'))
+    return str(path)
+
+
+def _read(path):
+
+    with io.open(path, encoding='utf-8') as fp:
+        return [json.loads(line) for line in fp]
+
+
+def test_load_mapper():
+
+    assert load_mapper('tests.test_cli.UserMapper') is UserMapper
+    assert load_mapper('tests.test_cli:UserMapper') is UserMapper
+
+    for path in ('UserMapper', 'tests.missing.UserMapper',
+                 'tests.test_cli.Missing', 'tests.test_cli.io'):
+        with pytest.raises(MapperError):
+            load_mapper(path)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_marshal(tmpdir, workers):
+
+    input_ = _write(tmpdir, 'in.json', json.dumps(
+        [{'id': i, 'name': u'user ☃ %s' % i} for i in range(7)]))
+    output = str(tmpdir.join('out.ndjson'))
+
+    status = main(['marshal', 'tests.test_cli.UserMapper', '-i', input_,
+                   '-o', output, '--chunk-size', '2',
+                   '--workers', str(workers)])
+
+    assert status == 0
+    assert _read(output) == [
+        {'id': i, 'name': u'user ☃ %s' % i} for i in range(7)]
+
+
+def test_marshal_serialize_with_errors(tmpdir):
+
+    input_ = _write(tmpdir, 'in.ndjson', u'\n'.join([
+        '{"id": 1, "name": "a"}',
+        '{"id": "x", "name": "b"}',
+        '{"id": 3, "name": "c"}',
+        '{"id": 4}',
+    ]))
+    output = str(tmpdir.join('out.ndjson'))
+    errors = str(tmpdir.join('errors.ndjson'))
+
+    status = main(['marshal', 'tests.test_cli.UserMapper', '-i', input_,
+                   '-o', output, '--errors', errors, '--chunk-size', '3',
+                   '--serialize', 'tests.test_cli.UserOutMapper'])
+
+    assert status == 1
+    assert _read(output) == [
+        {'name': 'a', 'object_type': 'user'},
+        {'name': 'c', 'object_type': 'user'}]
+    assert _read(errors) == [
+        {'index': 1, 'errors': {'id': 'Invalid type'}},
+        {'index': 3, 'errors': {'name': 'This is a required field'}}]
+
+
+def test_serialize(tmpdir):
+
+    input_ = _write(tmpdir, 'in.ndjson',
+                    u'{"id": 1, "name": "a"}\n{"id": 2, "name": "b"}\n')
+    output = str(tmpdir.join('out.ndjson'))
+
+    assert main(['serialize', 'tests.test_cli.UserOutMapper', '-i', input_,
+                 '-o', output]) == 0
+    assert _read(output) == [
+        {'name': 'a', 'object_type': 'user'},
+        {'name': 'b', 'object_type': 'user'}]
+
+
+def test_invalid_json(tmpdir, capsys):
+
+    input_ = _write(tmpdir, 'in.json', u'[{"id": 1, "name": "a"}, {"id"')
+    output = str(tmpdir.join('out.ndjson'))
+
+    assert main(['marshal', 'tests.test_cli.UserMapper', '-i', input_,
+                 '-o', output]) == 2
+    assert 'invalid JSON' in capsys.readouterr().err
+
+
+def test_invalid_json_position(tmpdir, capsys):
+
+    # The error is past the first read of the input
+    document = u'[' + u'{"id": 1, "name": "a"}, ' * 5000 + u'x]'
+    input_ = _write(tmpdir, 'in.json', document)
+    output = str(tmpdir.join('out.ndjson'))
+
+    assert main(['marshal', 'tests.test_cli.UserMapper', '-i', input_,
+                 '-o', output]) == 2
+    assert '(char %d)' % document.index(u'x') in capsys.readouterr().err
+
+
+def test_numbers_split_across_reads(tmpdir):
+
+    # The first read of the input ends inside a number in a nested list
+    head = u'[' + u'{"id": 1, "name": "a"}, ' * 2000
+    value = u'{"id": 2, "name": "a", "scores": [1.2345678e-5, 1]}'
+    head += u' ' * (64 * 1024 - len(head) - value.index(u'.2345') - 1)
+    input_ = _write(tmpdir, 'in.json', head + value + u']')
+    output = str(tmpdir.join('out.ndjson'))
+
+    assert main(['marshal', 'tests.test_cli.UserMapper', '-i', input_,
+                 '-o', output]) == 0
+    assert len(_read(output)) == 2001
+
+
+def test_missing_input(tmpdir, capsys):
+
+    input_ = str(tmpdir.join('missing.json'))
+    with pytest.raises(SystemExit) as excinfo:
+        main(['marshal', 'tests.test_cli.UserMapper', '-i', input_])
+    assert excinfo.value.code == 2
+    assert "can't open '%s'" % input_ in capsys.readouterr().err
+
+    input_ = _write(tmpdir, 'in.json', u'[]')
+    output = str(tmpdir.join('missing', 'out.ndjson'))
+    with pytest.raises(SystemExit):
+        main(['marshal', 'tests.test_cli.UserMapper', '-i', input_,
+              '-o', output])
+    assert "can't open '%s'" % output in capsys.readouterr().err
+
+
+def test_invalid_mapper(capsys):
+
+    with pytest.raises(SystemExit):
+        main(['marshal', 'tests.test_cli.Missing'])
+    assert 'is not a Mapper' in capsys.readouterr().err
+
+
+def test_invalid_role(capsys):
+
+    with pytest.raises(SystemExit):
+        main(['marshal', 'tests.test_cli.UserMapper', '-r', 'missing'])
+    assert "Role 'missing' not found on UserMapper" in \
+        capsys.readouterr().err
+
+    with pytest.raises(SystemExit):
+        main(['marshal', 'tests.test_cli.UserMapper',
+              '--serialize', 'tests.test_cli.UserOutMapper',
+              '--serialize-role', 'missing'])
+    assert "Role 'missing' not found on UserOutMapper" in \
+        capsys.readouterr().err
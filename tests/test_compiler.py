@@ -0,0 +1,653 @@
+import decimal
+import sys
+from datetime import datetime, date
+
+import pytest
+
+from kim import Mapper, PolymorphicMapper, field, pipe, whitelist
+from kim.compiler import invalidate
+from kim.exception import FieldError, MapperError, MappingInvalid
+from kim.mapper import get_compilation_stats
+
+from .helpers import TestType
+
+
+def test_compile_serializer_matches_field_types():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        name = field.String(source='profile.name')
+        created_at = field.DateTime()
+        signup_date = field.Date()
+        score = field.Decimal(precision=2)
+        object_type = field.Static('user')
+        tags = field.Collection(field.String())
+
+    obj = TestType(
+        id=2, profile={'name': 'mike'},
+        created_at=datetime(2017, 1, 1, 12, 30),
+        signup_date=date(2017, 1, 1),
+        score=decimal.Decimal('1.236'),
+        tags=['a', 'b'])
+
+    serialize = UserMapper.compile_serializer()
+
+    assert serialize(obj) == {
+        'id': 2,
+        'name': 'mike',
+        'created_at': '2017-01-01T12:30:00',
+        'signup_date': '2017-01-01',
+        'score': '1.24',
+        'object_type': 'user',
+        'tags': ['a', 'b'],
+    }
+    assert 'def serialize_UserMapper___default__' in serialize.__kim_source__
+
+
+def test_compile_serializer_handles_none_values():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        created_at = field.DateTime()
+        score = field.Decimal()
+        tags = field.Collection(field.String())
+        company = field.Nested('CompanyMapper', null_default={})
+
+    class CompanyMapper(Mapper):
+
+        __type__ = TestType
+
+        name = field.String()
+
+    obj = TestType(id=None, created_at=None, score=None, tags=None,
+                   company=None)
+
+    assert UserMapper.compile_serializer()(obj) == {
+        'id': None,
+        'created_at': None,
+        'score': None,
+        'tags': None,
+        'company': {},
+    }
+
+
+def test_compile_serializer_from_dict():
+
+    class UserMapper(Mapper):
+
+        __type__ = dict
+
+        id = field.Integer()
+        name = field.String()
+
+    serialize = UserMapper.compile_serializer()
+    assert serialize({'id': 1, 'name': 'mike'}) == {'id': 1, 'name': 'mike'}
+
+
+def test_compile_serializer_nested_uses_role():
+
+    class CompanyMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        name = field.String()
+
+        __roles__ = {
+            'id_only': ['id'],
+        }
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        name = field.String()
+        company = field.Nested('CompanyMapper', role='id_only')
+        companies = field.Collection(
+            field.Nested('CompanyMapper', role='id_only'))
+        me = field.Nested('UserMapper', source='__self__', role='name_only')
+
+        __roles__ = {
+            'name_only': ['name'],
+        }
+
+    company = TestType(id=1, name='Old St Labs')
+    obj = TestType(name='mike', company=company, companies=[company])
+
+    assert UserMapper(obj=obj).serialize() == {
+        'name': 'mike',
+        'company': {'id': 1},
+        'companies': [{'id': 1}],
+        'me': {'name': 'mike'},
+    }
+
+
+def test_compile_serializer_self_referencing_mapper():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        name = field.String()
+        friends = field.Collection(field.Nested('UserMapper'))
+
+    bob = TestType(name='bob', friends=[])
+    mike = TestType(name='mike', friends=[bob])
+
+    assert UserMapper(obj=mike).serialize() == {
+        'name': 'mike',
+        'friends': [{'name': 'bob', 'friends': []}],
+    }
+
+
+def test_compile_serializer_falls_back_for_extra_pipes():
+
+    @pipe()
+    def to_upper(session):
+        session.data = session.data.upper()
+        return session.data
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        name = field.String(extra_serialize_pipes={'process': [to_upper]})
+        email = field.String()
+
+    obj = TestType(id=1, name='mike', email='mike@mike.com')
+
+    serialize = UserMapper.compile_serializer()
+    assert '.serialize(session)' in serialize.__kim_source__
+    assert serialize(obj) == {'id': 1, 'name': 'MIKE', 'email': 'mike@mike.com'}
+    assert list(serialize(obj).keys()) == ['id', 'name', 'email']
+
+
+def test_compile_serializer_polymorphic_nested():
+
+    class ActivityMapper(PolymorphicMapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        object_type = field.String()
+
+        __mapper_args__ = {
+            'polymorphic_on': object_type,
+        }
+
+    class TaskMapper(ActivityMapper):
+
+        __type__ = TestType
+
+        status = field.String()
+
+        __mapper_args__ = {
+            'polymorphic_name': 'task'
+        }
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        activities = field.Collection(field.Nested('ActivityMapper'))
+
+    obj = TestType(activities=[
+        TestType(id=1, object_type='task', status='done')])
+
+    assert UserMapper(obj=obj).serialize() == {
+        'activities': [{'id': 1, 'object_type': 'task', 'status': 'done'}]
+    }
+
+
+def test_compile_serializer_is_cached_per_role():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        name = field.String()
+
+        __roles__ = {
+            'id_only': ['id'],
+        }
+
+    assert UserMapper.compile_serializer() is UserMapper.compile_serializer()
+    assert UserMapper.compile_serializer('id_only') is not \
+        UserMapper.compile_serializer()
+
+    deferred = UserMapper.compile_serializer(deferred_role=whitelist('id'))
+    assert deferred is \
+        UserMapper.compile_serializer(deferred_role=whitelist('id'))
+    assert deferred(TestType(id=1, name='mike')) == {'id': 1}
+
+
+def test_compile_serializer_shared_by_equivalent_deferred_roles():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+        __cache_size__ = 2
+
+        id = field.Integer()
+        name = field.String()
+        email = field.String()
+
+    serializer = UserMapper.compile_serializer(
+        deferred_role=whitelist('id', 'unknown'))
+    for i in range(5000):
+        assert UserMapper.compile_serializer(
+            deferred_role=whitelist('id', 'field_%s' % i)) is serializer
+        assert b''.join(UserMapper(obj=TestType(id=1)).serialize_json(
+            deferred_role=whitelist('id', 'field_%s' % i))) == b'{"id": 1}'
+
+    assert len(UserMapper._serializers) == 1
+    assert len(UserMapper._json_plans) == 1
+
+    UserMapper.compile_serializer(deferred_role=whitelist('name'))
+    UserMapper.compile_serializer(deferred_role=whitelist('email'))
+    assert list(UserMapper._serializers) == [
+        frozenset(['name']), frozenset(['email'])]
+
+
+def test_compile_serializer_invalid_role():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+
+    with pytest.raises(MapperError):
+        UserMapper.compile_serializer('missing')
+
+    with pytest.raises(MapperError):
+        UserMapper.compile_serializer(object())
+
+
+def test_compile_serializer_requires_static_fields():
+
+    class DynamicMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+
+        def _get_fields(self, *args, **kwargs):
+            return []
+
+    with pytest.raises(MapperError):
+        DynamicMapper.compile_serializer()
+
+    assert DynamicMapper(obj=TestType(id=1)).serialize() == {}
+
+
+def test_mapper_iterator_serialize_uses_compiled_serializer():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+
+    objs = [TestType(id=1), TestType(id=2)]
+    assert UserMapper.many().serialize(objs) == [{'id': 1}, {'id': 2}]
+
+    with pytest.raises(MapperError):
+        UserMapper.many().serialize([None])
+
+
+def test_compile_marshaler_validates_fields():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer(read_only=True)
+        name = field.String(choices=['mike', 'jack'])
+        age = field.Integer(min=18, max=99)
+        score = field.Decimal(precision=2)
+        active = field.Boolean()
+        created_at = field.DateTime(required=False)
+        signup_date = field.Date(required=False)
+        object_type = field.Static('user')
+
+    marshal = UserMapper.compile_marshaler()
+
+    output, errors = TestType(), {}
+    marshal({'id': 3, 'name': 'mike', 'age': '20', 'score': '1.234',
+             'active': 'true', 'signup_date': '2017-01-01T00:00:00'},
+            output, errors)
+
+    assert errors == {}
+    assert output == TestType(
+        name='mike', age=20, score=decimal.Decimal('1.23'), active=True,
+        created_at=None, signup_date=date(2017, 1, 1))
+
+    output, errors = TestType(), {}
+    marshal({'name': 'bob', 'age': 5, 'score': 'x', 'active': 'maybe',
+             'created_at': 'today'}, output, errors)
+
+    assert errors == {
+        'name': 'invalid choice',
+        'age': 'value out of allowed range',
+        'score': 'Invalid type',
+        'active': 'invalid choice',
+        'created_at': 'Invalid type',
+    }
+
+
+def test_compile_marshaler_errors_match_pipelines():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        name = field.String()
+        age = field.Integer(required=False, allow_none=False)
+        score = field.Integer(required=False, default=5)
+        email = field.String(error_msgs={'required': '{name} is missing'})
+
+    with pytest.raises(MappingInvalid) as excinfo:
+        UserMapper(data={'age': None}).marshal()
+
+    assert excinfo.value.errors == {
+        'name': 'This is a required field',
+        'age': 'This field cannot be null',
+        'email': 'email is missing',
+    }
+
+    result = UserMapper(
+        data={'name': 'mike', 'age': 1, 'email': 'a@b.com'}).marshal()
+    assert result.score == 5
+
+
+def test_compile_marshaler_partial():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        name = field.String()
+        email = field.String()
+
+    obj = TestType(name='mike', email='mike@mike.com')
+    result = UserMapper(data={'name': 'bob'}, obj=obj, partial=True).marshal()
+
+    assert result.name == 'bob'
+    assert result.email == 'mike@mike.com'
+    assert UserMapper.compile_marshaler(partial=True) is not \
+        UserMapper.compile_marshaler()
+
+
+def test_compile_marshaler_falls_back_for_nested_and_extra_pipes():
+
+    @pipe()
+    def check_age(session):
+        if session.data < 18:
+            raise session.field.invalid('not_old_enough')
+
+    class CompanyMapper(Mapper):
+
+        __type__ = TestType
+
+        name = field.String()
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        age = field.Integer(
+            extra_marshal_pipes={'validation': [check_age]},
+            error_msgs={'not_old_enough': 'too young'})
+        company = field.Nested('CompanyMapper', allow_create=True)
+
+    marshal = UserMapper.compile_marshaler()
+    assert marshal.__kim_source__.count('.marshal(') == 2
+
+    with pytest.raises(MappingInvalid) as excinfo:
+        UserMapper(data={'age': 10, 'company': {}}).marshal()
+
+    assert excinfo.value.errors == {
+        'age': 'too young',
+        'company': {'name': 'This is a required field'},
+    }
+
+
+def test_compile_marshaler_output_does_not_support_set():
+
+    class UserMapper(Mapper):
+
+        __type__ = object
+
+        name = field.String()
+
+    with pytest.raises(FieldError):
+        UserMapper(data={'name': 'mike'}).marshal()
+
+
+def test_mapper_compiles_after_threshold():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+        __compile_threshold__ = 2
+
+        id = field.Integer()
+
+    obj = TestType(id=1)
+    for i in range(2):
+        assert UserMapper(obj=obj).serialize() == {'id': 1}
+        assert not UserMapper.compilation_stats()[
+            'serialize']['__default__']['compiled']
+
+    assert UserMapper(obj=obj).serialize() == {'id': 1}
+    stats = UserMapper.compilation_stats()['serialize']['__default__']
+    assert stats['compiled']
+    assert stats['calls'] == 3
+    assert stats['compilations'] == 1
+
+    assert get_compilation_stats()['UserMapper']['serialize'] == {
+        '__default__': stats}
+
+
+@pytest.mark.skipif(not hasattr(sys, 'setswitchinterval'),
+                    reason='requires sys.setswitchinterval')
+def test_mapper_compiles_once_when_shared_between_threads():
+
+    import threading
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+        __compile_threshold__ = 1000
+
+        id = field.Integer()
+
+    serialize = UserMapper.serializer()
+    marshal = UserMapper.marshaler()
+    start = threading.Event()
+
+    def work():
+        start.wait()
+        for i in range(2000):
+            serialize(TestType(id=i))
+            marshal({'id': i})
+
+    # Switch threads as often as possible to expose races
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=work) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert len(UserMapper._serializers) == 1
+    assert len(UserMapper._marshalers) == 1
+    stats = UserMapper.compilation_stats()
+    assert stats['serialize']['__default__']['calls'] == 16000
+    assert stats['serialize']['__default__']['compilations'] == 1
+    assert stats['marshal'][('__default__', False)]['calls'] == 16000
+    assert stats['marshal'][('__default__', False)]['compilations'] == 1
+
+
+def test_mapper_never_compiles_without_threshold():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+        __compile_threshold__ = None
+
+        name = field.String()
+
+    for i in range(20):
+        UserMapper(data={'name': 'mike'}).marshal()
+
+    stats = UserMapper.compilation_stats()['marshal'][('__default__', False)]
+    assert not stats['compiled']
+    assert stats['calls'] == 20
+
+
+def _promoted_mapper():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+        __compile_threshold__ = 0
+
+        name = field.String(choices=['mike'])
+
+        __roles__ = {
+            'public': whitelist('name'),
+        }
+
+    UserMapper(data={'name': 'mike'}).marshal()
+    UserMapper(data={'name': 'mike'}).marshal(role='public')
+    return UserMapper
+
+
+def _is_compiled(mapper, role='__default__'):
+    return mapper.compilation_stats()['marshal'][(role, False)]['compiled']
+
+
+def test_mapper_deoptimized_when_field_opts_change():
+
+    UserMapper = _promoted_mapper()
+    assert _is_compiled(UserMapper)
+
+    UserMapper.fields['name'].opts.choices = ['bob']
+    assert not _is_compiled(UserMapper)
+
+    assert UserMapper(data={'name': 'bob'}).marshal().name == 'bob'
+    stats = UserMapper.compilation_stats()['marshal'][('__default__', False)]
+    assert stats['compiled']
+    assert stats['deoptimizations'] == 1
+    assert stats['compilations'] == 2
+
+
+def test_mapper_deoptimized_when_roles_change():
+
+    UserMapper = _promoted_mapper()
+    assert _is_compiled(UserMapper, 'public')
+
+    UserMapper.roles['public'].discard('name')
+    assert not _is_compiled(UserMapper, 'public')
+    assert UserMapper(data={'name': 'x'}).marshal(role='public').__dict__ == {}
+
+    UserMapper.roles['public'] = whitelist('name')
+    assert not _is_compiled(UserMapper, 'public')
+
+
+def test_mapper_not_deoptimized_by_other_mappers():
+
+    UserMapper = _promoted_mapper()
+
+    class OtherMapper(Mapper):
+
+        __type__ = TestType
+
+        name = field.String(choices=['mike'])
+
+        __roles__ = {
+            'public': whitelist('name'),
+        }
+
+    field.String(required=False)
+    OtherMapper.fields['name'].opts.choices = ['bob']
+    OtherMapper.roles['public'].discard('name')
+    whitelist('name').add('id')
+
+    assert _is_compiled(UserMapper)
+    assert _is_compiled(UserMapper, 'public')
+
+
+def test_mapper_deoptimized_when_base_or_nested_mapper_changes():
+
+    class CompanyMapper(Mapper):
+
+        __type__ = TestType
+
+        name = field.String()
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        name = field.String()
+        company = field.Nested('CompanyMapper')
+
+    class AdminMapper(UserMapper):
+
+        __type__ = TestType
+
+    obj = TestType(name='mike', company=TestType(name='Old St Labs'))
+    UserMapper.compile_serializer()(obj)
+    AdminMapper.compile_serializer()(obj)
+    compiled = UserMapper.compilation_stats()['serialize']['__default__']
+    assert compiled['compiled']
+
+    CompanyMapper.fields['name'].opts.source = 'title'
+    obj.company.title = 'Penny Lane'
+    assert not UserMapper.compilation_stats()[
+        'serialize']['__default__']['compiled']
+    assert UserMapper.compile_serializer()(obj) == {
+        'name': 'mike', 'company': {'name': 'Penny Lane'}}
+
+    AdminMapper.compile_serializer()
+    UserMapper.__compile_threshold__ = 5
+    assert not AdminMapper.compilation_stats()[
+        'serialize']['__default__']['compiled']
+
+    AdminMapper.compile_serializer()
+    UserMapper.fields['name'].opts.source = 'username'
+    obj.username = 'bob'
+    assert not AdminMapper.compilation_stats()[
+        'serialize']['__default__']['compiled']
+    assert AdminMapper.compile_serializer()(obj) == {
+        'name': 'bob', 'company': {'name': 'Penny Lane'}}
+
+
+def test_invalidate_deoptimizes_mappers():
+
+    UserMapper = _promoted_mapper()
+
+    UserMapper.fields['name'].opts.error_msgs['invalid_choice'] = 'no'
+    invalidate()
+    assert not _is_compiled(UserMapper)
+
+    with pytest.raises(MappingInvalid) as excinfo:
+        UserMapper(data={'name': 'bob'}).marshal()
+
+    assert excinfo.value.errors == {'name': 'no'}
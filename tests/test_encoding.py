@@ -0,0 +1,346 @@
+import io
+import json
+import decimal
+from datetime import datetime
+
+import pytest
+
+from kim import Mapper, MappingInvalid, field, whitelist
+from kim.encoding import iter_chunks, iter_json_values
+
+from .fixtures import SchedulableMapper
+from .helpers import TestType
+
+
+def _json(chunks):
+    return b''.join(chunks).decode('utf-8')
+
+
+@pytest.fixture
+def mappers():
+
+    class CompanyMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        name = field.String()
+
+        __roles__ = {
+            'public': whitelist('name'),
+        }
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        name = field.String(source='profile.name')
+        created_at = field.DateTime()
+        score = field.Decimal(precision=2)
+        object_type = field.Static('user')
+        tags = field.Collection(field.String())
+        company = field.Nested('CompanyMapper', allow_create=True)
+        previous = field.Collection(
+            field.Nested('CompanyMapper', role='public'))
+        manager = field.Nested('UserMapper', role='public')
+
+        __roles__ = {
+            'public': whitelist('id', 'name'),
+        }
+
+    return UserMapper, CompanyMapper
+
+
+def _user(**kwargs):
+    company = TestType(id=1, name=u'Acme \u2603 "Co"')
+    attrs = dict(
+        id=2, profile={'name': 'mike'},
+        created_at=datetime(2017, 1, 1, 12, 30),
+        score=decimal.Decimal('1.236'), tags=['a', 'b'],
+        company=company, previous=[company, None],
+        manager=TestType(id=9, profile={'name': 'boss'}))
+    attrs.update(kwargs)
+    return TestType(**attrs)
+
+
+def test_serialize_json_matches_json_dumps(mappers):
+
+    UserMapper, CompanyMapper = mappers
+
+    user = _user()
+    expected = json.dumps(UserMapper(obj=user).serialize())
+
+    assert _json(UserMapper(obj=user).serialize_json()) == expected
+    assert _json(UserMapper(obj=user).serialize_json(role='public')) == \
+        json.dumps(UserMapper(obj=user).serialize(role='public'))
+
+    user = _user(manager=None, previous=[], company=None)
+    assert _json(UserMapper(obj=user).serialize_json()) == \
+        json.dumps(UserMapper(obj=user).serialize())
+
+
+def test_serialize_json_to_stream(mappers):
+
+    UserMapper, CompanyMapper = mappers
+
+    obj = TestType(id=1, name='Acme')
+    text, binary = io.StringIO(), io.BytesIO()
+
+    assert CompanyMapper(obj=obj).serialize_json(stream=text) is None
+    CompanyMapper(obj=obj).serialize_json(stream=binary)
+
+    assert text.getvalue() == u'{"id": 1, "name": "Acme"}'
+    assert binary.getvalue() == b'{"id": 1, "name": "Acme"}'
+
+
+def test_serialize_json_many(mappers):
+
+    UserMapper, CompanyMapper = mappers
+
+    objs = (TestType(id=i, name='Acme') for i in range(3))
+    stream = io.StringIO()
+    CompanyMapper.many().serialize_json(objs, stream=stream)
+    assert json.loads(stream.getvalue()) == [
+        {'id': i, 'name': 'Acme'} for i in range(3)]
+
+    assert _json(CompanyMapper.many().serialize_json([])) == '[]'
+
+
+def test_serialize_json_polymorphic():
+
+    obj1 = TestType(id=2, name='bob', location='London', object_type='event')
+    obj2 = TestType(id=3, name='fred', status='Done', object_type='task')
+
+    result = _json(SchedulableMapper.many().serialize_json(
+        [obj1, obj2], role='public'))
+    assert json.loads(result) == SchedulableMapper.many().serialize(
+        [obj1, obj2], role='public')
+
+
+def test_serialize_json_custom_serialize():
+
+    class CompanyMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+
+        def serialize(self, role='__default__', **kwargs):
+            return {'custom': True}
+
+    obj = TestType(id=1)
+    assert _json(CompanyMapper(obj=obj).serialize_json()) == '{"custom": true}'
+
+
+def test_serialize_json_compiles_after_threshold():
+
+    class CompanyMapper(Mapper):
+
+        __type__ = TestType
+        __compile_threshold__ = 2
+
+        name = field.String()
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+        __compile_threshold__ = 2
+
+        id = field.Integer()
+        company = field.Nested('CompanyMapper')
+
+    obj = TestType(id=1, company=TestType(name='kim'))
+    for i in range(2):
+        assert _json(UserMapper(obj=obj).serialize_json()) == \
+            '{"id": 1, "company": {"name": "kim"}}'
+        assert not UserMapper.compilation_stats()[
+            'serialize'][('json', '__default__')]['compiled']
+
+    assert _json(UserMapper(obj=obj).serialize_json()) == \
+        '{"id": 1, "company": {"name": "kim"}}'
+    # The fields written from a dict are compiled separately from the
+    # serializer of the role
+    stats = UserMapper.compilation_stats()['serialize']
+    assert list(stats) == [('json', '__default__')]
+    assert stats[('json', '__default__')]['compiled']
+    assert stats[('json', '__default__')]['calls'] == 3
+
+    # Nested mappers without nested fields share the serializer of the role
+    stats = CompanyMapper.compilation_stats()['serialize']['__default__']
+    assert stats['compiled']
+    assert stats['compilations'] == 1
+
+
+def test_iter_chunks():
+
+    pieces = ['{', '"a"', ': ', '1', '}']
+    assert list(iter_chunks(pieces, buffer_size=3)) == [b'{"a"', b': 1', b'}']
+    assert list(iter_chunks(pieces, binary=False)) == ['{"a": 1}']
+
+
+@pytest.mark.parametrize('document', [
+    u'[{"a": 1}, [2, 3], "four \u2603", 5.5, null, 12345]',
+    u' \n[ {"a": 1} ,[2,3],"four \u2603",5.5 ,null,12345 ]\n',
+    u'{"a": 1}\n[2, 3]\n"four \u2603"\n5.5\nnull\n12345\n',
+])
+@pytest.mark.parametrize('buffer_size', [1, 3, 4096])
+def test_iter_json_values(document, buffer_size):
+
+    expected = [{'a': 1}, [2, 3], u'four \u2603', 5.5, None, 12345]
+
+    values = iter_json_values(io.StringIO(document), buffer_size=buffer_size)
+    assert list(values) == expected
+
+    values = iter_json_values(io.BytesIO(document.encode('utf-8')),
+                              buffer_size=buffer_size)
+    assert list(values) == expected
+
+
+def test_iter_json_values_empty():
+
+    assert list(iter_json_values(io.StringIO(u'[]'))) == []
+    assert list(iter_json_values(io.StringIO(u' [ ] '))) == []
+    assert list(iter_json_values(io.StringIO(u''))) == []
+
+
+@pytest.mark.parametrize('document', [
+    u'[{"a": 1}', u'[{"a": 1},', u'[{"a": 1} {"b": 2}]', u'[1] 2',
+    u'{"a": ', u'[1, ]'
+])
+def test_iter_json_values_invalid(document):
+
+    with pytest.raises(ValueError):
+        list(iter_json_values(io.StringIO(document), buffer_size=2))
+
+
+def test_iter_json_values_ndjson_arrays_rejected():
+
+    # Documents starting with an array are read as a single array
+    values = iter_json_values(io.BytesIO(b'[1, 2]\n[3]\n'))
+    assert next(values) == 1
+    assert next(values) == 2
+    with pytest.raises(ValueError) as excinfo:
+        next(values)
+
+    assert 'must not be arrays' in str(excinfo.value)
+
+
+@pytest.mark.parametrize('buffer_size', [1, 2, 3, 5])
+def test_iter_json_values_split_across_reads(buffer_size):
+
+    document = u'[true, false, "\\u2603\\ud834\\udd1e", -1.5e3, {"a": null}]'
+    values = iter_json_values(io.StringIO(document), buffer_size=buffer_size)
+    assert list(values) == [
+        True, False, u'\u2603\U0001d11e', -1500.0, {'a': None}]
+
+
+class CountingReader(io.StringIO):
+
+    def read(self, size=-1):
+        self.total = getattr(self, 'total', 0) + size
+        return super(CountingReader, self).read(size)
+
+
+def test_iter_json_values_invalid_value_reads_at_most_max_value_size():
+
+    document = u'[{"a": 1}, {"a": x}, ' + u'{"a": 1}, ' * 10000 + u'1]'
+    fp = CountingReader(document)
+    values = iter_json_values(fp, buffer_size=16, max_value_size=100)
+
+    assert next(values) == {'a': 1}
+    with pytest.raises(ValueError):
+        next(values)
+    assert fp.total < 400
+
+
+def test_iter_json_values_error_position():
+
+    document = u'[1, 2, ' + u'3, ' * 100 + u'x]'
+    for buffer_size in (1, 7, 4096):
+        with pytest.raises(ValueError) as excinfo:
+            list(iter_json_values(io.StringIO(document),
+                                  buffer_size=buffer_size))
+        assert '(char %d)' % document.index(u'x') in str(excinfo.value)
+
+
+@pytest.mark.parametrize('document', [
+    u'[[0.5, 1]]',
+    u'[[1.25e-3, -2E+10], [[3.0], []], {"a": [0.1, {"b": 1e5}]}]',
+    u'[{"a": "\\u2603 \\" \\\\ \\ud834\\udd1e", "b": [true, false, null]}]',
+    u'[{"\u2603": "\u00e9\U0001d11e caf\u00e9"}, ["\u20ac", 12345678]]',
+    u'{"a": [1.5, 2]}\n0.25\n-7\n"\u2603"\n',
+])
+def test_iter_json_values_every_buffer_size(document):
+
+    if document.startswith(u'['):
+        expected = json.loads(document)
+    else:
+        expected = [json.loads(line) for line in document.splitlines()]
+
+    for buffer_size in range(1, len(document) + 1):
+        values = iter_json_values(io.StringIO(document),
+                                  buffer_size=buffer_size)
+        assert list(values) == expected, buffer_size
+
+        values = iter_json_values(io.BytesIO(document.encode('utf-8')),
+                                  buffer_size=buffer_size)
+        assert list(values) == expected, buffer_size
+
+
+def test_iter_json_values_max_value_size():
+
+    document = u'[[' + u'1, ' * 1000 + u'1], 2]'
+    with pytest.raises(ValueError) as excinfo:
+        list(iter_json_values(
+            io.StringIO(document), buffer_size=16, max_value_size=100))
+
+    assert 'larger than 100 characters' in str(excinfo.value)
+    assert list(iter_json_values(io.StringIO(document), buffer_size=16))[1] \
+        == 2
+
+
+def test_iter_marshal_json():
+
+    class CompanyMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        name = field.String()
+
+    document = b'[{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]'
+    results = list(CompanyMapper.many().iter_marshal_json(
+        io.BytesIO(document), buffer_size=8))
+    assert [(r.id, r.name) for r in results] == [(1, 'a'), (2, 'b')]
+
+    chunks = []
+    document = u'{"id": 1, "name": "a"}\n{"id": 2, "name": "b"}\n' \
+        u'{"id": 3, "name": "c"}\n'
+    results = list(CompanyMapper.many().iter_marshal_json(
+        io.StringIO(document), chunk_size=2, callback=chunks.append))
+    assert [[r.id for r in chunk] for chunk in results] == [[1, 2], [3]]
+    assert chunks == results
+
+
+def test_iter_marshal_json_errors():
+
+    class CompanyMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        name = field.String()
+
+    document = u'[{"id": 1, "name": "a"}, {"id": "x", "name": "b"}, ' \
+        u'{"id": 3}]'
+
+    with pytest.raises(MappingInvalid) as e:
+        list(CompanyMapper.many().iter_marshal_json(io.StringIO(document)))
+    assert e.value.errors == {1: {'id': 'Invalid type'}}
+
+    results = list(CompanyMapper.many().iter_marshal_json(
+        io.StringIO(document), raise_errors=False))
+    assert results[0].id == 1
+    assert results[1].errors == {1: {'id': 'Invalid type'}}
+    assert results[2].errors == {2: {'name': 'This is a required field'}}
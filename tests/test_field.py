@@ -154,3 +154,16 @@ def test_field_invalid_opts_class():
     with pytest.raises(FieldError):
 
         PhoneNumber()
+
+
+def test_field_opts_accessors_follow_name_and_source():
+
+    field = Field(name='name')
+    assert field.opts._name_getter({'name': 'mike'}) == 'mike'
+    assert field.opts._source_getter({'name': 'mike'}) == 'mike'
+
+    field.opts.source = 'user.name'
+    assert field.opts._source_getter({'user': {'name': 'bob'}}) == 'bob'
+    output = {'user': {}}
+    field.opts._source_setter(output, 'jack')
+    assert output == {'user': {'name': 'jack'}}
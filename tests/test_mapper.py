@@ -1054,3 +1054,618 @@ def test_mapper_with_invalid_collection_fields_sets_errors():
         mapper.marshal()
 
     assert mapper.errors == {'users': {'id': 'This is a required field'}}
+
+
+def test_mapper_caches_field_plans_per_role():
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        id = Integer()
+        name = String()
+        secret = String()
+
+        __roles__ = {
+            'public': whitelist('id', 'name'),
+        }
+
+    mapper = MapperBase(obj=TestType(id=1, name='a', secret='b'))
+    assert mapper._get_fields('public') == [
+        MapperBase.fields['id'], MapperBase.fields['name']]
+    assert mapper._get_fields('public') == [
+        MapperBase.fields['id'], MapperBase.fields['name']]
+    assert mapper._get_fields(
+        'public', deferred_role=whitelist('name')) == [
+        MapperBase.fields['name']]
+
+    stats = MapperBase.plan_cache_stats()
+    assert stats == {'size': 3, 'hits': 1, 'misses': 2, 'invalidations': 0}
+
+    plan = MapperBase._get_plan('public')
+    assert plan.fields == (MapperBase.fields['id'], MapperBase.fields['name'])
+    assert plan.names == frozenset(['id', 'name'])
+
+    MapperBase.roles['public'] = whitelist('secret')
+    assert mapper._get_fields('public') == [MapperBase.fields['secret']]
+    assert MapperBase.plan_cache_stats()['invalidations'] == 1
+
+    del MapperBase.fields['secret']
+    assert mapper._get_fields('public') == []
+
+
+def test_mapper_field_plans_shared_by_equivalent_deferred_roles():
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+        __cache_size__ = 3
+
+        id = Integer()
+        name = String()
+        secret = String()
+
+    plans = set()
+    for i in range(5000):
+        plan = MapperBase._get_plan(
+            '__default__', deferred_role=whitelist('id', 'field_%s' % i))
+        assert plan.names == frozenset(['id'])
+        plans.add(plan)
+
+    assert len(plans) == 1
+    assert MapperBase.plan_cache_stats()['size'] == 3
+
+    # Deferred roles already used are not resolved again
+    plan = MapperBase._get_plan(
+        '__default__', deferred_role=whitelist('name', 'secret'))
+    stats = MapperBase.plan_cache_stats()
+    assert MapperBase._get_plan(
+        '__default__', deferred_role=whitelist('name', 'secret')) is plan
+    assert MapperBase.plan_cache_stats()['hits'] == stats['hits'] + 1
+    assert MapperBase._get_plan(
+        '__default__', deferred_role=blacklist('id')) is plan
+    assert list(MapperBase._plans) == [
+        ('__default__', True, frozenset(['name', 'secret'])),
+        frozenset(['name', 'secret']),
+        ('__default__', False, frozenset(['id']))]
+
+
+def test_mapper_field_plan_partial_marshal():
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        id = Integer()
+        name = String()
+        email = String()
+
+    mapper = MapperBase(data={'email': 'a@b.com', 'id': 1}, partial=True)
+    assert mapper._get_fields('__default__', for_marshal=True) == [
+        MapperBase.fields['id'], MapperBase.fields['email']]
+
+
+def test_mapper_field_plan_not_used_with_dynamic_roles():
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        id = Integer()
+        name = String()
+
+        def _get_role(self, name_or_role, deferred_role=None):
+            return whitelist(self.obj.allowed)
+
+    assert MapperBase(obj=TestType(allowed='id'))._get_fields(
+        '__default__') == [MapperBase.fields['id']]
+    assert MapperBase(obj=TestType(allowed='name'))._get_fields(
+        '__default__') == [MapperBase.fields['name']]
+    assert MapperBase.plan_cache_stats()['size'] == 0
+
+
+def test_mapper_field_plan_excludes_read_only_fields_from_marshal():
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        id = Integer(read_only=True)
+        name = String()
+
+    mapper = MapperBase(data={'id': 2, 'name': 'mike'})
+    assert mapper._get_fields('__default__') == [
+        MapperBase.fields['id'], MapperBase.fields['name']]
+    assert mapper._get_fields('__default__', for_marshal=True) == [
+        MapperBase.fields['name']]
+
+    MapperBase.fields['id'].opts.read_only = False
+    assert mapper._get_fields('__default__', for_marshal=True) == [
+        MapperBase.fields['id'], MapperBase.fields['name']]
+
+
+def test_mapper_iter_serialize_many():
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+        __compile_threshold__ = 2
+
+        id = Integer()
+
+    objs = (TestType(id=i) for i in range(5))
+    result = MapperBase.many().iter_serialize(objs)
+    assert not isinstance(result, list)
+    assert list(result) == [{'id': i} for i in range(5)]
+
+    chunks = []
+    result = MapperBase.many().iter_serialize(
+        (TestType(id=i) for i in range(5)), chunk_size=2,
+        callback=chunks.append)
+    assert list(result) == [
+        [{'id': 0}, {'id': 1}], [{'id': 2}, {'id': 3}], [{'id': 4}]]
+    assert chunks == [
+        [{'id': 0}, {'id': 1}], [{'id': 2}, {'id': 3}], [{'id': 4}]]
+
+    with pytest.raises(MapperError):
+        list(MapperBase.many().iter_serialize([], chunk_size=0))
+
+
+def test_mapper_iter_marshal_many_reuses_mapper():
+
+    instances = []
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        id = Integer()
+        name = String()
+
+        def validate(self, output):
+            instances.append(self)
+
+    data = [{'name': 'mike', 'id': 1}, {'name': 'bob', 'id': 2},
+            {'name': 'jack', 'id': 3}]
+
+    result = list(MapperBase.many().iter_marshal(iter(data), chunk_size=2))
+    assert [[(o.name, o.id) for o in chunk] for chunk in result] == [
+        [('mike', 1), ('bob', 2)], [('jack', 3)]]
+    assert len(set(id(m) for m in instances)) == 1
+
+    with pytest.raises(MappingInvalid):
+        list(MapperBase.many().iter_marshal([{'name': 'mike'}]))
+
+
+def test_mapper_marshal_track_changes():
+
+    class CompanyMapper(Mapper):
+
+        __type__ = TestType
+
+        name = String()
+        city = String(source='address.city')
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        id = Integer()
+        name = String()
+        company = Nested('CompanyMapper', allow_updates_in_place=True)
+
+    class Setters(TestType):
+
+        def __setattr__(self, name, value):
+            writes.append(name)
+            super(Setters, self).__setattr__(name, value)
+
+    writes = []
+    company = Setters(name='Acme', address={'city': 'London'})
+    user = Setters(id=1, name='mike', company=company)
+    data = {'id': 1, 'name': 'jack',
+            'company': {'name': 'Acme', 'city': 'Leeds'}}
+    del writes[:]
+
+    mapper = UserMapper(obj=user, data=data, track_changes=True)
+    assert mapper.marshal() is user
+    assert writes == ['name']
+    assert user.name == 'jack'
+    assert company.address == {'city': 'Leeds'}
+    assert mapper.changes == {
+        'name': ('mike', 'jack'),
+        'company': {'city': ('London', 'Leeds')},
+    }
+
+    mapper = UserMapper(obj=user, data=data, track_changes=True)
+    mapper.marshal()
+    assert mapper.changes == {}
+
+    mapper = UserMapper(obj=user, data=data)
+    mapper.marshal()
+    assert mapper.changes is None
+
+
+def test_mapper_marshal_track_changes_new_nested_object():
+
+    class CompanyMapper(Mapper):
+
+        __type__ = TestType
+
+        name = String()
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        name = String()
+        company = Nested('CompanyMapper', allow_create=True)
+
+    company = TestType(name='Acme')
+    user = TestType(name='mike', company=company)
+
+    mapper = UserMapper(obj=user, data={
+        'name': 'mike', 'company': {'name': 'Foo'}}, track_changes=True)
+    mapper.marshal()
+
+    assert user.company is not company
+    assert mapper.changes == {'company': (company, user.company)}
+
+
+def test_mapper_iterator_marshal_as_mappings():
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        id = Integer()
+        name = String()
+        city = String(source='address.city', required=False)
+        postcode = String(source='address.postcode', required=False)
+        created = String(read_only=True)
+
+        __roles__ = {
+            'name': whitelist('name'),
+        }
+
+    data = [{'name': 'mike', 'id': 1, 'city': 'London'},
+            {'name': 'bob', 'id': 2, 'postcode': 'E1'}]
+
+    result = MapperBase.many().marshal(data, as_mappings=True)
+    assert result == [
+        {'id': 1, 'name': 'mike', 'address__city': 'London',
+         'address__postcode': None},
+        {'id': 2, 'name': 'bob', 'address__city': None,
+         'address__postcode': 'E1'},
+    ]
+    assert MapperBase.many().marshal(
+        data, role='name', as_mappings=True) == [
+        {'name': 'mike'}, {'name': 'bob'}]
+
+    chunks = list(MapperBase.many().iter_marshal(
+        iter(data), chunk_size=1, as_mappings=True))
+    assert chunks == [[result[0]], [result[1]]]
+
+    with pytest.raises(MappingInvalid) as e:
+        MapperBase.many().marshal([{'id': 'x'}], as_mappings=True)
+    assert e.value.errors == {
+        'id': 'Invalid type', 'name': 'This is a required field'}
+
+
+def test_mapper_iterator_marshal_as_mappings_validate():
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        name = String()
+        city = String(source='address.city', required=False)
+
+        def validate(self, output):
+            if output.name == output.address.city:
+                raise MappingInvalid({'name': 'name is the city'})
+
+    data = [{'name': 'mike', 'city': 'London'}]
+    result = MapperBase.many().marshal(data, as_mappings=True)
+    assert result == [{'name': 'mike', 'address__city': 'London'}]
+    assert type(result[0]) is dict
+
+    with pytest.raises(MappingInvalid) as e:
+        MapperBase.many().marshal(
+            [{'name': 'Paris', 'city': 'Paris'}], as_mappings=True)
+    assert e.value.errors == {'name': 'name is the city'}
+
+
+def test_mapper_iterator_marshal_into():
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        id = Integer()
+        name = String()
+
+    existing = [TestType(id=1, name='mike'), TestType(id=2, name='bob')]
+    data = [{'id': 2, 'name': 'jack'}, {'id': 3, 'name': 'fred'},
+            {'id': 3, 'name': 'sam'}]
+
+    result = MapperBase.many().marshal_into(data, existing=existing)
+    assert result.objs[0] is existing[1]
+    assert [o.name for o in existing] == ['mike', 'jack']
+    assert result.updated == [existing[1]]
+    assert len(result.created) == 1
+    assert (result.created[0].id, result.created[0].name) == (3, 'sam')
+    assert result.objs[1] is result.objs[2] is result.created[0]
+
+
+def test_mapper_iterator_marshal_into_key_source():
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        id = Integer(source='user_id')
+        name = String()
+
+    existing = [TestType(user_id=1, name='mike')]
+
+    created, updated = MapperBase.many().marshal_into(
+        [{'id': 1, 'name': 'bob'}, {'id': 2, 'name': 'jack'}],
+        existing=existing)[1:]
+    assert updated == existing
+    assert existing[0].name == 'bob'
+    assert created[0].user_id == 2
+
+
+def test_mapper_iterator_marshal_into_converts_keys():
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        id = Integer()
+        name = String()
+
+    existing = [TestType(id=5, name='mike')]
+
+    # Form and query string data are matched once converted by the key field
+    result = MapperBase.many().marshal_into(
+        [{'id': '5', 'name': 'bob'}], existing=existing, allow_create=False)
+    assert result.objs == existing
+    assert result.created == []
+    assert existing[0].name == 'bob'
+
+
+def test_mapper_iterator_marshal_into_errors():
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        id = Integer()
+        name = String()
+        email = String(error_msgs={'not_found': 'no user with this {name}'},
+                       required=False)
+
+    existing = [TestType(id=1, name='mike', email='mike@example.com')]
+    data = [{'id': 2, 'name': 'jack'}, {'id': 1}, {'id': 1, 'name': 'bob'}]
+
+    with pytest.raises(MappingInvalid) as e:
+        MapperBase.many().marshal_into(
+            data, existing=existing, allow_create=False)
+    assert e.value.errors == {
+        0: {'id': 'id not found'},
+        1: {'name': 'This is a required field'},
+    }
+
+    data = [{'name': 'jack', 'email': 'jack@example.com'}]
+    with pytest.raises(MappingInvalid) as e:
+        MapperBase.many().marshal_into(
+            data, existing=existing, key='email', allow_create=False)
+    assert e.value.errors == {0: {'email': 'no user with this email'}}
+
+
+def test_mapper_iterator_marshal_into_parallel():
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        id = Integer()
+
+    with pytest.raises(MapperError):
+        MapperBase.many(parallel=2).marshal_into(
+            [{'id': 1}], existing=[TestType(id=1)])
+
+
+def test_mapper_iterator_get_mapper_does_not_mutate_params():
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        id = Integer()
+
+    iterator = MapperBase.many(raw=True)
+    mapper = iterator.get_mapper(obj=TestType(id=1))
+
+    assert mapper.raw is True
+    assert iterator.mapper_params == {'raw': True}
+
+
+def test_mapper_serializer():
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        id = Integer()
+        name = String()
+        nested = Nested('NestedMapper')
+
+        __roles__ = {
+            'public': whitelist('name')
+        }
+
+    class NestedMapper(Mapper):
+
+        __type__ = TestType
+
+        id = Integer()
+
+    serialize = MapperBase.serializer()
+    obj = TestType(id=1, name='mike', nested=TestType(id=2))
+
+    assert serialize(obj) == MapperBase(obj=obj).serialize()
+    assert serialize.many([obj, obj]) == [serialize(obj)] * 2
+    assert MapperBase.serializer(role='public')(obj) == {'name': 'mike'}
+
+    with pytest.raises(MapperError):
+        MapperBase.serializer(role='missing')
+
+
+def test_mapper_serializer_polymorphic():
+
+    obj = TestType(id=2, name='bob', location='London', object_type='event')
+
+    serialize = SchedulableMapper.serializer(role='public')
+    assert serialize(obj) == SchedulableMapper(obj=obj).serialize(
+        role='public')
+
+
+def test_mapper_marshaler():
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        id = Integer(read_only=True)
+        name = String()
+
+    marshal = MapperBase.marshaler()
+
+    result = marshal({'name': 'mike'})
+    assert isinstance(result, TestType)
+    assert result.name == 'mike'
+
+    obj = TestType(id=1, name='bob')
+    assert marshal({'name': 'mike'}, obj=obj) is obj
+    assert obj.name == 'mike'
+
+    with pytest.raises(MappingInvalid) as e:
+        marshal({})
+    assert e.value.errors == {'name': 'This is a required field'}
+
+    obj = TestType(id=1, name='bob')
+    MapperBase.marshaler(partial=True)({}, obj=obj)
+    assert obj.name == 'bob'
+
+
+def test_mapper_marshaler_custom_validate():
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        name = String()
+
+        def validate(self, output):
+            if output.name == 'bob':
+                raise MappingInvalid({'name': 'not bob'})
+
+    marshal = MapperBase.marshaler()
+    assert not marshal.direct
+
+    assert marshal({'name': 'mike'}).name == 'mike'
+    with pytest.raises(MappingInvalid) as e:
+        marshal({'name': 'bob'})
+    assert e.value.errors == {'name': 'not bob'}
+
+
+def test_mapper_serializer_shared_between_threads():
+
+    import threading
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        id = Integer()
+        name = String()
+
+    serialize = MapperBase.serializer()
+    marshal = MapperBase.marshaler()
+    failures = []
+
+    def work(n):
+        for i in range(200):
+            obj = TestType(id=n * 1000 + i, name=str(i))
+            if serialize(obj) != {'id': obj.id, 'name': obj.name}:
+                failures.append(obj)
+            if marshal({'id': obj.id, 'name': obj.name}).id != obj.id:
+                failures.append(obj)
+
+    threads = [threading.Thread(target=work, args=(n, )) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert failures == []
+    stats = MapperBase.compilation_stats()
+    assert stats['serialize']['__default__']['compilations'] == 1
+
+
+def test_mapper_serialize_executor():
+
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    threads = {}
+
+    class SlowType(TestType):
+
+        def _read(self, name):
+            threads[name] = threading.current_thread()
+            return getattr(self, '_' + name)
+
+        slow = property(lambda self: self._read('slow'))
+        company = property(lambda self: self._read('company'))
+        other = property(lambda self: self._read('other'))
+
+    class CompanyMapper(Mapper):
+
+        __type__ = TestType
+
+        id = Integer()
+
+    class MapperBase(Mapper):
+
+        __type__ = TestType
+
+        id = Integer()
+        slow = String(io_bound=True)
+        company = Nested('CompanyMapper')
+        other = Nested('CompanyMapper', io_bound=False)
+        name = String()
+
+    obj = SlowType(id=1, _slow='slow', _company=TestType(id=2),
+                   _other=TestType(id=3), name='mike')
+    expected = MapperBase(obj=obj).serialize()
+    threads.clear()
+
+    with ThreadPoolExecutor(2) as executor:
+        result = MapperBase(obj=obj).serialize(executor=executor)
+        results = MapperBase.many().serialize([obj, obj], executor=executor)
+
+    assert result == expected
+    assert list(result.keys()) == list(expected.keys())
+    assert results == [expected, expected]
+
+    main = threading.current_thread()
+    assert threads['slow'] is not main
+    assert threads['company'] is not main
+    assert threads['other'] is main
+
+    with pytest.raises(MapperError):
+        MapperBase.many(parallel=2).serialize([obj], executor=executor)
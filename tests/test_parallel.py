@@ -0,0 +1,152 @@
+import io
+import json
+
+import pytest
+
+from kim import Mapper, MappingInvalid, MapperError, field, whitelist
+
+from kim.parallel import split_file
+
+from .helpers import TestType
+
+
+class ParallelMapper(Mapper):
+
+    __type__ = TestType
+
+    id = field.Integer()
+    name = field.String()
+
+
+def test_parallel_param_validation():
+
+    for value in (0, -1, 'two'):
+        with pytest.raises(MapperError):
+            ParallelMapper.many(parallel=value)
+        with pytest.raises(MapperError):
+            ParallelMapper.many(parallel=2, parallel_chunk_size=value)
+
+
+def test_serialize_parallel():
+
+    objs = [TestType(id=i, name='name %s' % i) for i in range(25)]
+
+    mapper = ParallelMapper.many(parallel=2, parallel_chunk_size=4)
+    assert mapper.serialize(iter(objs)) == \
+        ParallelMapper.many().serialize(objs)
+    assert mapper.serialize([]) == []
+    assert mapper.serialize(objs, deferred_role=whitelist('id')) == \
+        [{'id': i} for i in range(25)]
+
+
+def test_serialize_json_parallel():
+
+    objs = [TestType(id=i, name='name %s' % i) for i in range(9)]
+
+    mapper = ParallelMapper.many(parallel=2, parallel_chunk_size=2)
+    assert b''.join(mapper.serialize_json(objs)) == \
+        b''.join(ParallelMapper.many().serialize_json(objs))
+    assert b''.join(mapper.serialize_json([])) == b'[]'
+
+    stream = io.StringIO()
+    mapper.serialize_json(objs, stream=stream)
+    assert json.loads(stream.getvalue()) == \
+        ParallelMapper.many().serialize(objs)
+
+
+def test_marshal_parallel():
+
+    data = [{'id': i, 'name': 'name %s' % i} for i in range(10)]
+
+    results = ParallelMapper.many(
+        parallel=2, parallel_chunk_size=3).marshal(data)
+    assert results == ParallelMapper.many().marshal(data)
+
+    chunks = list(ParallelMapper.many(
+        parallel=2, parallel_chunk_size=3).iter_marshal(data, chunk_size=4))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+
+
+def test_marshal_parallel_as_mappings():
+
+    data = [{'id': i, 'name': 'name %s' % i} for i in range(5)]
+
+    results = ParallelMapper.many(
+        parallel=2, parallel_chunk_size=2).marshal(data, as_mappings=True)
+    assert results == data
+
+
+def test_marshal_parallel_merges_errors():
+
+    data = [{'id': i, 'name': 'name %s' % i} for i in range(10)]
+    data[2]['id'] = 'x'
+    del data[7]['name']
+
+    with pytest.raises(MappingInvalid) as e:
+        ParallelMapper.many(parallel=2, parallel_chunk_size=3).marshal(data)
+
+    assert e.value.errors == {
+        2: {'id': 'Invalid type'},
+        7: {'name': 'This is a required field'},
+    }
+
+    with pytest.raises(MappingInvalid) as e:
+        list(ParallelMapper.many(parallel=2).iter_marshal(data))
+    assert e.value.errors == {'id': 'Invalid type'}
+
+    document = io.StringIO(json.dumps(data))
+    results = list(ParallelMapper.many(parallel=2).iter_marshal_json(
+        document, raise_errors=False))
+    assert results[2].errors == {2: {'id': 'Invalid type'}}
+    assert results[7].errors == {7: {'name': 'This is a required field'}}
+    assert results[9].id == 9
+
+
+def _ndjson(tmpdir, lines):
+
+    path = tmpdir.join('data.ndjson')
+    path.write_binary(u'\n'.join(lines).encode('utf-8'))
+    return str(path)
+
+
+@pytest.mark.parametrize('parts', [1, 2, 3, 50])
+def test_split_file(tmpdir, parts):
+
+    lines = ['{"id": %s}' % i for i in range(10)]
+    path = _ndjson(tmpdir, lines)
+
+    ranges = split_file(path, parts)
+    with open(path, 'rb') as fp:
+        content = fp.read()
+
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(content)
+    assert len(ranges) <= parts
+    for (start, end), (next_start, _) in zip(ranges, ranges[1:]):
+        assert end == next_start
+        assert content[end - 1:end] == b'\n'
+
+    assert split_file(_ndjson(tmpdir, []), parts) == []
+
+
+def test_marshal_file(tmpdir):
+
+    lines = ['{"id": %s, "name": "name %s"}' % (i, i) for i in range(20)]
+    lines[3] = '{"id": "x", "name": "bad"}'
+    lines[8] = ''
+    lines[12] = '{"id": 12, '
+    path = _ndjson(tmpdir, lines + [''])
+
+    results, errors = ParallelMapper.many(
+        parallel=2).marshal_file(path)
+
+    expected = [i for i in range(20) if i not in (3, 8, 12)]
+    assert list(results.keys()) == [i + 1 for i in expected]
+    assert [obj.id for obj in results.values()] == expected
+
+    assert errors[4] == {'id': 'Invalid type'}
+    assert errors[13].startswith('Invalid JSON')
+    assert len(errors) == 2
+
+    chunks = list(ParallelMapper.many(parallel=3).iter_marshal_file(path))
+    assert len(chunks) > 1
+    assert sum(len(r) for r, e in chunks) == len(expected)
@@ -1,8 +1,8 @@
 import pytest
 
-from kim.field import Field, FieldInvalid, FieldError
+from kim.field import Field, String, FieldInvalid, FieldError
 from kim.pipelines.base import (
-    Session,
+    Session, pipe, optimize_pipes, pipeline_runner, read_only, is_valid_choice,
     get_data_from_source, get_data_from_name, update_output_to_name,
     update_output_to_source)
 
@@ -173,3 +173,118 @@ def test_update_output_to_source_invalid_output_type():
     session = Session(field, data, output)
     with pytest.raises(FieldError):
         update_output_to_source(session)
+
+
+def test_optimize_pipes_removes_noop_pipes():
+
+    @pipe()
+    def validate(session):
+        return session.data
+
+    def undecorated(session):
+        return session.data
+
+    pipes = [read_only, get_data_from_name, validate, is_valid_choice,
+             undecorated, update_output_to_source]
+
+    # get_data_from_name ensures data is set for required fields so
+    # validate is run without the check for None
+    field = Field(name='foo')
+    assert optimize_pipes(pipes, field) == (
+        get_data_from_name.unchecked, validate.unchecked, undecorated,
+        update_output_to_source.unchecked)
+
+    field = Field(name='foo', required=False, choices=['a'])
+    assert optimize_pipes(pipes, field) == (
+        get_data_from_name.unchecked, validate, is_valid_choice,
+        undecorated, update_output_to_source.unchecked)
+
+    field = Field(name='foo', read_only=True)
+    assert optimize_pipes(pipes, field) == ()
+
+
+def test_field_optimized_pipes_follow_opts():
+
+    field = String(name='foo', required=False)
+    assert is_valid_choice not in field.get_optimized_pipes('marshal')
+
+    field.opts.choices = ['a']
+    assert is_valid_choice in field.get_optimized_pipes('marshal')
+
+    output = {}
+    with pytest.raises(FieldInvalid):
+        field.marshal(Session(data={'foo': 'b'}, output=output))
+
+    field.opts.read_only = True
+    assert field.get_optimized_pipes('marshal') == ()
+
+    with pytest.raises(FieldError):
+        field.get_optimized_pipes('foo')
+
+
+def test_value_pipes():
+
+    @pipe(style='value')
+    def upper(session, value):
+        return value.upper()
+
+    @pipe()
+    def exclaim(session):
+        session.data = session.data + '!'
+
+    @pipe(style='value', run_if_none=True)
+    def default(session, value):
+        return 'none' if value is None else value
+
+    # Value pipes can still be called with a session
+    session = Session(Field(name='foo'), 'mike', {})
+    assert upper(session) == 'MIKE'
+    assert session.data == 'MIKE'
+
+    session = Session(Field(name='foo'), None, {})
+    assert upper(session) is None
+
+    run = pipeline_runner([upper, exclaim, upper, update_output_to_name])
+    output = {}
+    session = Session(Field(name='foo'), 'mike', output)
+    assert run(session) is output
+    assert output == {'foo': 'MIKE!'}
+    assert session.data == 'MIKE!'
+
+    run = pipeline_runner([upper, default, update_output_to_name])
+    output = {}
+    run(Session(Field(name='foo'), None, output))
+    assert output == {'foo': 'none'}
+
+    with pytest.raises(ValueError):
+        pipe(style='foo')
+
+
+def test_field_reuses_mapper_session():
+
+    from kim.mapper import MapperSession
+
+    sessions = []
+
+    @pipe()
+    def record(session):
+        sessions.append(session)
+
+    def run_other(session):
+        # Running another field while the session is in use gets a new one
+        other.serialize(session.mapper_session)
+
+    field = Field(name='foo', extra_serialize_pipes={'output': [record]})
+    other = Field(name='bar', extra_serialize_pipes={'output': [record]})
+    wrapper = Field(name='baz', extra_serialize_pipes={'output': [run_other]})
+
+    output = {}
+    mapper_session = MapperSession(None, {'foo': 1, 'bar': 2, 'baz': 3}, output)
+    field.serialize(mapper_session)
+    other.serialize(mapper_session)
+    assert sessions[0] is sessions[1] is mapper_session.field_session
+
+    wrapper.serialize(mapper_session)
+    assert sessions[2] is not mapper_session.field_session
+    assert output == {'foo': 1, 'bar': 2, 'baz': 3}
+    assert mapper_session.field_session.field is None
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 
 from kim import Mapper, field
@@ -377,3 +379,233 @@ def test_marshal_collection_required_false():
     output = mapper.marshal()
 
     assert output.readers == []
+
+
+def test_collection_match_on_requires_nested():
+
+    with pytest.raises(field.FieldError):
+        field.Collection(field.String(), match_on='id')
+
+
+def test_marshal_collection_match_on():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        name = field.String()
+
+    users = [TestType(id=i, name='user %s' % i) for i in range(1, 4)]
+    data = {'users': [{'id': 3, 'name': 'jack'}, {'id': 1, 'name': 'mike'},
+                      {'id': 9, 'name': 'new'}]}
+
+    f = field.Collection(
+        field.Nested('UserMapper', allow_updates_in_place=True,
+                     allow_create=True),
+        name='users', match_on='id')
+    output = {'users': list(users)}
+    mapper_session = get_mapper_session(data=data, output=output)
+    f.marshal(mapper_session)
+
+    result = output['users']
+    assert result[0] is users[2]
+    assert result[1] is users[0]
+    assert (result[2].id, result[2].name) == (9, 'new')
+    assert [u.name for u in users] == ['mike', 'user 2', 'jack']
+
+
+def test_marshal_collection_match_on_track_changes():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer(required=False)
+        name = field.String()
+
+    class TeamMapper(Mapper):
+
+        __type__ = TestType
+
+        users = field.Collection(
+            field.Nested('UserMapper', allow_updates_in_place=True,
+                         allow_create=True),
+            match_on='id')
+
+    users = [TestType(id=i, name='user %s' % i) for i in range(1, 5)]
+    team = TestType(users=list(users))
+    data = {'users': [
+        {'id': 4, 'name': 'user 4'}, {'id': 1, 'name': 'mike'},
+        {'id': 3, 'name': 'user 3'}, {'name': 'new'}]}
+
+    mapper = TeamMapper(obj=team, data=data, track_changes=True)
+    mapper.marshal()
+
+    changes = mapper.changes['users']
+    assert [u.name for u in changes.added] == ['new']
+    assert changes.updated == [users[0]]
+    assert changes.removed == [users[1]]
+    assert team.users == [users[3], users[0], users[2], changes.added[0]]
+
+    # Nothing changes when the same elements are passed in the same order
+    changes.added[0].id = 5
+    data = {'users': [{'id': u.id, 'name': u.name} for u in team.users]}
+    mapper = TeamMapper(obj=team, data=data, track_changes=True)
+    mapper.marshal()
+    assert mapper.changes == {}
+
+
+def test_marshal_collection_match_on_converts_keys():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer(read_only=True)
+        name = field.String()
+
+    class TeamMapper(Mapper):
+
+        __type__ = TestType
+
+        users = field.Collection(
+            field.Nested('UserMapper', allow_updates_in_place=True,
+                         allow_create=True),
+            match_on='id')
+
+    users = [TestType(id=i, name='user %s' % i) for i in range(2)]
+    team = TestType(users=list(users))
+    # Keys of form and query string data are matched once converted by the
+    # key field
+    data = {'users': [{'id': '0', 'name': 'mike'},
+                      {'id': '1', 'name': 'user 1'}]}
+
+    mapper = TeamMapper(obj=team, data=data, track_changes=True)
+    mapper.marshal()
+
+    assert team.users == users
+    assert users[0].name == 'mike'
+    changes = mapper.changes['users']
+    assert changes.added == []
+    assert changes.updated == [users[0]]
+    assert changes.removed == []
+
+
+def test_marshal_collection_by_position_track_changes():
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        name = field.String()
+
+    class TeamMapper(Mapper):
+
+        __type__ = TestType
+
+        name = field.String()
+        users = field.Collection(
+            field.Nested('UserMapper', allow_updates_in_place=True,
+                         allow_create=True))
+
+    users = [TestType(name='a'), TestType(name='b'), TestType(name='c')]
+    team = TestType(name='team', users=list(users))
+    data = {'name': 'team', 'users': [{'name': 'A'}, {'name': 'b'}]}
+
+    mapper = TeamMapper(obj=team, data=data, track_changes=True)
+    mapper.marshal()
+
+    assert mapper.changes == {'users': ([], [users[0]], [users[2]])}
+    assert team.users == users[:2]
+    assert users[0].name == 'A'
+
+    data = {'name': 'team', 'users': [{'name': 'A'}, {'name': 'b'},
+                                      {'name': 'new'}]}
+    mapper = TeamMapper(obj=team, data=data, track_changes=True)
+    mapper.marshal()
+
+    changes = mapper.changes['users']
+    assert [u.name for u in changes.added] == ['new']
+    assert (changes.updated, changes.removed) == ([], [])
+
+    data = {'name': 'team', 'users': [{'name': u.name} for u in team.users]}
+    mapper = TeamMapper(obj=team, data=data, track_changes=True)
+    mapper.marshal()
+    assert mapper.changes == {}
+
+
+def test_collection_limit_opts_validation():
+
+    with pytest.raises(field.FieldError) as excinfo:
+        field.Collection(field.String(), limit=-1)
+    assert 'limit must be a non-negative integer' in str(excinfo.value)
+
+    with pytest.raises(field.FieldError):
+        field.Collection(field.String(), paginate=True)
+
+
+def test_serialize_collection_limit():
+
+    class PostMapper(Mapper):
+
+        __type__ = TestType
+
+        tags = field.Collection(field.String(), limit=2)
+        ids = field.Collection(field.Integer(), limit=2, offset=3,
+                               paginate=True, count=True)
+
+    post = TestType(tags=['a', 'b', 'c'], ids=iter(range(6)))
+    expected = {
+        'tags': ['a', 'b'],
+        'ids': {'items': [3, 4], 'next': 5, 'total': 6},
+    }
+    assert PostMapper(obj=post).serialize() == expected
+
+    # compiled serializers and JSON streaming apply the limit too
+    post.ids = list(range(6))
+    serialize = PostMapper.compile_serializer()
+    assert serialize(post) == expected
+    assert json.loads(b''.join(
+        PostMapper(obj=post).serialize_json()).decode('utf-8')) == expected
+
+    post.ids = [1, 2, 3, 4, 5]
+    assert PostMapper(obj=post).serialize()['ids'] == {
+        'items': [4, 5], 'next': None, 'total': 5}
+
+
+def test_serialize_collection_offset_without_limit():
+
+    class PostMapper(Mapper):
+
+        __type__ = TestType
+
+        tags = field.Collection(field.String(), offset=1)
+        ids = field.Collection(field.Integer(), offset=4)
+
+    post = TestType(tags=['a', 'b', 'c'], ids=iter(range(6)))
+    expected = {'tags': ['b', 'c'], 'ids': [4, 5]}
+    assert PostMapper(obj=post).serialize() == expected
+
+    post.ids = list(range(6))
+    serialize = PostMapper.compile_serializer()
+    assert serialize(post) == expected
+    assert json.loads(b''.join(
+        PostMapper(obj=post).serialize_json()).decode('utf-8')) == expected
+
+
+def test_serialize_collection_limit_zero():
+
+    class PostMapper(Mapper):
+
+        __type__ = TestType
+
+        tags = field.Collection(field.String(), limit=0)
+        ids = field.Collection(field.Integer(), limit=0, offset=1,
+                               paginate=True, count=True)
+
+    post = TestType(tags=['a', 'b'], ids=[1, 2, 3])
+    assert PostMapper(obj=post).serialize() == {
+        'tags': [],
+        'ids': {'items': [], 'next': 1, 'total': 3},
+    }
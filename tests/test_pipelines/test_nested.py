@@ -1,7 +1,7 @@
 import pytest
 
 from kim.mapper import Mapper, MapperError
-from kim.field import FieldInvalid
+from kim.field import FieldInvalid, FieldError
 from kim import field
 from kim.pipelines import marshaling
 
@@ -432,3 +432,89 @@ def test_self_nesting_marshal():
     result = Outer(data=data).marshal()
 
     assert result == {'user_name': 'jack', 'status': 200}
+
+
+def test_nested_batch_getter_in_collection():
+
+    calls = []
+    companies = dict((i, TestType(id=i, name='company %s' % i))
+                     for i in range(5))
+
+    def load_companies(keys):
+        calls.append(sorted(keys))
+        return dict((k, companies[k]) for k in keys if k in companies)
+
+    class CompanyMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        name = field.String()
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        company = field.Nested('CompanyMapper', batch_getter=load_companies,
+                               allow_create=True)
+        previous = field.Collection(field.Nested(
+            'CompanyMapper', batch_getter=load_companies, allow_create=True))
+
+    data = {
+        'company': {'id': 2},
+        'previous': [{'id': 1}, {'id': 3}, {'id': 1},
+                     {'id': 9, 'name': 'new'}],
+    }
+    user = UserMapper(data=data).marshal()
+
+    assert [c.name for c in user.previous] == [
+        'company 1', 'company 3', 'company 1', 'new']
+    assert user.previous[0] is companies[1]
+    assert user.company is companies[2]
+    assert calls == [[2], [1, 3, 9]]
+
+
+def test_nested_batch_getter_many():
+
+    calls = []
+
+    def load_companies(keys):
+        calls.append(sorted(keys))
+        return dict((k, TestType(id=k)) for k in keys)
+
+    class CompanyMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        company = field.Nested('CompanyMapper', batch_getter=load_companies)
+        previous = field.Collection(field.Nested(
+            'CompanyMapper', batch_getter=load_companies), required=False)
+
+    data = [{'company': {'id': i % 3}, 'previous': [{'id': 7}]}
+            for i in range(6)]
+    users = UserMapper.many().marshal(data)
+
+    assert [u.company.id for u in users] == [0, 1, 2, 0, 1, 2]
+    assert users[0].company is users[3].company
+    assert calls == [[0, 1, 2], [7]]
+
+
+def test_nested_batch_getter_options():
+
+    with pytest.raises(FieldError):
+        field.Nested('CompanyMapper', getter=lambda s: None,
+                     batch_getter=lambda keys: {})
+
+    opts = field.Nested('CompanyMapper', batch_getter=lambda keys: {},
+                        batch_key='company.id').opts
+    assert opts.batch_key({'company': {'id': 3}}) == 3
+
+    opts = field.Nested('CompanyMapper', batch_getter=lambda keys: {},
+                        batch_key=lambda data: data['pk']).opts
+    assert opts.batch_key({'pk': 3}) == 3
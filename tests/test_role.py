@@ -1,3 +1,5 @@
+import pickle
+
 import pytest
 
 from kim.role import whitelist, blacklist, RoleError
@@ -60,3 +62,16 @@ def test_union_of_built_in_types_not_supported():
 
     with pytest.raises(RoleError):
         blacklist('name', 'id') | set('name')
+
+
+def test_roles_can_be_pickled():
+
+    role = pickle.loads(pickle.dumps(whitelist('name', 'id')))
+    assert type(role) is whitelist
+    assert role == set(['name', 'id'])
+    assert 'email' not in role
+
+    role = pickle.loads(pickle.dumps(blacklist('id')))
+    assert type(role) is blacklist
+    assert 'id' not in role
+    assert 'name' in role
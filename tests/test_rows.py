@@ -0,0 +1,109 @@
+from collections import namedtuple
+
+import pytest
+
+from kim import Mapper, MapperError, field, whitelist
+from kim.rows import row_reader, get_row_columns
+
+from .helpers import TestType
+
+
+def test_row_reader():
+
+    read = row_reader(
+        ['id', 'company__id', 'company__name', 'company__ceo__name'])
+    assert read((1, 2, 'Acme', 'jack')) == {
+        'id': 1,
+        'company': {'id': 2, 'name': 'Acme', 'ceo': {'name': 'jack'}},
+    }
+    assert read((1, 2, 'Acme', None)) == {
+        'id': 1,
+        'company': {'id': 2, 'name': 'Acme', 'ceo': None},
+    }
+    assert read((1, None, None, None)) == {'id': 1, 'company': None}
+
+    read = row_reader(['id', 'name', 'company__name'], names={'name'})
+    assert read((1, 'mike', 'Acme')) == {'name': 'mike'}
+
+
+def test_row_reader_conflicting_columns():
+
+    with pytest.raises(MapperError):
+        row_reader(['company', 'company__name'])
+
+    with pytest.raises(MapperError):
+        row_reader(['company__name', 'company'])
+
+
+def test_get_row_columns():
+
+    Row = namedtuple('Row', ['id', 'name'])
+    assert get_row_columns(Row(1, 'mike')) == ['id', 'name']
+
+    with pytest.raises(MapperError):
+        get_row_columns((1, 'mike'))
+
+
+@pytest.fixture
+def mappers():
+
+    class CompanyMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        name = field.String()
+
+    class UserMapper(Mapper):
+
+        __type__ = TestType
+
+        id = field.Integer()
+        name = field.String()
+        company = field.Nested('CompanyMapper')
+        object_type = field.Static('user')
+
+        __roles__ = {
+            'public': whitelist('name', 'company'),
+        }
+
+    return UserMapper, CompanyMapper
+
+
+def test_serialize_rows(mappers):
+
+    UserMapper, CompanyMapper = mappers
+
+    columns = ['id', 'name', 'password', 'company__id', 'company__name']
+    rows = [
+        (1, 'mike', 'secret', 2, 'Acme'),
+        (2, 'jack', 'secret', None, None),
+    ]
+
+    assert UserMapper.many().serialize_rows(rows, columns=columns) == [
+        {'id': 1, 'name': 'mike', 'object_type': 'user',
+         'company': {'id': 2, 'name': 'Acme'}},
+        {'id': 2, 'name': 'jack', 'object_type': 'user', 'company': None},
+    ]
+    assert UserMapper.many(raw=True).serialize_rows(
+        rows, columns=columns, role='public') == [
+        {'name': 'mike', 'company': {'id': 2, 'name': 'Acme'}},
+        {'name': 'jack', 'company': None},
+    ]
+
+
+def test_iter_serialize_rows(mappers):
+
+    UserMapper, CompanyMapper = mappers
+
+    Row = namedtuple('Row', ['id', 'name'])
+    rows = (Row(i, 'user %s' % i) for i in range(5))
+    chunks = []
+
+    result = list(CompanyMapper.many().iter_serialize_rows(
+        rows, chunk_size=2, callback=chunks.append))
+    assert result == chunks
+    assert [[r['id'] for r in chunk] for chunk in result] == \
+        [[0, 1], [2, 3], [4]]
+
+    assert list(CompanyMapper.many().iter_serialize_rows(iter([]))) == []
@@ -1,12 +1,14 @@
 import pytest
 
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey
+from sqlalchemy import (
+    create_engine, event, select, Column, Integer, String, ForeignKey)
 from sqlalchemy.orm import sessionmaker, relationship, backref
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.hybrid import hybrid_property
 
 from kim.mapper import Mapper, MappingInvalid
-from kim import field
+from kim import field, whitelist
+from kim.sqa import eager_load, get_load_plan
 
 
 Base = declarative_base()
@@ -76,6 +78,31 @@ class Post(Base):
         lazy='dynamic')
 
 
+class Comment(Base):
+
+    __tablename__ = 'comments'
+
+    id = Column(Integer, primary_key=True)
+    body = Column(String)
+    status = Column(String)
+    post_id = Column(Integer, ForeignKey('posts.id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+
+    post = relationship(Post, backref=backref('comments', order_by=id))
+    author = relationship(User)
+
+
+class Category(Base):
+
+    __tablename__ = 'categories'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    parent_id = Column(Integer, ForeignKey('categories.id'))
+
+    children = relationship('Category', order_by=id)
+
+
 @pytest.fixture(scope='session')
 def connection(request):
     engine = create_engine('sqlite://')
@@ -367,3 +394,301 @@ def test_marshal_collection_appender_query(db_session):
     mapper = PostMapper(data=data, obj=instance, partial=True)
     obj = mapper.marshal()
     assert obj.title == 'new title'
+
+
+@pytest.fixture
+def comment_mappers():
+
+    class AuthorMapper(Mapper):
+
+        __type__ = User
+
+        id = field.Integer(read_only=True)
+        name = field.String()
+        fullname = field.String()
+
+        __roles__ = {
+            'public': whitelist('name'),
+        }
+
+    class CommentMapper(Mapper):
+
+        __type__ = Comment
+
+        id = field.Integer(read_only=True)
+        body = field.String()
+        status = field.String()
+        author = field.Nested('AuthorMapper', role='public')
+
+        __roles__ = {
+            'public': whitelist('body', 'author'),
+        }
+
+    class BlogPostMapper(Mapper):
+
+        __type__ = Post
+
+        id = field.Integer(read_only=True)
+        title = field.String()
+        author_name = field.String(source='user.name')
+        comments = field.Collection(
+            field.Nested('CommentMapper', role='public'))
+        readers = field.Collection(field.Nested('AuthorMapper'))
+        object_type = field.Static('post')
+
+        __roles__ = {
+            'public': whitelist('title', 'comments', 'object_type'),
+            'author': whitelist('title', 'author_name'),
+            'readers': whitelist('title', 'readers'),
+        }
+
+    return BlogPostMapper, CommentMapper, AuthorMapper
+
+
+def test_get_load_plan(comment_mappers):
+
+    BlogPostMapper, CommentMapper, AuthorMapper = comment_mappers
+
+    plan = get_load_plan(BlogPostMapper, role='public')
+    assert plan.model is Post
+    # the columns joining relationships are always loaded
+    assert plan.columns == ['title', 'id']
+    assert list(plan.relationships) == ['comments']
+
+    comments = plan.relationships['comments']
+    assert comments.model is Comment
+    assert comments.columns == ['body', 'user_id']
+    assert list(comments.relationships) == ['author']
+    assert comments.relationships['author'].columns == ['name']
+
+    plan = get_load_plan(BlogPostMapper, role='author')
+    assert plan.columns == ['title', 'user_id']
+    assert plan.relationships['user'].columns == ['name']
+
+    # dynamic relationships can't be eager loaded
+    plan = get_load_plan(BlogPostMapper, role='readers')
+    assert plan.columns == ['title']
+    assert not plan.relationships
+
+
+def test_get_load_plan_non_column_source():
+
+    class UserMapper(Mapper):
+
+        __type__ = User
+
+        name = field.String()
+        anonymous = field.Boolean(read_only=True)
+
+    plan = get_load_plan(UserMapper)
+    assert plan.columns is None
+
+
+def test_get_load_plan_nested_self(comment_mappers):
+
+    BlogPostMapper, CommentMapper, AuthorMapper = comment_mappers
+
+    class CommentDetailsMapper(Mapper):
+
+        __type__ = Comment
+
+        status = field.String()
+        author = field.Nested('AuthorMapper', role='public')
+
+    class CommentSummaryMapper(Mapper):
+
+        __type__ = Comment
+
+        body = field.String()
+        details = field.Nested('CommentDetailsMapper', source='__self__')
+
+    plan = get_load_plan(CommentSummaryMapper)
+    assert plan.columns == ['body', 'status', 'user_id']
+    assert list(plan.relationships) == ['author']
+    assert plan.relationships['author'].columns == ['name']
+
+
+def test_get_load_plan_self_referencing():
+
+    class CategoryMapper(Mapper):
+
+        __type__ = Category
+
+        name = field.String()
+        children = field.Collection(field.Nested('CategoryMapper'))
+
+    plan = get_load_plan(CategoryMapper)
+    assert plan.columns == ['name', 'id']
+    # the nested CategoryMapper is already being planned, so the children
+    # are left to load lazily
+    assert not plan.relationships
+
+
+def test_eager_load_self_referencing(db_session):
+
+    class CategoryMapper(Mapper):
+
+        __type__ = Category
+
+        name = field.String()
+        children = field.Collection(field.Nested('CategoryMapper'))
+
+    root = Category(id=1, name='root', children=[
+        Category(id=2, name='a', children=[Category(id=3, name='b')])])
+    db_session.add(root)
+    db_session.flush()
+    db_session.expunge_all()
+
+    query = eager_load(db_session.query(Category).filter_by(id=1),
+                       CategoryMapper)
+    assert CategoryMapper(obj=query.one()).serialize() == {
+        'name': 'root',
+        'children': [{
+            'name': 'a',
+            'children': [{'name': 'b', 'children': []}],
+        }],
+    }
+
+
+def test_eager_load(db_session, connection, comment_mappers):
+
+    BlogPostMapper, CommentMapper, AuthorMapper = comment_mappers
+
+    users = [User(id=i, name='user %s' % i) for i in range(1, 4)]
+    db_session.add_all(users)
+    for i in range(1, 4):
+        post = Post(id=i, title='post %s' % i, user=users[0])
+        post.comments = [
+            Comment(body='comment %s' % j, author=users[j - 1])
+            for j in range(1, 4)]
+        db_session.add(post)
+    db_session.flush()
+    db_session.expunge_all()
+
+    expected = [{
+        'title': 'post %s' % i,
+        'object_type': 'post',
+        'comments': [
+            {'body': 'comment %s' % j, 'author': {'name': 'user %s' % j}}
+            for j in range(1, 4)],
+    } for i in range(1, 4)]
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(connection, 'before_cursor_execute', count)
+    try:
+        query = eager_load(db_session.query(Post).order_by(Post.id),
+                           BlogPostMapper, role='public')
+        result = BlogPostMapper.many().serialize(query.all(), role='public')
+    finally:
+        event.remove(connection, 'before_cursor_execute', count)
+
+    assert result == expected
+    # posts, then comments joined to their authors
+    assert len(statements) == 2
+    assert 'comments.status' not in statements[1]
+
+
+def test_serialize_core_rows(db_session):
+
+    class ProfileMapper(Mapper):
+
+        __type__ = User
+
+        name = field.String()
+
+    class AuthorMapper(Mapper):
+
+        __type__ = User
+
+        id = field.Integer(read_only=True)
+        name = field.String()
+        profile = field.Nested('ProfileMapper')
+
+    db_session.add_all([User(id=1, name='mike'), User(id=2, name='jack')])
+    db_session.flush()
+
+    users = User.__table__
+    query = select([users.c.id, users.c.name, users.c.fullname,
+                    users.c.name.label('profile__name')]).order_by(users.c.id)
+    rows = db_session.execute(query)
+
+    assert AuthorMapper.many().serialize_rows(rows) == [
+        {'id': 1, 'name': 'mike', 'profile': {'name': 'mike'}},
+        {'id': 2, 'name': 'jack', 'profile': {'name': 'jack'}},
+    ]
+
+
+def test_marshal_track_changes_leaves_unchanged_rows_clean(db_session):
+
+    class UserMapper(Mapper):
+
+        __type__ = User
+
+        name = field.String()
+        fullname = field.String()
+
+    user = User(id=1, name='mike', fullname='mike smith')
+    db_session.add(user)
+    db_session.flush()
+
+    mapper = UserMapper(obj=user, data={
+        'name': 'mike', 'fullname': 'mike smith'}, track_changes=True)
+    mapper.marshal()
+    assert mapper.changes == {}
+    assert user not in db_session.dirty
+
+    mapper = UserMapper(obj=user, data={
+        'name': 'mike', 'fullname': 'mike jones'}, track_changes=True)
+    mapper.marshal()
+    assert mapper.changes == {'fullname': ('mike smith', 'mike jones')}
+    assert db_session.is_modified(user)
+
+
+def test_serialize_collection_limit_dynamic_relationship(
+        db_session, connection):
+
+    class TitleMapper(Mapper):
+
+        __type__ = Post
+
+        title = field.String()
+
+    class AuthorMapper(Mapper):
+
+        __type__ = User
+
+        name = field.String()
+        posts = field.Collection(
+            field.Nested('TitleMapper'), limit=2, paginate=True, count=True)
+
+    user = User(id=1, name='mike')
+    db_session.add(user)
+    db_session.add_all([Post(id=i, title='post %s' % i, user=user)
+                        for i in range(1, 6)])
+    db_session.flush()
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(connection, 'before_cursor_execute', count)
+    try:
+        result = AuthorMapper(obj=user).serialize()
+    finally:
+        event.remove(connection, 'before_cursor_execute', count)
+
+    assert result == {
+        'name': 'mike',
+        'posts': {
+            'items': [{'title': 'post 1'}, {'title': 'post 2'}],
+            'next': 2,
+            'total': 5,
+        },
+    }
+    assert 'LIMIT' in statements[0]
+    assert 'count(' in statements[1]
@@ -1,4 +1,6 @@
-from kim.utils import attr_or_key
+import pytest
+
+from kim.utils import attr_or_key, attr_or_key_getter, attr_or_key_setter
 
 
 def test_attr_or_key_util():
@@ -32,3 +34,77 @@ def test_attr_or_key_util_dot_syntax():
     assert attr_or_key(Foo(), 'bar.qux') is None
     assert attr_or_key(foo_dict, 'bar.xyz') == 'abc'
     assert attr_or_key(foo_dict, 'bar.qux') is None
+
+
+def test_attr_or_key_getter():
+
+    class Foo(object):
+
+        bar = 'baz'
+
+    class Slotted(object):
+
+        __slots__ = ('bar', 'qux')
+
+        def __init__(self):
+            self.bar = 'baz'
+
+    get_bar = attr_or_key_getter('bar')
+    assert get_bar.path == 'bar'
+
+    # Alternate types to exercise the per type cache
+    for i in range(2):
+        assert get_bar(Foo()) == 'baz'
+        assert get_bar({'bar': 'baz'}) == 'baz'
+        assert get_bar(Slotted()) == 'baz'
+        assert get_bar('str') is None
+        assert get_bar(None) is None
+
+    assert attr_or_key_getter('qux')(Slotted()) is None
+    assert attr_or_key_getter('qux')({}) is None
+
+    obj = Foo()
+    assert attr_or_key_getter('__self__')(obj) is obj
+
+
+def test_attr_or_key_getter_dot_syntax():
+
+    class Bar(object):
+        xyz = 'abc'
+
+    class Foo(object):
+
+        bar = Bar()
+
+    get_xyz = attr_or_key_getter('bar.xyz')
+    assert get_xyz.path == 'bar.xyz'
+    assert get_xyz(Foo()) == 'abc'
+    assert get_xyz({'bar': {'xyz': 'abc'}}) == 'abc'
+    assert get_xyz({'bar': Bar()}) == 'abc'
+    assert get_xyz({'bar': None}) is None
+    assert attr_or_key_getter('bar.qux')(Foo()) is None
+
+
+def test_attr_or_key_setter():
+
+    class Foo(object):
+        pass
+
+    set_bar = attr_or_key_setter('bar')
+    obj, data = Foo(), {}
+    set_bar(obj, 'baz')
+    set_bar(data, 'baz')
+    assert obj.bar == 'baz'
+    assert data == {'bar': 'baz'}
+
+    set_xyz = attr_or_key_setter('bar.xyz')
+    data = {'bar': Foo()}
+    set_xyz(data, 'abc')
+    assert data['bar'].xyz == 'abc'
+
+    with pytest.raises(AttributeError):
+        set_xyz({}, 'abc')
+
+    data = {'id': 1}
+    attr_or_key_setter('__self__')(data, {'name': 'mike'})
+    assert data == {'id': 1, 'name': 'mike'}